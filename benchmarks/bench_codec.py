@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compare the JSON codecs of :py:mod:`odata.codec` on a large response page:
+
+    PYTHONPATH=. python benchmarks/bench_codec.py --rows 50000
+"""
+
+import argparse
+import datetime
+import timeit
+from decimal import Decimal
+
+from odata.codec import CODECS
+from odata.exceptions import ODataError
+
+
+def make_page(rows):
+    value = []
+    for i in range(rows):
+        value.append({
+            '@odata.etag': 'W/"{0}"'.format(i),
+            'OrderID': i,
+            'CustomerID': 'CUST{0:05d}'.format(i % 5000),
+            'OrderDate': '2020-01-{0:02d}T10:00:00Z'.format(i % 28 + 1),
+            'Freight': i * 0.37,
+            'ShipName': u'Ship name {0} ÄÖ'.format(i),
+            'ShipCity': 'Oulu',
+            'Shipped': i % 2 == 0,
+        })
+    return {'@odata.context': '$metadata#Orders', 'value': value,
+            '@odata.nextLink': 'Orders?$skiptoken={0}'.format(rows)}
+
+
+def make_payload():
+    return {
+        'OrderID': 1,
+        'Freight': Decimal('32.38'),
+        'OrderDate': datetime.datetime(2020, 1, 2, 3, 4, 5),
+        'Lines': [{'ProductID': i, 'Quantity': i % 10, 'ShipName': 'Line {0}'.format(i)}
+                  for i in range(1000)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000, help='rows in the response page')
+    parser.add_argument('--repeat', type=int, default=5, help='timing repeats, best is reported')
+    args = parser.parse_args()
+
+    body = CODECS['json']().dumps(make_page(args.rows))
+    payload = make_payload()
+    print('Page of {0} rows, {1:.1f} MB'.format(args.rows, len(body) / 1e6))
+    print('{0:<10} {1:>12} {2:>12}'.format('codec', 'decode ms', 'encode ms'))
+
+    baseline = None
+    for name, cls in sorted(CODECS.items()):
+        try:
+            codec = cls()
+        except ODataError:
+            print('{0:<10} not installed'.format(name))
+            continue
+        decode = min(timeit.repeat(lambda: codec.loads(body), number=1, repeat=args.repeat))
+        encode = min(timeit.repeat(lambda: codec.dumps(payload), number=10, repeat=args.repeat)) / 10
+        if name == 'json':
+            baseline = decode
+        speedup = ''
+        if baseline and name != 'json':
+            speedup = '  ({0:.1f}x decode)'.format(baseline / decode)
+        print('{0:<10} {1:>12.1f} {2:>12.2f}{3}'.format(name, decode * 1000, encode * 1000, speedup))
+
+
+if __name__ == '__main__':
+    main()
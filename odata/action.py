@@ -147,6 +147,10 @@ class ActionCallable(object):
             raise AttributeError(self.errmsg)
 
         connection = self.actionbase_instance._get_context_or_default_connection(kwargs)
+        if connection.is_async:
+            return self.actionbase_instance._callable_async(connection, self.url, self.query, **kwargs)
+        if connection.is_batch:
+            return self.actionbase_instance._callable_batch(connection, self.url, self.query, **kwargs)
         return self.actionbase_instance._callable(connection, self.url, self.query, **kwargs)
 
 
@@ -235,6 +239,21 @@ class ActionBase(object):
             raise TypeError(errmsg)
 
     def _callable(self, connection, url, query, **kwargs):
+        url, query_options = self._prepare_call(url, query, kwargs)
+        response_data = self._execute_http(connection, url, query_options, kwargs)
+        return self._read_response(response_data)
+
+    async def _callable_async(self, connection, url, query, **kwargs):
+        url, query_options = self._prepare_call(url, query, kwargs)
+        response_data = await self._execute_http(connection, url, query_options, kwargs)
+        return self._read_response(response_data)
+
+    def _callable_batch(self, connection, url, query, **kwargs):
+        url, query_options = self._prepare_call(url, query, kwargs)
+        future = self._execute_http(connection, url, query_options, kwargs)
+        return future.then(self._read_response)
+
+    def _prepare_call(self, url, query, kwargs):
         self._check_call_arguments(kwargs)
 
         if not url.endswith('/'):
@@ -244,8 +263,9 @@ class ActionBase(object):
         query_options = None
         if query:
             query_options = query._get_options()
+        return url, query_options
 
-        response_data = self._execute_http(connection, url, query_options, kwargs)
+    def _read_response(self, response_data):
         response_data = (response_data or {}).get('value')
 
         simple_types_values = self.__odata_service__.metadata.property_types.values()
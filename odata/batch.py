@@ -0,0 +1,708 @@
+# -*- coding: utf-8 -*-
+
+"""
+Batch requests
+==============
+
+Multiple requests can be sent to the endpoint in a single ``$batch`` HTTP
+call. Requests are queued in a :py:class:`Batch` and sent when the ``with``
+block exits. Every queued call returns a :py:class:`BatchFuture` that is
+resolved once the batch response has been read:
+
+.. code-block:: python
+
+    with Service.batch() as batch:
+        order = batch.query(Order).get(1234)
+        shippers = batch.query(Shipper).filter(Shipper.CompanyName != None).all()
+        batch.save(new_customer)
+        batch.delete(old_customer)
+        ok = batch.call(Product.RemoveAllReservations)
+
+    print(order.result(), shippers.result())
+
+Writes can be grouped into an atomic changeset. The endpoint either applies
+all of the changeset's requests or none of them:
+
+.. code-block:: python
+
+    with Service.batch() as batch:
+        with batch.changeset():
+            batch.save(order)
+            batch.save(order_line)
+
+Requests are encoded as ``multipart/mixed`` by default. Endpoints that
+support the OData 4.01 JSON batch format can be used with
+``Service.batch(json_format=True)``.
+"""
+
+import uuid
+from contextlib import contextmanager
+
+from requests.models import PreparedRequest
+
+from odata.codec import get_codec
+from odata.entity import EntityBase
+from odata.query import Query, _raise_not_found
+from odata.exceptions import ODataError
+import odata.exceptions as exc
+
+CRLF = b'\r\n'
+
+
+class BatchFuture(object):
+    """
+    Result of a request queued in a :py:class:`Batch`. Available after the
+    batch has been executed
+    """
+
+    def __init__(self):
+        self._done = False
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def __repr__(self):
+        if not self._done:
+            state = 'pending'
+        elif self._exception is not None:
+            state = 'failed'
+        else:
+            state = 'done'
+        return '<BatchFuture ({0})>'.format(state)
+
+    def done(self):
+        return self._done
+
+    def exception(self):
+        """
+        :return: Error raised by the request, or None
+        """
+        return self._exception
+
+    def result(self):
+        """
+        :return: Result of the request
+        :raises ODataError: Batch was not executed yet, or the request failed
+        """
+        if not self._done:
+            raise ODataError('Batch has not been executed yet')
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def then(self, fn, on_error=None):
+        """
+        Create a new future, resolved with the return value of ``fn`` called
+        with this future's result
+
+        :param on_error: Called with the exception if this future fails. Its return value resolves the new future
+        """
+        future = BatchFuture()
+        self._callbacks.append((fn, on_error, future))
+        if self._done:
+            self._run_callbacks()
+        return future
+
+    def _set_result(self, value):
+        self._done = True
+        self._result = value
+        self._run_callbacks()
+
+    def _set_exception(self, exception):
+        self._done = True
+        self._exception = exception
+        self._run_callbacks()
+
+    def _run_callbacks(self):
+        callbacks, self._callbacks = self._callbacks, []
+        for fn, on_error, future in callbacks:
+            if self._exception is not None and on_error is None:
+                future._set_exception(self._exception)
+                continue
+            try:
+                if self._exception is not None:
+                    value = on_error(self._exception)
+                else:
+                    value = fn(self._result)
+            except Exception as e:
+                future._set_exception(e)
+            else:
+                future._set_result(value)
+
+
+class BatchRequest(object):
+    """
+    A single request inside a ``$batch`` call
+    """
+
+    def __init__(self, method, url, data=None, headers=None, changeset=None):
+        self.method = method
+        self.url = url
+        self.data = data
+        self.headers = headers or {}
+        self.changeset = changeset
+        self.content_id = None
+        self.future = BatchFuture()
+
+    def __repr__(self):
+        return '<BatchRequest {0} {1}>'.format(self.method, self.url)
+
+
+class BatchResponse(object):
+    """
+    Decoded response of a single :py:class:`BatchRequest`
+    """
+
+    def __init__(self, status_code, headers=None, data=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.data = data
+
+    def __repr__(self):
+        return '<BatchResponse {0}>'.format(self.status_code)
+
+
+def _group_requests(batch_requests):
+    """
+    Group consecutive requests of the same changeset together
+
+    :return: List of requests and lists of requests (changesets)
+    """
+    groups = []
+    for request in batch_requests:
+        last = groups[-1] if groups else None
+        if request.changeset is not None and isinstance(last, list) \
+                and last[0].changeset == request.changeset:
+            last.append(request)
+        elif request.changeset is not None:
+            groups.append([request])
+        else:
+            groups.append(request)
+    return groups
+
+
+def _encode_http_request(request, base_url, codec):
+    url = request.url
+    if url.startswith(base_url):
+        url = url[len(base_url):]
+
+    lines = [
+        b'Content-Type: application/http',
+        b'Content-Transfer-Encoding: binary',
+    ]
+    if request.content_id is not None:
+        lines.append('Content-ID: {0}'.format(request.content_id).encode('utf-8'))
+    lines.append(b'')
+    lines.append('{0} {1} HTTP/1.1'.format(request.method, url).encode('utf-8'))
+
+    headers = {'Accept': 'application/json'}
+    headers.update(request.headers)
+    body = b''
+    if request.data is not None:
+        headers['Content-Type'] = 'application/json'
+        body = codec.dumps(request.data)
+    for key, value in headers.items():
+        lines.append('{0}: {1}'.format(key, value).encode('utf-8'))
+    lines.append(b'')
+    lines.append(body)
+    return CRLF.join(lines)
+
+
+def encode_multipart(batch_requests, base_url, boundary=None, codec=None):
+    """
+    Encode requests as a ``multipart/mixed`` batch body
+
+    :param codec: JSON codec of request bodies, see :py:mod:`odata.codec`
+    :return: Tuple of body bytes and Content-Type header value
+    """
+    codec = get_codec(codec)
+    boundary = boundary or 'batch_{0}'.format(uuid.uuid4())
+    lines = []
+    for group in _group_requests(batch_requests):
+        lines.append('--{0}'.format(boundary).encode('utf-8'))
+        if isinstance(group, list):
+            changeset_boundary = 'changeset_{0}'.format(uuid.uuid4())
+            lines.append('Content-Type: multipart/mixed; boundary={0}'.format(changeset_boundary).encode('utf-8'))
+            lines.append(b'')
+            for request in group:
+                lines.append('--{0}'.format(changeset_boundary).encode('utf-8'))
+                lines.append(_encode_http_request(request, base_url, codec))
+            lines.append('--{0}--'.format(changeset_boundary).encode('utf-8'))
+        else:
+            lines.append(_encode_http_request(group, base_url, codec))
+    lines.append('--{0}--'.format(boundary).encode('utf-8'))
+    lines.append(b'')
+    content_type = 'multipart/mixed; boundary={0}'.format(boundary)
+    return CRLF.join(lines), content_type
+
+
+def encode_json(batch_requests, base_url, codec=None):
+    """
+    Encode requests in the OData 4.01 JSON batch format
+
+    :param codec: JSON codec, see :py:mod:`odata.codec`
+    :return: Tuple of body bytes and Content-Type header value
+    """
+    encoded = []
+    for request in batch_requests:
+        url = request.url
+        if url.startswith(base_url):
+            url = url[len(base_url):]
+        item = {
+            'id': str(request.content_id),
+            'method': request.method,
+            'url': url,
+        }
+        headers = dict(request.headers)
+        if request.data is not None:
+            headers['Content-Type'] = 'application/json'
+            item['body'] = request.data
+        if headers:
+            item['headers'] = headers
+        if request.changeset is not None:
+            item['atomicityGroup'] = request.changeset
+        encoded.append(item)
+    body = get_codec(codec).dumps({'requests': encoded})
+    return body, 'application/json'
+
+
+def _get_boundary(content_type):
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == 'boundary':
+            return value.strip('"')
+    raise ODataError('Batch response has no multipart boundary')
+
+
+def _split_headers(content):
+    for separator in (CRLF + CRLF, b'\n\n'):
+        if separator in content:
+            head, body = content.split(separator, 1)
+            break
+    else:
+        head, body = content, b''
+
+    headers = {}
+    lines = head.replace(CRLF, b'\n').split(b'\n')
+    for line in lines:
+        key, sep, value = line.decode('utf-8').partition(':')
+        if sep:
+            headers[key.strip().lower()] = value.strip()
+    return lines, headers, body
+
+
+def _split_multipart(content, boundary):
+    delimiter = b'--' + boundary.encode('utf-8')
+    parts = []
+    for chunk in content.split(delimiter)[1:]:
+        if chunk.startswith(b'--'):
+            break
+        if chunk.startswith(CRLF):
+            chunk = chunk[2:]
+        elif chunk.startswith(b'\n'):
+            chunk = chunk[1:]
+        if chunk.endswith(CRLF):
+            chunk = chunk[:-2]
+        elif chunk.endswith(b'\n'):
+            chunk = chunk[:-1]
+        parts.append(chunk)
+    return parts
+
+
+def _decode_http_response(content, codec):
+    lines, headers, body = _split_headers(content)
+    status_line = lines[0].decode('utf-8').split(' ')
+    status_code = int(status_line[1])
+    headers = dict((k, v) for k, v in headers.items())
+
+    data = None
+    body = body.strip()
+    content_type = headers.get('content-type', '')
+    if body and 'application/json' in content_type:
+        data = codec.loads(body)
+    elif body and content_type.startswith('text/plain'):
+        data = body.decode('utf-8-sig')
+    return BatchResponse(status_code, headers, data)
+
+
+def decode_multipart(content, content_type, codec=None):
+    """
+    Decode a ``multipart/mixed`` batch response body
+
+    :param codec: JSON codec of response bodies, see :py:mod:`odata.codec`
+    :return: List of responses. A changeset is represented as a list of
+        (Content-ID, response) tuples, unless the whole changeset failed
+    """
+    codec = get_codec(codec)
+    decoded = []
+    for part in _split_multipart(content, _get_boundary(content_type)):
+        _, part_headers, payload = _split_headers(part)
+        part_ct = part_headers.get('content-type', '')
+        if part_ct.startswith('multipart/mixed'):
+            changeset = []
+            for changeset_part in _split_multipart(payload, _get_boundary(part_ct)):
+                _, cs_headers, cs_payload = _split_headers(changeset_part)
+                changeset.append((cs_headers.get('content-id'),
+                                  _decode_http_response(cs_payload, codec)))
+            decoded.append(changeset)
+        else:
+            decoded.append(_decode_http_response(payload, codec))
+    return decoded
+
+
+def decode_json(data):
+    """
+    Decode an OData 4.01 JSON batch response
+
+    :return: Dictionary of request id to response
+    """
+    decoded = {}
+    for item in data.get('responses', []):
+        headers = dict((k.lower(), v) for k, v in (item.get('headers') or {}).items())
+        decoded[str(item.get('id'))] = BatchResponse(int(item.get('status')),
+                                                     headers, item.get('body'))
+    return decoded
+
+
+def match_multipart_responses(batch_requests, decoded):
+    """
+    Pair decoded ``multipart/mixed`` responses with their requests
+
+    :return: List of responses, in the same order as requests
+    """
+    responses = {}
+    for group, item in zip(_group_requests(batch_requests), decoded):
+        if not isinstance(group, list):
+            responses[id(group)] = item
+        elif isinstance(item, list):
+            by_content_id = dict((cid, response) for cid, response in item if cid)
+            for i, request in enumerate(group):
+                response = by_content_id.get(str(request.content_id))
+                if response is None and i < len(item):
+                    response = item[i][1]
+                responses[id(request)] = response
+        else:
+            # whole changeset failed, the error response applies to all
+            for request in group:
+                responses[id(request)] = item
+    return [responses.get(id(request)) for request in batch_requests]
+
+
+def _format_url(url, params):
+    if not params:
+        return url
+    prepared = PreparedRequest()
+    prepared.prepare_url(url, params)
+    return prepared.url
+
+
+class BatchQuery(Query):
+    """
+    Query bound to a :py:class:`Batch`. Created by
+    :py:func:`Batch.query`. Fetching methods queue a request and return a
+    :py:class:`BatchFuture` instead of the results
+    """
+
+    def __iter__(self):
+        raise TypeError('BatchQuery can not be iterated, use all() instead')
+
+    def iter_pages(self, raw=False):
+        raise TypeError('BatchQuery can not be iterated, use all() instead')
+
+    def compile(self):
+        raise ODataError('Compiled queries are not supported in batches')
+
+    def _create_model(self, row):
+        e = super(BatchQuery, self)._create_model(row)
+        if isinstance(e, EntityBase):
+            e.__odata__.bind(self.connection.connection)
+        return e
+
+    def _read_all(self, data):
+        return [self._create_model(row) for row in self._read_all_rows(data)]
+
+    def _read_all_rows(self, data):
+        rows, next_url = self._read_page(data or {})
+        result = list(rows)
+        while next_url:
+            # follow the remaining pages outside the batch
+            data = self.connection.connection.execute_get(next_url, headers=self._get_headers())
+            rows, next_url = self._read_page(data)
+            result.extend(rows)
+        return result
+
+    def all(self):
+        """
+        :return: Future resolving to a list of all Entity instances
+        :rtype: BatchFuture
+        """
+        future = self.connection.execute_get(self._get_url(), self._get_options(),
+                                             headers=self._get_headers())
+        return future.then(self._read_all)
+
+    def count(self):
+        """
+        :return: Future resolving to the number of matching Entities, see
+            :py:func:`~odata.query.Query.count`
+        :rtype: BatchFuture
+        """
+        url = self._get_url() + '/$count'
+        return self.connection.execute_count(url, self._get_count_options())
+
+    def first(self):
+        """
+        :return: Future resolving to the first Entity instance or None
+        :rtype: BatchFuture
+        """
+        def read(data):
+            if data:
+                return data[0]
+        return self.limit(1).all().then(read)
+
+    def one(self):
+        """
+        :return: Future resolving to exactly one Entity instance. Fails with
+            NoResultsFound or MultipleResultsFound
+        :rtype: BatchFuture
+        """
+        def read(data):
+            if len(data) == 0:
+                raise exc.NoResultsFound()
+            if len(data) > 1:
+                raise exc.MultipleResultsFound()
+            return data[0]
+        return self.limit(2).all().then(read)
+
+    def get(self, *pk, **composite_keys):
+        """
+        :return: Future resolving to the Entity with the given primary key.
+            Fails with NoResultsFound
+        :rtype: BatchFuture
+        """
+        def read(data):
+            if data is None:
+                raise exc.NoResultsFound()
+            return self._create_model(data)
+
+        url = self._get_key_url(pk, composite_keys)
+        future = self.connection.execute_get(url, self._get_key_options())
+        return future.then(read, on_error=_raise_not_found)
+
+    def get_many(self, keys, max_url_length=None):
+        """
+        :return: Future resolving to a list of Entity instances in the order
+            of ``keys``, see :py:func:`~odata.query.Query.get_many`
+        :rtype: BatchFuture
+        """
+        key_ids, queries = self._get_many_queries(keys, max_url_length)
+        found = {}
+        result = BatchFuture()
+        pending = [len(queries)]
+
+        def read(rows):
+            self._collect_keyed_rows(rows, found)
+            pending[0] -= 1
+            if pending[0] == 0:
+                result._set_result([found.get(key_id) for key_id in key_ids])
+
+        def fail(error):
+            if not result.done():
+                result._set_exception(error)
+
+        if not queries:
+            result._set_result([])
+        for q in queries:
+            future = self.connection.execute_get(q._get_url(), q._get_options())
+            future.then(q._read_all_rows).then(read, on_error=fail)
+        return result
+
+    def raw(self, query_params):
+        """
+        :return: Future resolving to the raw query result
+        :rtype: BatchFuture
+        """
+        future = self.connection.execute_get(self.entity.__odata_url__(), params=query_params)
+        return future.then(lambda data: (data or {}).get('value'))
+
+
+class Batch(object):
+    """
+    Collects requests and sends them to the endpoint as a single ``$batch``
+    call. Created by :py:func:`~odata.context.Context.batch`
+
+    :param context: Context whose connection is used
+    :param url: Service root address, with or without a trailing slash
+    :param json_format: Use the OData 4.01 JSON batch format instead of ``multipart/mixed``
+    :param raise_on_error: Raise the first failed request's error after the batch has been executed
+    """
+    is_async = False
+    is_batch = True
+
+    def __init__(self, context, url, json_format=False, raise_on_error=True):
+        self.context = context
+        self.connection = context.connection
+        self.url = url
+        self.json_format = json_format
+        self.raise_on_error = raise_on_error
+        self.requests = []
+        self._changeset = None
+        self._changeset_count = 0
+
+    def __repr__(self):
+        return '<Batch of {0} requests>'.format(len(self.requests))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.execute()
+
+    @contextmanager
+    def changeset(self):
+        """
+        Group the writes queued inside the ``with`` block into an atomic
+        changeset
+        """
+        if self._changeset is not None:
+            raise ODataError('Changesets can not be nested')
+        self._changeset_count += 1
+        self._changeset = 'changeset{0}'.format(self._changeset_count)
+        try:
+            yield self
+        finally:
+            self._changeset = None
+
+    def _queue(self, method, url, params=None, data=None, headers=None):
+        if method == 'GET' and self._changeset is not None:
+            raise ODataError('GET requests are not allowed in a changeset')
+        request = BatchRequest(method, _format_url(url, params), data=data,
+                               headers=headers, changeset=self._changeset)
+        request.content_id = len(self.requests) + 1
+        self.requests.append(request)
+        return request.future
+
+    # Connection interface used by queries and Actions ########################
+
+    def execute_get(self, url, params=None, headers=None, info=None):
+        return self._queue('GET', url, params=params, headers=headers)
+
+    def execute_count(self, url, params=None):
+        future = self._queue('GET', url, params=params, headers={'Accept': 'text/plain'})
+        return future.then(lambda data: self.connection._parse_count(u'{0}'.format(data)))
+
+    def execute_post(self, url, data, params=None):
+        return self._queue('POST', url, params=params, data=data)
+
+    def execute_patch(self, url, data):
+        return self._queue('PATCH', url, data=data)
+
+    def execute_delete(self, url):
+        return self._queue('DELETE', url)
+
+    # Public API ###############################################################
+
+    def query(self, entitycls):
+        """
+        Start a new query that is sent with this batch
+
+        :return: BatchQuery instance
+        """
+        return BatchQuery(entitycls, connection=self)
+
+    def save(self, entity, force_refresh=True):
+        """
+        Queue a POST or PATCH call for the entity. See
+        :py:func:`~odata.context.Context.save`
+
+        :param force_refresh: Ask the service to return the updated entity with ``Prefer: return=representation``
+        :return: Future resolving to the entity
+        :rtype: BatchFuture
+        """
+        context = self.context
+
+        if context.is_entity_saved(entity):
+            url, patch_data = context._prepare_update(entity)
+            if url is None:
+                future = BatchFuture()
+                future._set_result(entity)
+                return future
+
+            headers = {}
+            if force_refresh:
+                headers['Prefer'] = 'return=representation'
+
+            def finish_update(saved_data):
+                entity.__odata__.reset()
+                context._finish_update(entity, saved_data)
+                return entity
+            return self._queue('PATCH', url, data=patch_data, headers=headers).then(finish_update)
+
+        url, insert_data = context._prepare_insert(entity)
+
+        def finish_insert(saved_data):
+            context._finish_insert(entity, saved_data)
+            return entity
+        return self._queue('POST', url, data=insert_data).then(finish_insert)
+
+    def delete(self, entity):
+        """
+        Queue a DELETE call for the entity
+
+        :return: Future resolving to None
+        :rtype: BatchFuture
+        """
+        url = entity.__odata__.instance_url
+
+        def finish_delete(_):
+            self.context._finish_delete(entity)
+        return self._queue('DELETE', url).then(finish_delete)
+
+    def call(self, action_or_function, **parameters):
+        """
+        Queue a call to an Action or Function
+
+        :return: Future resolving to the Action's return value
+        :rtype: BatchFuture
+        """
+        parameters['__connection__'] = self
+        return action_or_function(**parameters)
+
+    def execute(self):
+        """
+        Send all queued requests and resolve their futures. Called
+        automatically when the ``with`` block exits
+
+        :raises ODataError: A request failed and ``raise_on_error`` is set
+        """
+        batch_requests, self.requests = self.requests, []
+        if not batch_requests:
+            return
+
+        url = self.url.rstrip('/') + '/$batch'
+        responses = self.connection.execute_batch(url, batch_requests,
+                                                  json_format=self.json_format)
+
+        first_error = None
+        for request, response in zip(batch_requests, responses):
+            future = request.future
+            error = None
+            if response is None:
+                error = ODataError('No response for batch request: {0}'.format(request))
+            elif response.status_code >= 400:
+                errordata = response.data if isinstance(response.data, dict) else None
+                try:
+                    self.connection._raise_odata_error(response.status_code, errordata)
+                except ODataError as e:
+                    error = e
+
+            if error is not None:
+                first_error = first_error or error
+                future._set_exception(error)
+            elif response.status_code == 204:
+                future._set_result(None)
+            else:
+                future._set_result(response.data)
+
+        if first_error is not None and self.raise_on_error:
+            raise first_error
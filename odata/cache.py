@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+"""
+Result cache
+============
+
+Repeated queries for slowly changing reference data can be served from an
+in-memory cache instead of the endpoint. Attach a :py:class:`QueryCache` to
+a Service or a Context:
+
+.. code-block:: python
+
+    >>> from odata.cache import QueryCache
+    >>> Service = ODataService(url, cache=QueryCache(max_entries=500, ttl=60))
+    >>> countries = Service.query(Country).all()  # fetched from the endpoint
+    >>> countries = Service.query(Country).all()  # served from the cache
+
+The decoded response pages of queries and :py:func:`~odata.query.Query.get`
+lookups are cached, keyed by their request url. Entries expire after ``ttl``
+seconds, and the least recently used entries are evicted when the cache is
+full. Saving or deleting an entity through the same Context drops the cached
+entries of its EntitySet.
+
+----
+
+API
+---
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    # noinspection PyUnresolvedReferences
+    from urllib.parse import urlencode
+except ImportError:
+    # noinspection PyUnresolvedReferences
+    from urllib import urlencode
+
+
+def cache_key(url, params=None, headers=None):
+    """
+    Format a canonical cache key of a GET request. Parameters are sorted, so
+    the order in which query options were given does not matter
+
+    :param url: Request url
+    :param params: Dictionary of query parameters
+    :param headers: Dictionary of additional request headers that change the response
+    :return: String
+    """
+    key = url
+    if params:
+        query = urlencode(sorted((k, v) for k, v in params.items() if v is not None))
+        separator = '&' if '?' in url else '?'
+        key = key + separator + query
+    if headers:
+        key = key + '#' + urlencode(sorted(headers.items()))
+    return key
+
+
+class QueryCache(object):
+    """
+    Thread-safe LRU cache of decoded response payloads
+
+    :param max_entries: Maximum number of cached responses
+    :param ttl: Seconds an entry stays valid. None to keep entries until evicted
+    """
+
+    def __init__(self, max_entries=1000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __repr__(self):
+        return '<QueryCache {0}/{1} entries>'.format(len(self), self.max_entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _now(self):
+        return time.monotonic()
+
+    def get(self, key):
+        """
+        :return: Copy of the cached payload, or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return
+            entity_set, expires, payload = entry
+            if expires is not None and expires <= self._now():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # entities take ownership of the row dicts they are built from
+        return copy.deepcopy(payload)
+
+    def set(self, key, payload, entity_set=None):
+        """
+        Store a payload
+
+        :param key: Cache key, see :py:func:`cache_key`
+        :param payload: Decoded response
+        :param entity_set: Name of the EntitySet the payload belongs to, used for invalidation
+        """
+        if payload is None or self.max_entries <= 0:
+            return
+        expires = None
+        if self.ttl is not None:
+            expires = self._now() + self.ttl
+        payload = copy.deepcopy(payload)
+        with self._lock:
+            self._entries[key] = (entity_set, expires, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, entity_set=None):
+        """
+        Drop cached entries
+
+        :param entity_set: Name of the EntitySet whose entries are dropped. Drops everything if None
+        """
+        with self._lock:
+            if entity_set is None:
+                self._entries.clear()
+                return
+            stale = [key for key, entry in self._entries.items() if entry[0] == entity_set]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        """
+        Drop all entries and reset the statistics
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    @property
+    def stats(self):
+        """
+        Dictionary of ``hits``, ``misses``, ``evictions``, ``expirations``
+        and current ``entries``
+        """
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            expirations=self.expirations,
+            entries=len(self._entries),
+        )
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+"""
+Circuit breaker
+===============
+
+When an endpoint is down, every request waits for the full timeout before
+failing. A :py:class:`CircuitBreaker` notices consecutive failures and
+then fails requests right away with
+:py:class:`~odata.exceptions.CircuitOpenError`, without sending them:
+
+.. code-block:: python
+
+    >>> from odata.circuit import CircuitBreaker
+    >>> breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+    >>> Service = ODataService(url, circuit_breaker=breaker)
+
+The breaker has three states:
+
+* ``closed``: Requests are sent. Connection errors, timeouts and server
+  errors are counted, and ``failure_threshold`` of them in a row open the
+  breaker. Any other response resets the count
+* ``open``: Requests fail with :py:class:`~odata.exceptions.CircuitOpenError`.
+  After ``reset_timeout`` seconds the breaker becomes half-open
+* ``half_open``: ``half_open_requests`` requests are let through as probes.
+  A successful probe closes the breaker, a failed one opens it again
+
+State changes are logged, counted in :py:attr:`CircuitBreaker.stats` and
+passed to the ``on_state_change`` callback:
+
+.. code-block:: python
+
+    >>> def report(old_state, new_state):
+    ...     metrics.gauge('odata.circuit', new_state)
+    >>> breaker = CircuitBreaker(on_state_change=report)
+
+Each failed attempt counts, including attempts that are retried. While
+the breaker is open the retries of a request are not made.
+
+----
+
+API
+---
+"""
+
+import logging
+import threading
+import time
+
+from odata.exceptions import CircuitOpenError
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker(object):
+    """
+    Fails requests fast after repeated failures. Used by the connection of
+    a Service or a Context, see the module documentation
+
+    :param failure_threshold: Number of consecutive failures that opens the breaker
+    :param reset_timeout: Seconds to stay open before letting probe requests through
+    :param half_open_requests: Number of probe requests let through at a time when half-open
+    :param statuses: HTTP status codes that count as failures
+    :param on_state_change: Function called with the old and the new state on every state change
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, half_open_requests=1,
+                 statuses=(500, 502, 503, 504), on_state_change=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_requests = half_open_requests
+        self.statuses = frozenset(statuses)
+        self.on_state_change = on_state_change
+        self.log = logging.getLogger('odata.circuit')
+        self._lock = threading.Lock()
+        self._opened_at = None
+        self._probes = 0
+        self.state = CLOSED
+        """Current state: ``closed``, ``open`` or ``half_open``"""
+        self.failures = 0
+        """Number of consecutive failures"""
+        self.rejected = 0
+        """Number of requests failed without sending them"""
+        self.transitions = dict((state, 0) for state in (CLOSED, OPEN, HALF_OPEN))
+        """Number of times each state was entered"""
+
+    def __repr__(self):
+        return '<CircuitBreaker {0}>'.format(self.state)
+
+    @property
+    def stats(self):
+        """
+        Dictionary of the state, consecutive failures, rejected requests
+        and state transition counts
+        """
+        with self._lock:
+            return dict(state=self.state, failures=self.failures, rejected=self.rejected,
+                        transitions=dict(self.transitions))
+
+    def before_request(self, url=None):
+        """
+        Check if a request can be sent. Every allowed request must be
+        followed by a call to :py:func:`record`
+
+        :param url: Request url, used in the error message
+        :raises CircuitOpenError: The breaker is open
+        """
+        changed = error = None
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                changed = self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and self._probes < self.half_open_requests:
+                self._probes += 1
+            elif self.state != CLOSED:
+                self.rejected += 1
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+                error = CircuitOpenError(u'Circuit breaker is {0}, not sending request to {1} '
+                                         u'(retry in {2:.1f}s)'.format(self.state, url, retry_in))
+        self._notify(changed)
+        if error is not None:
+            raise error
+
+    def record(self, status=None):
+        """
+        Record the outcome of a request
+
+        :param status: HTTP status code, or None after a connection error or a timeout
+        """
+        failed = status is None or status in self.statuses
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+            if failed:
+                self.failures += 1
+                if self.state == HALF_OPEN or (self.state == CLOSED
+                                               and self.failures >= self.failure_threshold):
+                    changed = self._set_state(OPEN)
+                else:
+                    changed = None
+            else:
+                self.failures = 0
+                changed = self._set_state(CLOSED) if self.state != CLOSED else None
+        self._notify(changed)
+
+    def cancel(self):
+        """
+        Forget a request allowed by :py:func:`before_request` that was not sent
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def reset(self):
+        """
+        Close the breaker
+        """
+        with self._lock:
+            self.failures = 0
+            changed = self._set_state(CLOSED) if self.state != CLOSED else None
+        self._notify(changed)
+
+    def _set_state(self, state):
+        old_state = self.state
+        self.state = state
+        self.transitions[state] += 1
+        self._probes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        return old_state, state
+
+    def _notify(self, changed):
+        if changed is None:
+            return
+        old_state, new_state = changed
+        if new_state == OPEN:
+            self.log.warning(u'Circuit breaker opened after {0} failures'.format(self.failures))
+        else:
+            self.log.info(u'Circuit breaker {0} -> {1}'.format(old_state, new_state))
+        if self.on_state_change is not None:
+            self.on_state_change(old_state, new_state)
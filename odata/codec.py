@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+"""
+JSON codecs
+===========
+
+Request and response bodies are encoded and decoded with the standard
+library ``json`` module by default. A faster JSON library can be used
+instead by giving a codec to the Service or a Context:
+
+.. code-block:: python
+
+    >>> Service = ODataService(url, codec='orjson')
+    >>> context = Service.create_context(codec='auto')
+
+========================= ===================================================
+Codec                     Library
+========================= ===================================================
+``'json'``                Standard library ``json`` (default)
+``'orjson'``              `orjson`_, encodes directly to bytes
+``'ujson'``               `ujson`_
+``'simdjson'``            `pysimdjson`_ for decoding, ``json`` for encoding
+``'auto'``                The fastest of the above that is installed
+========================= ===================================================
+
+.. _orjson: https://pypi.org/project/orjson/
+.. _ujson: https://pypi.org/project/ujson/
+.. _pysimdjson: https://pypi.org/project/pysimdjson/
+
+All codecs encode Decimal and datetime values the same way as
+:py:class:`~odata.property.DecimalProperty` and
+:py:class:`~odata.property.DatetimeProperty` serialize them. Any object
+with ``dumps(data)`` returning bytes and ``loads(bytes)`` methods can also
+be given as a codec.
+
+Streamed responses (:py:func:`~odata.query.Query.stream`) are always
+parsed with the standard library incremental decoder.
+
+----
+
+API
+---
+"""
+
+import codecs
+import datetime
+import importlib
+import json
+from decimal import Decimal
+
+from odata.exceptions import ODataError
+from odata.property import DecimalProperty, DatetimeProperty
+
+_decimal = DecimalProperty('Decimal')
+_datetime = DatetimeProperty('DateTime')
+
+
+def encode_default(value):
+    """
+    Encode values that JSON does not support natively, the same way as the
+    matching property classes serialize them
+
+    :raises TypeError: Value can not be encoded
+    """
+    if isinstance(value, Decimal):
+        return _decimal.serialize(value)
+    if isinstance(value, datetime.datetime):
+        return _datetime.serialize(value)
+    raise TypeError('Object of type {0} is not JSON serializable'.format(value.__class__.__name__))
+
+
+def _strip_bom(data):
+    if data[:3] == codecs.BOM_UTF8:
+        return data[3:]
+    return data
+
+
+def _import(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        raise ODataError('JSON codec "{0}" requires {0}. Install it with "pip install {0}"'.format(name))
+
+
+class JSONCodec(object):
+    """
+    Codec built on the standard library ``json`` module
+    """
+    name = 'json'
+
+    def __repr__(self):
+        return '<{0}>'.format(self.__class__.__name__)
+
+    def dumps(self, data):
+        """
+        :param data: JSON compatible value
+        :return: UTF-8 encoded bytes
+        """
+        return json.dumps(data, default=encode_default, ensure_ascii=False).encode('utf-8')
+
+    def loads(self, data):
+        """
+        :param data: Bytes of a JSON document
+        :return: Decoded value
+        """
+        return json.loads(_strip_bom(data))
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    Codec built on ``orjson``
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        self._orjson = _import('orjson')
+        # leave datetimes to encode_default for the DatetimeProperty format
+        self._option = self._orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, data):
+        return self._orjson.dumps(data, default=encode_default, option=self._option)
+
+    def loads(self, data):
+        return self._orjson.loads(_strip_bom(data))
+
+
+class UjsonCodec(JSONCodec):
+    """
+    Codec built on ``ujson``
+    """
+    name = 'ujson'
+
+    def __init__(self):
+        self._ujson = _import('ujson')
+
+    def dumps(self, data):
+        return self._ujson.dumps(data, default=encode_default, ensure_ascii=False).encode('utf-8')
+
+    def loads(self, data):
+        return self._ujson.loads(_strip_bom(data))
+
+
+class SimdjsonCodec(JSONCodec):
+    """
+    Codec decoding with ``pysimdjson``. Encoding uses the standard library
+    """
+    name = 'simdjson'
+
+    def __init__(self):
+        self._simdjson = _import('simdjson')
+
+    def loads(self, data):
+        return self._simdjson.loads(_strip_bom(data))
+
+
+CODECS = dict((cls.name, cls) for cls in (JSONCodec, OrjsonCodec, UjsonCodec, SimdjsonCodec))
+"""Built-in codec classes by name"""
+
+_AUTO_ORDER = ('orjson', 'simdjson', 'ujson')
+
+
+def get_codec(codec=None):
+    """
+    Resolve a codec name to a codec instance
+
+    :param codec: Codec instance, name from :py:data:`CODECS`, ``'auto'`` or None for the standard library codec
+    :return: Codec instance
+    :raises ODataError: Unknown codec, or the library of the codec is not installed
+    """
+    if codec is None:
+        return JSONCodec()
+    if not isinstance(codec, str):
+        return codec
+    if codec == 'auto':
+        for name in _AUTO_ORDER:
+            try:
+                return CODECS[name]()
+            except ODataError:
+                pass
+        return JSONCodec()
+    if codec not in CODECS:
+        raise ODataError('Unknown JSON codec: {0}'.format(codec))
+    return CODECS[codec]()
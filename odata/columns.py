@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+
+"""
+Columnar results
+================
+
+Large results can be read straight into columns instead of Entity
+instances. Pages are decoded column by column into typed buffers as they
+arrive:
+
+.. code-block:: python
+
+    >>> columns = Service.query(Order).to_columns(Order.OrderID, Order.Freight)
+    >>> columns['Freight'][:3]
+    [32.38, 11.61, 65.83]
+    >>> frame = Service.query(Order).filter(...).to_pandas()
+
+Column types follow the property classes:
+
+========================= ======================= ==========================
+Property                  NumPy                   Arrow
+========================= ======================= ==========================
+``IntegerProperty``       ``int64``               ``int64``
+``FloatProperty``         ``float64``             ``float64``
+``DecimalProperty``       ``float64``             ``float64``
+``DatetimeProperty``      ``datetime64[us]``      ``timestamp[us, UTC]``
+``BooleanProperty``       ``bool``                ``bool``
+Other properties          ``object``              inferred
+========================= ======================= ==========================
+
+Datetimes are converted to UTC. ``decimals='decimal'`` keeps
+``DecimalProperty`` values as Decimal objects instead of floats. With NumPy,
+integer columns containing nulls become ``float64`` with NaN and boolean
+columns ``object``. pandas uses its nullable ``Int64`` and ``boolean``
+types instead.
+
+NumPy, pandas and pyarrow are optional dependencies, imported when the
+corresponding method is called.
+
+----
+
+API
+---
+"""
+
+import datetime
+import importlib
+from array import array
+
+from odata.exceptions import ODataError
+from odata.property import IntegerProperty, FloatProperty, DecimalProperty, \
+    DatetimeProperty, BooleanProperty
+
+NAT = -2 ** 63
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def _import(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        raise ODataError('This method requires {0}. Install it with "pip install {0}"'.format(name))
+
+
+class Column(object):
+    """
+    Buffer of deserialized values of any type
+    """
+
+    def __init__(self, prop):
+        self.prop = prop
+        self.name = prop.name
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def extend(self, raw_values):
+        decode = self.prop.deserialize
+        self.values.extend([None if v is None else decode(v) for v in raw_values])
+
+    def to_list(self):
+        return self.values
+
+    def to_numpy(self, np):
+        result = np.empty(len(self.values), dtype=object)
+        result[:] = self.values
+        return result
+
+    def to_pandas(self, pd, np):
+        return pd.Series(self.to_numpy(np), dtype=object)
+
+    def to_arrow(self, pa, np):
+        try:
+            return pa.array(self.values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return pa.array([None if v is None else str(v) for v in self.values])
+
+
+class TypedColumn(Column):
+    """
+    Buffer of values in an ``array.array``, with the positions of nulls kept
+    separately
+    """
+    typecode = None
+    null_value = 0
+
+    def __init__(self, prop):
+        super(TypedColumn, self).__init__(prop)
+        self.values = array(self.typecode)
+        self.nulls = []
+
+    def extend(self, raw_values):
+        if None in raw_values:
+            offset = len(self.values)
+            self.nulls.extend(offset + i for i, v in enumerate(raw_values) if v is None)
+            null_value = self.null_value
+            raw_values = [null_value if v is None else v for v in raw_values]
+        try:
+            page = array(self.typecode, raw_values)
+        except TypeError:
+            page = array(self.typecode, self.convert(raw_values))
+        self.values.extend(page)
+
+    def convert(self, raw_values):
+        """
+        Convert values that the buffer does not accept as such
+        """
+        raise NotImplementedError()
+
+    def to_list(self):
+        values = self.values.tolist()
+        for i in self.nulls:
+            values[i] = None
+        return values
+
+    def _mask(self, np):
+        mask = np.zeros(len(self.values), dtype=bool)
+        if self.nulls:
+            mask[self.nulls] = True
+        return mask
+
+
+class Int64Column(TypedColumn):
+    typecode = 'q'
+
+    def convert(self, raw_values):
+        return [int(v) for v in raw_values]
+
+    def to_numpy(self, np):
+        result = np.frombuffer(self.values, dtype=np.int64).copy()
+        if self.nulls:
+            result = result.astype(np.float64)
+            result[self.nulls] = np.nan
+        return result
+
+    def to_pandas(self, pd, np):
+        values = np.frombuffer(self.values, dtype=np.int64)
+        return pd.Series(pd.arrays.IntegerArray(values.copy(), self._mask(np)))
+
+    def to_arrow(self, pa, np):
+        values = np.frombuffer(self.values, dtype=np.int64)
+        return pa.array(values, type=pa.int64(), mask=self._mask(np))
+
+
+class Float64Column(TypedColumn):
+    typecode = 'd'
+    null_value = float('nan')
+
+    def convert(self, raw_values):
+        # values of IEEE754Compatible responses are strings
+        return [float(v) for v in raw_values]
+
+    def to_numpy(self, np):
+        return np.frombuffer(self.values, dtype=np.float64).copy()
+
+    def to_pandas(self, pd, np):
+        return pd.Series(self.to_numpy(np))
+
+    def to_arrow(self, pa, np):
+        return pa.array(self.to_numpy(np), type=pa.float64(), mask=self._mask(np))
+
+
+class BooleanColumn(TypedColumn):
+    typecode = 'b'
+
+    def convert(self, raw_values):
+        return [bool(v) for v in raw_values]
+
+    def to_list(self):
+        values = [bool(v) for v in self.values]
+        for i in self.nulls:
+            values[i] = None
+        return values
+
+    def to_numpy(self, np):
+        if self.nulls:
+            result = np.empty(len(self.values), dtype=object)
+            result[:] = self.to_list()
+            return result
+        return np.frombuffer(self.values, dtype=np.int8).astype(bool)
+
+    def to_pandas(self, pd, np):
+        values = np.frombuffer(self.values, dtype=np.int8).astype(bool)
+        return pd.Series(pd.arrays.BooleanArray(values, self._mask(np)))
+
+    def to_arrow(self, pa, np):
+        values = np.frombuffer(self.values, dtype=np.int8).astype(bool)
+        return pa.array(values, type=pa.bool_(), mask=self._mask(np))
+
+
+class DatetimeColumn(TypedColumn):
+    """
+    Datetimes as microseconds since the epoch in UTC
+    """
+    typecode = 'q'
+    null_value = NAT
+
+    def extend(self, raw_values):
+        if None in raw_values:
+            offset = len(self.values)
+            self.nulls.extend(offset + i for i, v in enumerate(raw_values) if v is None)
+        self.values.extend([NAT if v is None else self._micros(v) for v in raw_values])
+
+    def _micros(self, value):
+        try:
+            parsed = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            parsed = self.prop.deserialize(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        return (parsed - EPOCH) // MICROSECOND
+
+    def to_list(self):
+        return [None if v == NAT else EPOCH + datetime.timedelta(microseconds=v) for v in self.values]
+
+    def to_numpy(self, np):
+        return np.frombuffer(self.values, dtype=np.int64).view('datetime64[us]').copy()
+
+    def to_pandas(self, pd, np):
+        return pd.Series(self.to_numpy(np)).dt.tz_localize('UTC')
+
+    def to_arrow(self, pa, np):
+        values = np.frombuffer(self.values, dtype=np.int64)
+        return pa.array(values, type=pa.timestamp('us', tz='UTC'), mask=self._mask(np))
+
+
+def column_for(prop, decimals='float'):
+    """
+    Create a column buffer matching the property type
+
+    :param decimals: ``'float'`` or ``'decimal'``
+    :return: Column instance
+    """
+    if isinstance(prop, IntegerProperty):
+        return Int64Column(prop)
+    if isinstance(prop, FloatProperty):
+        return Float64Column(prop)
+    if isinstance(prop, DecimalProperty):
+        if decimals == 'decimal':
+            return Column(prop)
+        return Float64Column(prop)
+    if isinstance(prop, DatetimeProperty):
+        return DatetimeColumn(prop)
+    if isinstance(prop, BooleanProperty):
+        return BooleanColumn(prop)
+    return Column(prop)
+
+
+class ColumnReader(object):
+    """
+    Collects result rows into column buffers
+
+    :param properties: Properties to read
+    :param decimals: Read ``DecimalProperty`` values as ``'float'`` or ``'decimal'``
+    """
+
+    def __init__(self, properties, decimals='float'):
+        if decimals not in ('float', 'decimal'):
+            raise ODataError('decimals must be "float" or "decimal", got {0}'.format(decimals))
+        self.columns = [column_for(prop, decimals) for prop in properties]
+
+    def add(self, rows):
+        """
+        Append a page of raw rows to the columns
+        """
+        if not rows:
+            return
+        for column in self.columns:
+            name = column.name
+            column.extend([row.get(name) for row in rows])
+
+    def to_lists(self):
+        """
+        :return: Dictionary of column names and lists of values
+        """
+        return dict((c.name, c.to_list()) for c in self.columns)
+
+    def to_numpy(self):
+        """
+        :return: Dictionary of column names and NumPy arrays
+        """
+        np = _import('numpy')
+        return dict((c.name, c.to_numpy(np)) for c in self.columns)
+
+    def to_pandas(self):
+        """
+        :return: pandas DataFrame
+        """
+        np = _import('numpy')
+        pd = _import('pandas')
+        return pd.DataFrame(dict((c.name, c.to_pandas(pd, np)) for c in self.columns),
+                            columns=[c.name for c in self.columns])
+
+    def to_arrow(self):
+        """
+        :return: pyarrow Table
+        """
+        np = _import('numpy')
+        pa = _import('pyarrow')
+        return pa.table([c.to_arrow(pa, np) for c in self.columns],
+                        names=[c.name for c in self.columns])
@@ -1,16 +1,31 @@
 # -*- coding: utf-8 -*-
 
-import json
+import asyncio
 import functools
+import hashlib
 import logging
+import threading
+import time
+import uuid
+import weakref
 
 import requests
-from requests.exceptions import RequestException
+from requests.exceptions import RequestException, ConnectionError, Timeout, ChunkedEncodingError, \
+    ContentDecodingError
+from urllib3.exceptions import ProtocolError, DecodeError, ReadTimeoutError
 
 from odata import version
+from odata import batch
+from odata.cache import cache_key
+from odata.codec import get_codec
+from odata.timeout import current_deadline, request_timeout
 from .exceptions import ODataError, ODataConnectionError
 
 
+RETRY_ERRORS = (ConnectionError, Timeout, ChunkedEncodingError)
+BODY_CHUNK_SIZE = 65536
+
+
 def catch_requests_errors(fn):
     @functools.wraps(fn)
     def inner(*args, **kwargs):
@@ -21,7 +36,72 @@ def catch_requests_errors(fn):
     return inner
 
 
+def iter_body(response, chunk_size=BODY_CHUNK_SIZE):
+    """
+    Iterate the body of a response sent with ``stream=True`` as the data
+    arrives. ``Response.iter_content`` waits until ``chunk_size`` bytes have
+    been received
+
+    :return: Iterator of chunks of at most ``chunk_size`` bytes
+    """
+    read1 = getattr(response.raw, 'read1', None)
+    if read1 is None:
+        # urllib3 1.x
+        for chunk in response.iter_content(chunk_size):
+            yield chunk
+        return
+    try:
+        while True:
+            chunk = read1(chunk_size, decode_content=True)
+            if not chunk:
+                return
+            yield chunk
+    except ProtocolError as e:
+        raise ChunkedEncodingError(e)
+    except DecodeError as e:
+        raise ContentDecodingError(e)
+    except ReadTimeoutError as e:
+        raise ConnectionError(e)
+
+
+_scope_tokens = weakref.WeakKeyDictionary()
+_scope_lock = threading.Lock()
+
+
+def _scope_token(obj):
+    """
+    :return: Random token identifying ``obj`` for as long as it exists
+    """
+    try:
+        with _scope_lock:
+            token = _scope_tokens.get(obj)
+            if token is None:
+                token = _scope_tokens[obj] = uuid.uuid4().hex
+            return token
+    except TypeError:
+        # can not be tracked, never share its responses
+        return uuid.uuid4().hex
+
+
+def _fingerprint(*values):
+    return hashlib.sha256(repr(values).encode('utf-8')).hexdigest()
+
+
 class ODataConnection(object):
+    """
+    Blocking connection to an endpoint, built on a Requests session
+
+    :param session: Custom Requests session
+    :param auth: Custom Requests auth object
+    :param codec: JSON codec instance or name, see :py:mod:`odata.codec`
+    :param retry: :py:class:`~odata.retry.RetryPolicy` for failed requests. None to raise errors right away
+    :param http_cache: :py:class:`~odata.httpcache.HTTPCache` for GET responses
+    :param single_flight: :py:class:`~odata.singleflight.SingleFlight` that coalesces identical concurrent GET requests
+    :param throttle: :py:class:`~odata.throttle.Throttle` that limits requests per host
+    :param circuit_breaker: :py:class:`~odata.circuit.CircuitBreaker` that fails requests fast while the endpoint is down
+    :param timeout: Request timeout in seconds, or a tuple of connect and read timeouts. Defaults to :py:attr:`timeout`
+    :param pool: :py:class:`~odata.pool.ConnectionPool` for the session. Not applied to a custom ``session``
+    """
 
     base_headers = {
         'Accept': 'application/json',
@@ -29,103 +109,367 @@ class ODataConnection(object):
         'User-Agent': 'python-odata {0}'.format(version),
     }
     timeout = 90
+    """Default request timeout in seconds, or a tuple of connect and read timeouts"""
+    is_async = False
+    is_batch = False
 
-    def __init__(self, session=None, auth=None):
-        if session is None:
+    def __init__(self, session=None, auth=None, codec=None, retry=None, http_cache=None,
+                 single_flight=None, throttle=None, circuit_breaker=None, timeout=None,
+                 pool=None):
+        self.log = logging.getLogger('odata.connection')
+        self.session = session
+        self.own_session = session is None
+        self.pool = pool
+        self._init_session()
+        self.auth = auth
+        self.codec = get_codec(codec)
+        self.retry = retry
+        self.http_cache = http_cache
+        self.single_flight = single_flight
+        self.throttle = throttle
+        self.circuit_breaker = circuit_breaker
+        if timeout is not None:
+            self.timeout = timeout
+
+    def _init_session(self):
+        if self.session is None:
             self.session = requests.Session()
+        if self.pool is None:
+            return
+        if self.own_session:
+            self.pool.mount(self.session)
         else:
-            self.session = session
-        self.auth = auth
-        self.log = logging.getLogger('odata.connection')
+            # custom adapters of the session (authentication, retries,
+            # certificate pinning) must not be replaced
+            self.log.warning(u'Connection pool settings are not applied to a custom session')
 
     def _apply_options(self, kwargs):
-        kwargs['timeout'] = self.timeout
-
         if self.auth is not None:
             kwargs['auth'] = self.auth
 
+    def _retry_delay(self, method, url, attempt, started, status=None, retry_after=None):
+        """
+        :return: Seconds to wait before retrying a failed attempt, or None to give up
+        """
+        if self.retry is None:
+            return
+        elapsed = time.monotonic() - started
+        delay = self.retry.get_delay(method, attempt, elapsed, status, retry_after)
+        current = current_deadline()
+        if delay is not None and current is not None and delay >= current.remaining():
+            delay = None
+        if delay is not None:
+            reason = 'HTTP {0}'.format(status) if status else 'connection error'
+            self.log.warning(u'{0} {1} failed ({2}), retrying in {3:.2f}s'.format(method, url, reason, delay))
+        return delay
+
+    def _send(self, method, url, **kwargs):
+        """
+        Send a request with the session, retrying failed attempts as the
+        retry policy allows
+        """
+        send = getattr(self.session, method.lower())
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self._send_once(send, url, kwargs)
+            except RETRY_ERRORS:
+                delay = self._retry_delay(method, url, attempt, started)
+                if delay is None:
+                    self._check_deadline()
+                    raise
+            else:
+                delay = self._retry_delay(method, url, attempt, started, response.status_code,
+                                          response.headers.get('Retry-After'))
+                if delay is None:
+                    return response
+                response.close()
+            self.retry.sleep(delay)
+
+    def _send_once(self, send, url, kwargs):
+        kwargs['timeout'] = request_timeout(self.timeout)
+        if self.throttle is None and self.circuit_breaker is None:
+            return self._send_request(send, url, kwargs)
+        slot = self._begin_attempt(url)
+        status = None
+        try:
+            if slot is not None:
+                # waiting for the throttle used up some of the deadline
+                kwargs['timeout'] = request_timeout(self.timeout)
+            response = self._send_request(send, url, kwargs)
+            status = response.status_code
+            return response
+        finally:
+            self._finish_attempt(slot, status)
+
+    def _send_request(self, send, url, kwargs):
+        """
+        Send a request. Under a deadline the body is read as it arrives and
+        the deadline is checked between reads, because the read timeout
+        only limits each read
+        """
+        current = current_deadline()
+        if current is None or kwargs.get('stream'):
+            return send(url, **kwargs)
+        response = send(url, **dict(kwargs, stream=True))
+        try:
+            chunks = []
+            for chunk in iter_body(response):
+                current.check()
+                chunks.append(chunk)
+            response._content = b''.join(chunks)
+            response._content_consumed = True
+        finally:
+            response.close()
+        return response
+
+    def _begin_attempt(self, url):
+        """
+        :return: :py:class:`~odata.throttle.Slot` of the request, or None without a throttle
+        """
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_request(url)
+        if self.throttle is not None:
+            try:
+                return self.throttle.acquire(url, current_deadline())
+            except BaseException:
+                self._cancel_attempt()
+                raise
+
+    def _cancel_attempt(self):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.cancel()
+
+    def _check_deadline(self):
+        """
+        :raises DeadlineExceeded: The deadline of the current request has passed
+        """
+        current = current_deadline()
+        if current is not None:
+            current.check()
+
+    def _finish_attempt(self, slot, status=None):
+        """
+        Report the outcome of a sent request to the throttle and the circuit breaker
+        """
+        if slot is not None:
+            slot.release(status)
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(status)
+
     @catch_requests_errors
     def _do_get(self, *args, **kwargs):
         self._apply_options(kwargs)
-        return self.session.get(*args, **kwargs)
+        return self._send('GET', *args, **kwargs)
 
     @catch_requests_errors
     def _do_post(self, *args, **kwargs):
         self._apply_options(kwargs)
-        return self.session.post(*args, **kwargs)
+        return self._send('POST', *args, **kwargs)
 
     @catch_requests_errors
     def _do_patch(self, *args, **kwargs):
         self._apply_options(kwargs)
-        return self.session.patch(*args, **kwargs)
+        return self._send('PATCH', *args, **kwargs)
 
     @catch_requests_errors
     def _do_delete(self, *args, **kwargs):
         self._apply_options(kwargs)
-        return self.session.delete(*args, **kwargs)
+        return self._send('DELETE', *args, **kwargs)
 
     def _handle_odata_error(self, response):
         try:
             response.raise_for_status()
         except:
-            status_code = 'HTTP {0}'.format(response.status_code)
-            code = 'None'
-            message = 'Server did not supply any error messages'
-            detailed_message = 'None'
             response_ct = response.headers.get('content-type', '')
-
+            errordata = None
             if 'application/json' in response_ct:
-                errordata = response.json()
-
-                if 'error' in errordata:
-                    odata_error = errordata.get('error')
-
-                    if 'code' in odata_error:
-                        code = odata_error.get('code') or code
-                    if 'message' in odata_error:
-                        message = odata_error.get('message') or message
-                    if 'innererror' in odata_error:
-                        ie = odata_error['innererror']
-                        detailed_message = ie.get('message') or detailed_message
-
-            msg = ' | '.join([status_code, code, message, detailed_message])
-            err = ODataError(msg)
-            err.status_code = status_code
-            err.code = code
-            err.message = message
-            err.detailed_message = detailed_message
-            raise err
-
-    def execute_get(self, url, params=None):
-        headers = {}
-        headers.update(self.base_headers)
+                errordata = self.codec.loads(response.content)
+            self._raise_odata_error(response.status_code, errordata)
+
+    def _raise_odata_error(self, status_code, errordata=None):
+        status_code = 'HTTP {0}'.format(status_code)
+        code = 'None'
+        message = 'Server did not supply any error messages'
+        detailed_message = 'None'
+
+        if errordata and 'error' in errordata:
+            odata_error = errordata.get('error')
+
+            if 'code' in odata_error:
+                code = odata_error.get('code') or code
+            if 'message' in odata_error:
+                message = odata_error.get('message') or message
+            if 'innererror' in odata_error:
+                ie = odata_error['innererror']
+                detailed_message = ie.get('message') or detailed_message
+
+        msg = ' | '.join([status_code, code, message, detailed_message])
+        err = ODataError(msg)
+        err.status_code = status_code
+        err.code = code
+        err.message = message
+        err.detailed_message = detailed_message
+        raise err
+
+    def credential_scope(self):
+        """
+        Identify the credentials of the connection, to keep the cached and
+        coalesced responses of different users apart. Username and password
+        credentials are identified by a hash of their values. Other
+        authentication objects and custom sessions only match themselves,
+        within the process
+
+        :return: String, or None if the connection sends no credentials
+        """
+        parts = []
+        auth = self.auth
+        if isinstance(auth, tuple):
+            parts.append(_fingerprint(type(auth).__name__, tuple(auth)))
+        elif hasattr(auth, 'username') and hasattr(auth, 'password'):
+            parts.append(_fingerprint(type(auth).__name__, auth.username, auth.password))
+        elif auth is not None:
+            parts.append(_scope_token(auth))
+        if not self.own_session:
+            parts.append(_scope_token(self.session))
+        return '-'.join(parts) or None
+
+    def _flight_key(self, url, params, headers):
+        """
+        :return: Key of a GET request for :py:attr:`single_flight`. Requests
+            with different credentials are never coalesced
+        """
+        return self.credential_scope(), cache_key(url, params, headers)
+
+    def execute_get(self, url, params=None, headers=None, info=None):
+        """
+        :param headers: Additional request headers, for example ``Prefer``
+        :param info: Dictionary that receives the response ``size`` in bytes
+        """
+        if self.single_flight is None:
+            return self._get(url, params, headers, info)
+        if info is not None:
+            info['size'] = 0
+        key = self._flight_key(url, params, headers)
+        return self.single_flight.call(key, lambda: self._get(url, params, headers, info))
+
+    def _get(self, url, params, headers, info):
+        headers = dict(self.base_headers, **(headers or {}))
 
         self.log.info(u'GET {0}'.format(url))
         if params:
             self.log.info(u'Query: {0}'.format(params))
 
-        response = self._do_get(url, params=params, headers=headers)
-        self._handle_odata_error(response)
-        response_ct = response.headers.get('content-type', '')
-        if response.status_code == requests.codes.no_content:
+        if self.http_cache is not None:
+            status, response_ct, body = self._cached_get(url, params, headers, info)
+        else:
+            response = self._do_get(url, params=params, headers=headers)
+            self._handle_odata_error(response)
+            if info is not None:
+                info['size'] = len(response.content)
+            status = response.status_code
+            response_ct = response.headers.get('content-type', '')
+            body = response.content
+
+        if status == requests.codes.no_content:
             return
         if 'application/json' in response_ct:
-            data = response.json()
-            return data
+            return self.codec.loads(body)
         else:
             msg = u'Unsupported response Content-Type: {0}'.format(response_ct)
             raise ODataError(msg)
 
+    def _cached_get(self, url, params, headers, info):
+        """
+        GET through the HTTP cache, revalidating stored responses
+
+        :return: Tuple of status code, Content-Type and body
+        """
+        key, entry, fresh = self.http_cache.lookup(url, params, headers,
+                                                   scope=self.credential_scope())
+        if fresh:
+            if info is not None:
+                info['size'] = 0
+            return requests.codes.ok, entry['content_type'], entry['body']
+
+        headers = dict(headers, **self.http_cache.conditional_headers(entry))
+        response = self._do_get(url, params=params, headers=headers)
+        self._handle_odata_error(response)
+        if info is not None:
+            info['size'] = len(response.content)
+        return self.http_cache.update(key, entry, response.status_code, response.headers,
+                                      response.content)
+
+    def execute_get_stream(self, url, params=None, headers=None, chunk_size=65536):
+        """
+        GET a JSON response without reading the whole body to memory. The
+        request is sent when iteration starts
+
+        :param headers: Additional request headers
+        :param chunk_size: Maximum bytes to read at a time
+        :return: Iterator of body chunks
+        """
+        headers = dict(self.base_headers, **(headers or {}))
+
+        self.log.info(u'GET {0}'.format(url))
+        if params:
+            self.log.info(u'Query: {0}'.format(params))
+
+        response = self._do_get(url, params=params, headers=headers, stream=True)
+        try:
+            self._handle_odata_error(response)
+            if response.status_code == requests.codes.no_content:
+                return
+            response_ct = response.headers.get('content-type', '')
+            if 'application/json' not in response_ct:
+                msg = u'Unsupported response Content-Type: {0}'.format(response_ct)
+                raise ODataError(msg)
+            try:
+                for chunk in iter_body(response, chunk_size):
+                    self._check_deadline()
+                    yield chunk
+            except RequestException as e:
+                raise ODataConnectionError(str(e))
+        finally:
+            response.close()
+
+    def execute_count(self, url, params=None):
+        """
+        GET a ``/$count`` resource
+
+        :return: Integer
+        """
+        headers = {}
+        headers.update(self.base_headers)
+        headers['Accept'] = 'text/plain'
+
+        self.log.info(u'GET {0}'.format(url))
+        if params:
+            self.log.info(u'Query: {0}'.format(params))
+
+        response = self._do_get(url, params=params, headers=headers)
+        self._handle_odata_error(response)
+        return self._parse_count(response.content.decode('utf-8-sig'))
+
+    def _parse_count(self, text):
+        try:
+            return int(text.strip().lstrip(u'\ufeff'))
+        except ValueError:
+            msg = u'Unexpected $count response: {0}'.format(text[:100])
+            raise ODataError(msg)
+
     def execute_post(self, url, data, params=None):
         headers = {
             'Content-Type': 'application/json',
         }
         headers.update(self.base_headers)
 
-        data = json.dumps(data)
+        data = self.codec.dumps(data)
 
         self.log.info(u'POST {0}'.format(url))
-        self.log.info(u'Payload: {0}'.format(data))
+        self._log_payload(data)
 
         response = self._do_post(url, data=data, headers=headers, params=params)
         self._handle_odata_error(response)
@@ -133,7 +477,7 @@ class ODataConnection(object):
         if response.status_code == requests.codes.no_content:
             return
         if 'application/json' in response_ct:
-            return response.json()
+            return self.codec.loads(response.content)
         # no exceptions here, POSTing to Actions may not return data
 
     def execute_patch(self, url, data):
@@ -142,14 +486,18 @@ class ODataConnection(object):
         }
         headers.update(self.base_headers)
 
-        data = json.dumps(data)
+        data = self.codec.dumps(data)
 
         self.log.info(u'PATCH {0}'.format(url))
-        self.log.info(u'Payload: {0}'.format(data))
+        self._log_payload(data)
 
         response = self._do_patch(url, data=data, headers=headers)
         self._handle_odata_error(response)
 
+    def _log_payload(self, data):
+        if self.log.isEnabledFor(logging.INFO):
+            self.log.info(u'Payload: {0}'.format(data.decode('utf-8')))
+
     def execute_delete(self, url):
         headers = {}
         headers.update(self.base_headers)
@@ -158,3 +506,351 @@ class ODataConnection(object):
 
         response = self._do_delete(url, headers=headers)
         self._handle_odata_error(response)
+
+    def execute_batch(self, url, batch_requests, json_format=False):
+        """
+        Send multiple requests in a single ``$batch`` call
+
+        :param url: Address of the ``$batch`` endpoint
+        :param batch_requests: List of :py:class:`~odata.batch.BatchRequest`
+        :param json_format: Use the JSON batch format instead of ``multipart/mixed``
+        :return: List of :py:class:`~odata.batch.BatchResponse`, in the same order as the requests
+        """
+        base_url = url[:url.rindex('/') + 1]
+        if json_format:
+            data, content_type = batch.encode_json(batch_requests, base_url, codec=self.codec)
+        else:
+            data, content_type = batch.encode_multipart(batch_requests, base_url, codec=self.codec)
+
+        headers = {
+            'Content-Type': content_type,
+        }
+        headers.update(self.base_headers)
+        if not json_format:
+            headers['Accept'] = 'multipart/mixed'
+
+        self.log.info(u'POST {0} ({1} requests)'.format(url, len(batch_requests)))
+
+        response = self._do_post(url, data=data, headers=headers)
+        self._handle_odata_error(response)
+        response_ct = response.headers.get('content-type', '')
+
+        if response_ct.startswith('multipart/mixed'):
+            decoded = batch.decode_multipart(response.content, response_ct, codec=self.codec)
+            return batch.match_multipart_responses(batch_requests, decoded)
+        if 'application/json' in response_ct:
+            decoded = batch.decode_json(self.codec.loads(response.content))
+            return [decoded.get(str(r.content_id)) for r in batch_requests]
+
+        msg = u'Unsupported response Content-Type: {0}'.format(response_ct)
+        raise ODataError(msg)
+
+
+class AsyncODataConnection(ODataConnection):
+    """
+    Non-blocking connection to an endpoint, built on an aiohttp
+    ``ClientSession``. All ``execute_*`` methods are coroutines. Requires
+    the optional ``aiohttp`` dependency
+
+    :param session: Custom aiohttp ClientSession. Created on first use if not given
+    :param auth: ``aiohttp.BasicAuth`` instance or a ``(username, password)`` tuple
+    :param codec: JSON codec instance or name, see :py:mod:`odata.codec`
+    :param retry: :py:class:`~odata.retry.RetryPolicy` for failed requests
+    :param http_cache: :py:class:`~odata.httpcache.HTTPCache` for GET responses
+    :param single_flight: :py:class:`~odata.singleflight.SingleFlight` that coalesces identical concurrent GET requests
+    :param throttle: :py:class:`~odata.throttle.Throttle` that limits requests per host
+    :param circuit_breaker: :py:class:`~odata.circuit.CircuitBreaker` that fails requests fast while the endpoint is down
+    :param timeout: Request timeout in seconds, or a tuple of connect and read timeouts
+    :param pool: :py:class:`~odata.pool.ConnectionPool` settings for the session created on first use
+    """
+    is_async = True
+
+    def __init__(self, session=None, auth=None, codec=None, retry=None, http_cache=None,
+                 single_flight=None, throttle=None, circuit_breaker=None, timeout=None,
+                 pool=None):
+        super(AsyncODataConnection, self).__init__(
+            session=session, auth=auth, codec=codec, retry=retry, http_cache=http_cache,
+            single_flight=single_flight, throttle=throttle, circuit_breaker=circuit_breaker,
+            timeout=timeout, pool=pool)
+
+    def _init_session(self):
+        # The aiohttp session is created on first use, inside the event loop
+        pass
+
+    def _get_session(self):
+        if self.session is None:
+            aiohttp = _import_aiohttp()
+            options = self.pool.aiohttp_options() if self.pool is not None else {}
+            self.session = aiohttp.ClientSession(**options)
+        return self.session
+
+    def _apply_options(self, kwargs):
+        aiohttp = _import_aiohttp()
+        auth = self.auth
+        if isinstance(auth, tuple):
+            auth = aiohttp.BasicAuth(*auth)
+        if auth is not None:
+            kwargs['auth'] = auth
+
+    async def _request(self, method, url, info=None, decode=True, **kwargs):
+        """
+        :param decode: Decode the body. If False, the response headers and body bytes are returned instead
+        :return: Tuple of status code, Content-Type and decoded body
+        """
+        aiohttp = _import_aiohttp()
+        self._apply_options(kwargs)
+        params = kwargs.pop('params', None)
+        if params:
+            kwargs['params'] = dict((k, str(v)) for k, v in params.items())
+
+        session = self._get_session()
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            kwargs['timeout'] = self._client_timeout()
+            slot = await self._begin_attempt(url)
+            status = None
+            try:
+                if slot is not None:
+                    kwargs['timeout'] = self._client_timeout()
+                async with session.request(method, url, **kwargs) as response:
+                    status = response.status
+                    delay = self._retry_delay(method, url, attempt, started, response.status,
+                                              response.headers.get('Retry-After'))
+                    if delay is None:
+                        return await self._read_response(response, info, decode)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = self._retry_delay(method, url, attempt, started)
+                if delay is None:
+                    self._check_deadline()
+                    raise ODataConnectionError(str(e) or e.__class__.__name__)
+            finally:
+                self._finish_attempt(slot, status)
+            await asyncio.sleep(delay)
+
+    async def _begin_attempt(self, url):
+        """
+        :return: :py:class:`~odata.throttle.Slot` of the request, or None without a throttle
+        """
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_request(url)
+        if self.throttle is not None:
+            try:
+                return await self.throttle.acquire_async(url, current_deadline())
+            except BaseException:
+                self._cancel_attempt()
+                raise
+
+    def _client_timeout(self):
+        """
+        :return: ``aiohttp.ClientTimeout`` for the next request
+        """
+        aiohttp = _import_aiohttp()
+        connect, read = request_timeout(self.timeout)
+        current = current_deadline()
+        return aiohttp.ClientTimeout(total=current.remaining() if current is not None else None,
+                                     sock_connect=connect, sock_read=read)
+
+    async def _read_response(self, response, info, decode=True):
+        body = await response.read()
+        if info is not None:
+            info['size'] = len(body)
+        if not decode:
+            return response.status, response.headers, body
+        response_ct = response.headers.get('content-type', '')
+        return response.status, response_ct, self._decode_body(response.status, response_ct, body,
+                                                              response.charset)
+
+    def _decode_body(self, status, response_ct, body, charset=None):
+        if 'application/json' in response_ct and status != 204:
+            if body.strip():
+                return self.codec.loads(body)
+            return
+        return body.decode(charset or 'utf-8', 'replace')
+
+    def _check_odata_error(self, status_code, errordata):
+        if status_code >= 400:
+            if not isinstance(errordata, dict):
+                errordata = None
+            self._raise_odata_error(status_code, errordata)
+
+    def execute_batch(self, url, batch_requests, json_format=False):
+        raise ODataError('$batch requests are not supported by AsyncODataConnection')
+
+    async def execute_get(self, url, params=None, headers=None, info=None):
+        if self.single_flight is None:
+            return await self._get(url, params, headers, info)
+        if info is not None:
+            info['size'] = 0
+        key = self._flight_key(url, params, headers)
+        return await self.single_flight.call_async(key, lambda: self._get(url, params, headers, info))
+
+    async def _get(self, url, params, headers, info):
+        headers = dict(self.base_headers, **(headers or {}))
+
+        self.log.info(u'GET {0}'.format(url))
+        if params:
+            self.log.info(u'Query: {0}'.format(params))
+
+        if self.http_cache is not None:
+            status, response_ct, data = await self._cached_get(url, params, headers, info)
+        else:
+            status, response_ct, data = await self._request('GET', url, info=info, params=params,
+                                                            headers=headers)
+        self._check_odata_error(status, data)
+        if status == requests.codes.no_content:
+            return
+        if 'application/json' in response_ct:
+            return data
+        else:
+            msg = u'Unsupported response Content-Type: {0}'.format(response_ct)
+            raise ODataError(msg)
+
+    async def _cached_get(self, url, params, headers, info):
+        key, entry, fresh = self.http_cache.lookup(url, params, headers,
+                                                   scope=self.credential_scope())
+        if fresh:
+            if info is not None:
+                info['size'] = 0
+            status, response_ct, body = requests.codes.ok, entry['content_type'], entry['body']
+        else:
+            headers = dict(headers, **self.http_cache.conditional_headers(entry))
+            status, response_headers, body = await self._request('GET', url, info=info, decode=False,
+                                                                 params=params, headers=headers)
+            if status < 400:
+                status, response_ct, body = self.http_cache.update(key, entry, status,
+                                                                   response_headers, body)
+            else:
+                response_ct = response_headers.get('content-type', '')
+        return status, response_ct, self._decode_body(status, response_ct, body)
+
+    async def execute_get_stream(self, url, params=None, headers=None, chunk_size=65536):
+        """
+        See :py:func:`ODataConnection.execute_get_stream`
+
+        :return: Asynchronous iterator of body chunks
+        """
+        aiohttp = _import_aiohttp()
+        headers = dict(self.base_headers, **(headers or {}))
+
+        self.log.info(u'GET {0}'.format(url))
+        if params:
+            self.log.info(u'Query: {0}'.format(params))
+
+        kwargs = dict(headers=headers)
+        self._apply_options(kwargs)
+        if params:
+            kwargs['params'] = dict((k, str(v)) for k, v in params.items())
+
+        session = self._get_session()
+        started = time.monotonic()
+        attempt = 0
+        streaming = False
+        while True:
+            attempt += 1
+            kwargs['timeout'] = self._client_timeout()
+            slot = await self._begin_attempt(url)
+            finished = False
+            try:
+                if slot is not None:
+                    kwargs['timeout'] = self._client_timeout()
+                async with session.request('GET', url, **kwargs) as response:
+                    finished = True
+                    self._finish_attempt(slot, response.status)
+                    response_ct = response.headers.get('content-type', '')
+                    delay = self._retry_delay('GET', url, attempt, started, response.status,
+                                              response.headers.get('Retry-After'))
+                    if delay is None:
+                        if response.status >= 400:
+                            errordata = None
+                            if 'application/json' in response_ct:
+                                errordata = self.codec.loads(await response.read())
+                            self._check_odata_error(response.status, errordata)
+                        if response.status == requests.codes.no_content:
+                            return
+                        if 'application/json' not in response_ct:
+                            msg = u'Unsupported response Content-Type: {0}'.format(response_ct)
+                            raise ODataError(msg)
+                        streaming = True
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            yield chunk
+                        return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # a partially read body can not be retried
+                delay = None if streaming else self._retry_delay('GET', url, attempt, started)
+                if delay is None:
+                    self._check_deadline()
+                    raise ODataConnectionError(str(e) or e.__class__.__name__)
+            finally:
+                if not finished:
+                    self._finish_attempt(slot)
+            await asyncio.sleep(delay)
+
+    async def execute_count(self, url, params=None):
+        headers = {}
+        headers.update(self.base_headers)
+        headers['Accept'] = 'text/plain'
+
+        self.log.info(u'GET {0}'.format(url))
+        if params:
+            self.log.info(u'Query: {0}'.format(params))
+
+        status, _, data = await self._request('GET', url, params=params, headers=headers)
+        self._check_odata_error(status, data)
+        return self._parse_count(str(data))
+
+    async def execute_post(self, url, data, params=None):
+        headers = {
+            'Content-Type': 'application/json',
+        }
+        headers.update(self.base_headers)
+
+        data = self.codec.dumps(data)
+
+        self.log.info(u'POST {0}'.format(url))
+        self._log_payload(data)
+
+        status, response_ct, response_data = await self._request(
+            'POST', url, data=data, headers=headers, params=params)
+        self._check_odata_error(status, response_data)
+        if status == requests.codes.no_content:
+            return
+        if 'application/json' in response_ct:
+            return response_data
+
+    async def execute_patch(self, url, data):
+        headers = {
+            'Content-Type': 'application/json',
+        }
+        headers.update(self.base_headers)
+
+        data = self.codec.dumps(data)
+
+        self.log.info(u'PATCH {0}'.format(url))
+        self._log_payload(data)
+
+        status, _, response_data = await self._request('PATCH', url, data=data, headers=headers)
+        self._check_odata_error(status, response_data)
+
+    async def execute_delete(self, url):
+        headers = {}
+        headers.update(self.base_headers)
+
+        self.log.info(u'DELETE {0}'.format(url))
+
+        status, _, response_data = await self._request('DELETE', url, headers=headers)
+        self._check_odata_error(status, response_data)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+def _import_aiohttp():
+    try:
+        import aiohttp
+    except ImportError:
+        raise ODataError('aiohttp is required for asynchronous connections')
+    return aiohttp
@@ -2,21 +2,54 @@
 
 import logging
 
-from odata.query import Query
-from odata.connection import ODataConnection
+from odata.query import Query, AsyncQuery
+from odata.connection import ODataConnection, AsyncODataConnection
+from odata.batch import Batch
 from odata.exceptions import ODataError
+from odata import timeout as timeouts
 
 
 class Context:
 
-    def __init__(self, session=None, auth=None):
+    def __init__(self, session=None, auth=None, url=None, cache=None, codec=None, retry=None,
+                 http_cache=None, single_flight=None, throttle=None,
+                 circuit_breaker=None, timeout=None, pool=None):
         self.log = logging.getLogger('odata.context')
-        self.connection = ODataConnection(session=session, auth=auth)
+        self.connection = ODataConnection(session=session, auth=auth, codec=codec, retry=retry,
+                              http_cache=http_cache, single_flight=single_flight,
+                              throttle=throttle, circuit_breaker=circuit_breaker,
+                              timeout=timeout, pool=pool)
+        self.url = url
+        self.cache = cache
 
     def query(self, entitycls):
-        q = Query(entitycls, connection=self.connection)
+        q = Query(entitycls, connection=self.connection, cache=self.cache)
         return q
 
+    def timeout(self, value):
+        """
+        Context manager that sets the timeout of the requests made within
+        it, instead of the timeout of the connection:
+
+        .. code-block:: python
+
+            >>> with context.timeout((1, 5)):
+            ...     context.save(order)
+
+        :param value: Seconds, or a tuple of connect and read timeouts
+        """
+        return timeouts.timeout(value)
+
+    def deadline(self, seconds):
+        """
+        Context manager that limits the total time of the requests made
+        within it, including retries and navigation property loads. See
+        :py:mod:`odata.timeout`
+
+        :param seconds: Seconds from now
+        """
+        return timeouts.deadline(seconds)
+
     def call(self, action_or_function, **parameters):
         """
         Call a defined Action or Function using this Context's connection
@@ -37,6 +70,21 @@ class Context:
         parameters['__connection__'] = self.connection
         return action_or_function.with_query(query)(**parameters)
 
+    def batch(self, json_format=False, raise_on_error=True):
+        """
+        Collect requests to be sent in a single ``$batch`` call. See
+        :py:mod:`odata.batch`
+
+        :param json_format: Use the JSON batch format instead of ``multipart/mixed``
+        :param raise_on_error: Raise the first failed request's error after the batch has been executed
+        :return: Batch instance
+        :rtype: Batch
+        """
+        if self.url is None:
+            raise ODataError('Context has no service url, cannot send $batch requests')
+        return Batch(self, self.url, json_format=json_format,
+                     raise_on_error=raise_on_error)
+
     def delete(self, entity):
         """
         Creates a DELETE call to the service, deleting the entity
@@ -47,8 +95,7 @@ class Context:
         self.log.info(u'Deleting entity: {0}'.format(entity))
         url = entity.__odata__.instance_url
         self.connection.execute_delete(url)
-        entity.__odata__.persisted = False
-        self.log.info(u'Success')
+        self._finish_delete(entity)
 
     def save(self, entity, force_refresh=True):
         """
@@ -76,6 +123,11 @@ class Context:
 
         :type entity: EntityBase
         """
+        url, insert_data = self._prepare_insert(entity)
+        saved_data = self.connection.execute_post(url, insert_data)
+        self._finish_insert(entity, saved_data)
+
+    def _prepare_insert(self, entity):
         url = entity.__odata_url__()
         if url is None:
             msg = 'Cannot insert Entity that does not belong to EntitySet: {0}'.format(entity)
@@ -85,7 +137,10 @@ class Context:
 
         es = entity.__odata__
         insert_data = es.data_for_insert()
-        saved_data = self.connection.execute_post(url, insert_data)
+        return url, insert_data
+
+    def _finish_insert(self, entity, saved_data):
+        es = entity.__odata__
         es.reset()
         es.connection = self.connection
         es.persisted = True
@@ -93,6 +148,7 @@ class Context:
         if saved_data is not None:
             es.update(saved_data)
 
+        self._invalidate_cache(entity)
         self.log.info(u'Success')
 
     def _update_existing(self, entity, force_refresh=True):
@@ -101,6 +157,23 @@ class Context:
 
         :type entity: EntityBase
         """
+        url, patch_data = self._prepare_update(entity)
+        if url is None:
+            return
+
+        saved_data = self.connection.execute_patch(url, patch_data)
+        entity.__odata__.reset()
+
+        if saved_data is None and force_refresh:
+            self.log.info(u'Reloading entity from service')
+            saved_data = self.connection.execute_get(url)
+
+        self._finish_update(entity, saved_data)
+
+    def _prepare_update(self, entity):
+        """
+        :return: Tuple of url and PATCH payload. Url is None if there is nothing to update
+        """
         es = entity.__odata__
         if es.instance_url is None:
             msg = 'Cannot update Entity that does not belong to EntitySet: {0}'.format(entity)
@@ -110,20 +183,161 @@ class Context:
 
         if len([i for i in patch_data if not i.startswith('@')]) == 0:
             self.log.debug(u'Nothing to update: {0}'.format(entity))
-            return
+            return None, patch_data
 
         self.log.info(u'Updating existing entity: {0}'.format(entity))
+        return es.instance_url, patch_data
 
-        url = es.instance_url
+    def _finish_update(self, entity, saved_data):
+        if saved_data is not None:
+            entity.__odata__.update(saved_data)
 
-        saved_data = self.connection.execute_patch(url, patch_data)
-        es.reset()
+        self._invalidate_cache(entity)
+        self.log.info(u'Success')
+
+    def _finish_delete(self, entity):
+        entity.__odata__.persisted = False
+        self._invalidate_cache(entity)
+        self.log.info(u'Success')
+
+    def _invalidate_cache(self, entity):
+        if self.cache is not None:
+            self.cache.invalidate(entity.__odata_collection__)
+
+
+class AsyncContext(Context):
+    """
+    A Context for use with asyncio. Communicates with the endpoint through
+    an :py:class:`~odata.connection.AsyncODataConnection`, so all the
+    network-bound methods are coroutines:
+
+    .. code-block:: python
+
+        async with Service.create_async_context() as context:
+            async for order in context.query(Order):
+                customer = await context.load(order, Order.Customer)
+                order.ShipCity = customer.City
+                await context.save(order)
+
+    Requires the optional ``aiohttp`` dependency.
+    """
+
+    def __init__(self, session=None, auth=None, url=None, cache=None, codec=None, retry=None,
+                 http_cache=None, single_flight=None, throttle=None,
+                 circuit_breaker=None, timeout=None, pool=None):
+        self.log = logging.getLogger('odata.context')
+        self.connection = AsyncODataConnection(session=session, auth=auth, codec=codec, retry=retry,
+                                   http_cache=http_cache, single_flight=single_flight,
+                                   throttle=throttle, circuit_breaker=circuit_breaker,
+                                   timeout=timeout, pool=pool)
+        self.url = url
+        self.cache = cache
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """
+        Close the underlying aiohttp session
+        """
+        await self.connection.close()
+
+    def query(self, entitycls):
+        q = AsyncQuery(entitycls, connection=self.connection, cache=self.cache)
+        return q
+
+    def batch(self, json_format=False, raise_on_error=True):
+        raise ODataError('$batch requests are not supported by AsyncContext')
+
+    async def call(self, action_or_function, **parameters):
+        """
+        Call a defined Action or Function using this Context's connection
+
+        :param action_or_function: Action/Function instance on a Entity class
+        :param parameters: Keyword parameters to pass to Action/Function
+        """
+        parameters['__connection__'] = self.connection
+        return await action_or_function(**parameters)
+
+    async def call_with_query(self, action_or_function, query, **parameters):
+        """
+        Call a defined Action or Function using this Context's connection.
+
+        :param action_or_function: Action/Function instance on a Entity class
+        :param parameters: Keyword parameters to pass to Action/Function
+        """
+        parameters['__connection__'] = self.connection
+        return await action_or_function.with_query(query)(**parameters)
+
+    async def load(self, entity, navigation_property):
+        """
+        Load a navigation property of an entity. Once loaded, the value is
+        also available through normal attribute access
+
+        :param entity: Entity instance
+        :param navigation_property: NavigationProperty on the Entity class, for example ``Order.Customer``
+        :return: Related Entity instance, a list of them or None
+        """
+        return await navigation_property.load_async(entity, self.connection)
+
+    async def count(self, entity, navigation_property):
+        """
+        Return the number of related entities in a collection navigation
+        property, without loading the collection
+
+        :param entity: Entity instance
+        :param navigation_property: Collection NavigationProperty on the Entity class
+        :return: Integer
+        """
+        return await navigation_property.count_async(entity, self.connection)
+
+    async def delete(self, entity):
+        """
+        Creates a DELETE call to the service, deleting the entity
+
+        :type entity: EntityBase
+        :raises ODataConnectionError: Delete not allowed or a serverside error. Server returned an HTTP error code
+        """
+        self.log.info(u'Deleting entity: {0}'.format(entity))
+        url = entity.__odata__.instance_url
+        await self.connection.execute_delete(url)
+        self._finish_delete(entity)
+
+    async def save(self, entity, force_refresh=True):
+        """
+        Creates a POST or PATCH call to the service. If the entity already has
+        a primary key, an update is called. Otherwise the entity is inserted
+        as new. Updating an entity will only send the changed values
+
+        :param entity: Model instance to insert or update
+        :type entity: EntityBase
+        :param force_refresh: Read full entity data again from service after PATCH call
+        :raises ODataConnectionError: Invalid data or serverside error. Server returned an HTTP error code
+        """
+
+        if self.is_entity_saved(entity):
+            await self._update_existing(entity, force_refresh=force_refresh)
+        else:
+            await self._insert_new(entity)
+
+    async def _insert_new(self, entity):
+        url, insert_data = self._prepare_insert(entity)
+        saved_data = await self.connection.execute_post(url, insert_data)
+        self._finish_insert(entity, saved_data)
+
+    async def _update_existing(self, entity, force_refresh=True):
+        url, patch_data = self._prepare_update(entity)
+        if url is None:
+            return
+
+        saved_data = await self.connection.execute_patch(url, patch_data)
+        entity.__odata__.reset()
 
         if saved_data is None and force_refresh:
             self.log.info(u'Reloading entity from service')
-            saved_data = self.connection.execute_get(url)
+            saved_data = await self.connection.execute_get(url)
 
-        if saved_data is not None:
-            entity.__odata__.update(saved_data)
-
-        self.log.info(u'Success')
+        self._finish_update(entity, saved_data)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+Change tracking
+===============
+
+Endpoints that support change tracking return a delta link after the last
+page of a query that asked for it with
+:py:func:`~odata.query.Query.track_changes`. The delta link is available
+from the iterator once the results have been read:
+
+.. code-block:: python
+
+    >>> rows = iter(Service.query(Customer).track_changes())
+    >>> customers = list(rows)
+    >>> rows.delta_link
+    "http://services.example.com/Customers?$deltatoken=8015"
+
+The delta link is a plain string, so it can be stored anywhere between runs.
+:py:func:`~odata.query.Query.from_delta` later reads the changes made since
+the link was returned, as :py:class:`EntityChanged` and
+:py:class:`EntityRemoved` events. Once all events have been read, the
+iterator holds the next delta link:
+
+.. code-block:: python
+
+    >>> events = Service.query(Customer).from_delta(stored_link)
+    >>> for event in events:
+    ...     if event.kind == 'removed':
+    ...         forget(event.id)
+    ...     else:
+    ...         upsert(event.entity)
+    >>> stored_link = events.delta_link
+
+Both the OData 4.0 ``$deletedEntity`` and the 4.01 ``@removed`` formats
+of deleted entities are recognized. Added and changed links between
+entities are skipped.
+
+----
+
+API
+---
+"""
+
+
+class EntityChanged(object):
+    """
+    An entity was added or changed
+
+    :param entity: Entity instance, or the row type of the query
+    """
+    kind = 'changed'
+
+    def __init__(self, entity):
+        self.entity = entity
+
+    def __repr__(self):
+        return '<EntityChanged({0})>'.format(self.entity)
+
+
+class EntityRemoved(object):
+    """
+    An entity was deleted, or no longer matches the tracked query
+
+    :param id: Entity id, for example ``Customers('ALFKI')``. None if the endpoint did not give one and the key properties are missing
+    :param reason: ``'deleted'``, ``'changed'`` or None
+    :param data: Raw delta entry, including any key properties the endpoint returned
+    """
+    kind = 'removed'
+
+    def __init__(self, id, reason=None, data=None):
+        self.id = id
+        self.reason = reason
+        self.data = data or {}
+
+    def __repr__(self):
+        return '<EntityRemoved({0}, {1})>'.format(self.id, self.reason)
+
+
+def entry_context(row):
+    """
+    :return: Context url of a delta entry, or an empty string
+    """
+    return row.get('@odata.context') or row.get('@context') or ''
+
+
+def is_removed(row):
+    return '@removed' in row or entry_context(row).endswith('/$deletedEntity')
+
+
+def is_link(row):
+    context = entry_context(row)
+    return context.endswith('/$link') or context.endswith('/$deletedLink')
@@ -83,10 +83,53 @@ except ImportError:
     # noinspection PyUnresolvedReferences
     from urlparse import urljoin
 
-from odata.state import EntityState
-
-
-class EntityBase(object):
+from odata.state import EntityState, PropertyRegistry
+from odata.property import PropertyBase, NavigationProperty
+
+
+class EntityMeta(type):
+    """
+    Metaclass for Entity classes. Keeps a per-class
+    :py:class:`~odata.state.PropertyRegistry` so instances do not need to
+    inspect their class on every access. The registry is compiled on first
+    use and invalidated when properties are assigned to the class later on,
+    as reflection and manually declared relationships do
+    """
+
+    @property
+    def __odata_registry__(cls):
+        registry = cls.__dict__.get('_odata_registry')
+        if registry is None:
+            registry = PropertyRegistry(cls)
+            type.__setattr__(cls, '_odata_registry', registry)
+        return registry
+
+    def __setattr__(cls, key, value):
+        old_value = cls.__dict__.get(key)
+        super(EntityMeta, cls).__setattr__(key, value)
+        if _is_property(value) or _is_property(old_value):
+            cls._invalidate_registry()
+
+    def __delattr__(cls, key):
+        old_value = cls.__dict__.get(key)
+        super(EntityMeta, cls).__delattr__(key)
+        if _is_property(old_value):
+            cls._invalidate_registry()
+
+    def _invalidate_registry(cls):
+        pending = [cls]
+        while pending:
+            current = pending.pop()
+            if current.__dict__.get('_odata_registry') is not None:
+                type.__setattr__(current, '_odata_registry', None)
+            pending.extend(type.__subclasses__(current))
+
+
+def _is_property(value):
+    return isinstance(value, (PropertyBase, NavigationProperty))
+
+
+class EntityBase(object, metaclass=EntityMeta):
     __odata_service__ = None
     __odata_collection__ = None
     __odata_type__ = 'ODataSchema.Entity'
@@ -105,17 +148,26 @@ class EntityBase(object):
 
         if 'from_data' in kwargs:
             raw_data = kwargs.pop('from_data')
+            partial = kwargs.pop('partial', False)
+            expand = kwargs.pop('expand', None) or {}
 
             # check for values from $expand
             for prop_name, prop in es.navigation_properties:
                 if prop.name in raw_data:
                     expanded_data = raw_data.pop(prop.name)
+                    option = expand.get(prop.name)
+                    instances = prop.instances_from_data(expanded_data,
+                                                         partial=option is not None and option.partial,
+                                                         expand=option and option.expanded)
                     if prop.is_collection:
-                        es.nav_cache[prop.name] = dict(collection=prop.instances_from_data(expanded_data))
+                        es.nav_cache[prop.name] = dict(collection=instances)
                     else:
-                        es.nav_cache[prop.name] = dict(single=prop.instances_from_data(expanded_data))
+                        es.nav_cache[prop.name] = dict(single=instances)
 
             for prop_name, prop in es.properties:
+                if partial and prop.name not in raw_data:
+                    # not selected in a restricted $expand
+                    continue
                 i.__odata__[prop.name] = raw_data.get(prop.name)
 
             i.__odata__.persisted = True
@@ -35,6 +35,22 @@ class ODataConnectionError(ODataError):
     pass
 
 
+class CircuitOpenError(ODataConnectionError):
+    """
+    Raised without sending a request while the
+    :py:class:`~odata.circuit.CircuitBreaker` of the connection is open
+    """
+    pass
+
+
+class DeadlineExceeded(ODataConnectionError):
+    """
+    Raised when the deadline of a request has passed, see
+    :py:mod:`odata.timeout`
+    """
+    pass
+
+
 class ODataQueryError(ODataError):
     pass
 
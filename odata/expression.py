@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+
+"""
+Filter expressions
+==================
+
+Comparing a property to a value creates an expression node instead of a
+plain string. Nodes can be combined with ``&``, ``|`` and ``~``:
+
+.. code-block:: python
+
+    >>> (Order.ShipCity == 'Oulu') | ~Order.ShipName.startswith('X')
+    "ShipCity eq 'Oulu' or not (startswith(ShipName, 'X'))"
+    >>> Order.Lines.any(OrderLine.Quantity > 10)
+    'Lines/any(x: x/Quantity gt 10)'
+
+Expressions are also strings of the rendered filter, so code that formats or
+joins the results of property comparisons keeps working.
+
+Bind parameters
+---------------
+
+A value can be left open with :py:func:`bindparam`. Values are given with
+:py:func:`~odata.query.Query.params`, or when executing a compiled query:
+
+.. code-block:: python
+
+    >>> from odata.expression import bindparam
+    >>> by_id = Service.query(Order).filter(Order.OrderID == bindparam('id')).compile()
+    >>> by_id.first(id=10248)
+    <Entity(Orders(10248))>
+
+:py:func:`~odata.query.Query.compile` renders the query options once. Each
+execution only escapes the new values and substitutes them into the
+rendered template.
+
+----
+
+API
+---
+"""
+
+from odata.exceptions import ODataQueryError
+
+
+class BindParam(object):
+    """
+    Placeholder for a value that is given when the query is executed
+
+    :param name: Name of the parameter
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return '<BindParam({0})>'.format(self.name)
+
+
+def bindparam(name):
+    """
+    Create a placeholder for a value that is given when the query is executed
+
+    :param name: Name of the parameter
+    :return: BindParam instance
+    """
+    return BindParam(name)
+
+
+class Slot(object):
+    """
+    Position of a bind parameter in a rendered expression
+    """
+    def __init__(self, name, escape, many=False):
+        self.name = name
+        self.escape = escape
+        self.many = many
+
+    def render(self, value):
+        if self.many:
+            return ','.join(str(self.escape(i)) for i in value)
+        return str(self.escape(value))
+
+    @property
+    def placeholder(self):
+        return '@' + self.name
+
+
+def resolver(values, strict=True):
+    """
+    Create a function that renders slots with the given parameter values
+
+    :param values: Dictionary of parameter values
+    :param strict: Raise ODataQueryError for missing values instead of rendering a placeholder
+    """
+    values = values or {}
+
+    def resolve(slot):
+        if slot.name not in values:
+            if strict:
+                raise ODataQueryError('No value given for bind parameter: {0}'.format(slot.name))
+            return slot.placeholder
+        return slot.render(values[slot.name])
+    return resolve
+
+
+def _concat(pieces):
+    """
+    Merge adjacent strings of a piece list
+    """
+    merged = []
+    for piece in pieces:
+        if merged and isinstance(piece, str) and isinstance(merged[-1], str):
+            merged[-1] += piece
+        else:
+            merged.append(piece)
+    return merged
+
+
+def _pieces_of(operand, prefix, depth):
+    if isinstance(operand, Expression):
+        return operand._pieces(prefix, depth)
+    return [str(operand)]
+
+
+def _render(pieces, resolve):
+    return ''.join(resolve(p) if isinstance(p, Slot) else p for p in pieces)
+
+
+class Expression(str):
+    """
+    Base class of filter expression nodes. The string value of a node is
+    the rendered filter, with ``@name`` in place of unbound parameters
+    """
+
+    def __new__(cls, *args):
+        pieces = _concat(cls._build('', 0, *args))
+        node = str.__new__(cls, _render(pieces, resolver(None, strict=False)))
+        node.args = args
+        node.pieces = pieces
+        node.params = frozenset(p.name for p in pieces if isinstance(p, Slot))
+        return node
+
+    @staticmethod
+    def _build(prefix, depth, *args):
+        """
+        :param prefix: Prefix of property paths, used inside lambda expressions
+        :param depth: Lambda nesting depth
+        :return: List of strings and Slots
+        """
+        raise NotImplementedError()
+
+    def _pieces(self, prefix, depth):
+        if not prefix and not depth:
+            return self.pieces
+        return self._build(prefix, depth, *self.args)
+
+    def __getnewargs__(self):
+        return self.args
+
+    def __repr__(self):
+        return '<{0}({1})>'.format(self.__class__.__name__, str.__repr__(self))
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __rand__(self, other):
+        return And(other, self)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __ror__(self, other):
+        return Or(other, self)
+
+    def __invert__(self):
+        return Not(self)
+
+    def render(self, values=None, resolve=None):
+        """
+        Render the expression with values for its bind parameters
+
+        :param values: Dictionary of parameter values
+        :param resolve: Function rendering a Slot, used instead of ``values``
+        :return: String
+        :raises ODataQueryError: A parameter has no value
+        """
+        if not self.params:
+            return str(self)
+        return _render(self.pieces, resolve or resolver(values))
+
+
+def _value_piece(prop, value):
+    if isinstance(value, BindParam):
+        return Slot(value.name, prop.escape_value)
+    return str(prop.escape_value(value))
+
+
+class Comparison(Expression):
+    """
+    ``Property op value``, where op is one of ``eq``, ``ne``, ``gt``,
+    ``ge``, ``lt`` or ``le``
+    """
+
+    @property
+    def op(self):
+        return self.args[0]
+
+    @property
+    def prop(self):
+        return self.args[1]
+
+    @property
+    def value(self):
+        return self.args[2]
+
+    @staticmethod
+    def _build(prefix, depth, op, prop, value):
+        return [u'{0}{1} {2} '.format(prefix, prop.name, op), _value_piece(prop, value)]
+
+
+class In(Expression):
+    """
+    ``Property in (value1,value2)``
+    """
+
+    @property
+    def prop(self):
+        return self.args[0]
+
+    @property
+    def values(self):
+        return self.args[1]
+
+    @staticmethod
+    def _build(prefix, depth, prop, values):
+        pieces = [u'{0}{1} in ('.format(prefix, prop.name)]
+        if isinstance(values, BindParam):
+            pieces.append(Slot(values.name, prop.escape_value, many=True))
+        else:
+            pieces.append(','.join(str(prop.escape_value(i)) for i in values))
+        pieces.append(')')
+        return pieces
+
+
+class Function(Expression):
+    """
+    Call to a boolean function, for example ``startswith(Name, 'A')``
+    """
+
+    @property
+    def name(self):
+        return self.args[0]
+
+    @property
+    def prop(self):
+        return self.args[1]
+
+    @staticmethod
+    def _build(prefix, depth, name, prop, value):
+        return [u'{0}({1}{2}, '.format(name, prefix, prop.name), _value_piece(prop, value), ')']
+
+
+class And(Expression):
+    """
+    Operands joined with ``and``. Operands that are ``or`` expressions are
+    grouped with parentheses
+    """
+
+    @staticmethod
+    def _build(prefix, depth, *operands):
+        pieces = []
+        for i, operand in enumerate(operands):
+            if i:
+                pieces.append(' and ')
+            if isinstance(operand, Or) and len(operands) > 1:
+                pieces.append('(')
+                pieces.extend(_pieces_of(operand, prefix, depth))
+                pieces.append(')')
+            else:
+                pieces.extend(_pieces_of(operand, prefix, depth))
+        return pieces
+
+
+class Or(Expression):
+    """
+    Operands joined with ``or``
+    """
+
+    @staticmethod
+    def _build(prefix, depth, *operands):
+        pieces = []
+        for i, operand in enumerate(operands):
+            if i:
+                pieces.append(' or ')
+            pieces.extend(_pieces_of(operand, prefix, depth))
+        return pieces
+
+
+class Not(Expression):
+    """
+    ``not (expression)``
+    """
+
+    @staticmethod
+    def _build(prefix, depth, operand):
+        return ['not ('] + _pieces_of(operand, prefix, depth) + [')']
+
+
+class Grouped(Expression):
+    """
+    ``(expression)``
+    """
+
+    @staticmethod
+    def _build(prefix, depth, operand):
+        return ['('] + _pieces_of(operand, prefix, depth) + [')']
+
+
+class Lambda(Expression):
+    """
+    ``any`` or ``all`` over a collection navigation property. Properties in
+    the inner expression refer to the related entities:
+
+    .. code-block:: python
+
+        >>> Order.Lines.any(OrderLine.Quantity > 10)
+        'Lines/any(x: x/Quantity gt 10)'
+    """
+
+    @staticmethod
+    def _build(prefix, depth, method, nav, operand=None):
+        path = u'{0}{1}/{2}('.format(prefix, nav.name, method)
+        if operand is None:
+            return [path, ')']
+        variable = 'x' if depth == 0 else 'x{0}'.format(depth)
+        pieces = [u'{0}{1}: '.format(path, variable)]
+        pieces.extend(_pieces_of(operand, variable + '/', depth + 1))
+        pieces.append(')')
+        return pieces
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+"""
+HTTP caching
+============
+
+An :py:class:`HTTPCache` keeps the bodies of GET responses together with
+their ``ETag``, ``Last-Modified`` and ``Cache-Control`` headers. A stored
+response is served without a request while it is fresh according to
+``Cache-Control: max-age``. Otherwise the request is sent with
+``If-None-Match`` and ``If-Modified-Since`` headers, and a ``304 Not
+Modified`` response is answered from the store:
+
+.. code-block:: python
+
+    >>> from odata.httpcache import HTTPCache, SQLiteStore
+    >>> cache = HTTPCache(SQLiteStore('/var/cache/myapp/odata.sqlite'))
+    >>> Service = ODataService(url, http_cache=cache)
+    >>> countries = Service.query(Country).all()  # 200, stored
+    >>> countries = Service.query(Country).all()  # 304, body read from the store
+    >>> cache.stats['hit_ratio']
+    0.5
+
+Responses with ``Cache-Control: no-store``, or without validators or a
+``max-age``, are not stored. Responses with ``Cache-Control: private`` are
+not stored in stores shared by several processes.
+
+Stores
+------
+
+:py:class:`MemoryStore` keeps entries in a least recently used dictionary
+of the process. :py:class:`SQLiteStore` keeps them in an SQLite database
+file that several processes can share. Any object with ``get``, ``set``,
+``delete`` and ``clear`` methods can be used as a store. Stores with a
+true ``shared`` attribute do not receive private responses.
+
+Entries are kept per credentials: a Context created with other ``auth``
+or its own ``session`` does not read the responses stored for another,
+see :py:func:`~odata.connection.ODataConnection.credential_scope`.
+Username and password credentials are identified by a hash of their
+values, so the entries of other authentication methods and custom
+sessions are not shared between processes.
+
+Streamed responses (:py:func:`~odata.query.Query.stream`) are not cached.
+
+----
+
+API
+---
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from odata.cache import cache_key
+
+
+class MemoryStore(object):
+    """
+    Thread-safe LRU store of cache entries in memory
+
+    :param max_entries: Maximum number of stored responses
+    """
+    shared = False
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        :return: Entry dictionary or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteStore(object):
+    """
+    Store of cache entries in an SQLite database file, which can be shared
+    by several processes. The least recently used entries are removed when
+    the store grows over ``max_entries``
+
+    :param path: Database file path
+    :param max_entries: Maximum number of stored responses
+    :param timeout: Seconds to wait for a lock held by another process
+    """
+    columns = ('body', 'etag', 'last_modified', 'expires', 'content_type')
+    shared = True
+
+    def __init__(self, path, max_entries=10000, timeout=10):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS odata_cache ('
+                       'key TEXT PRIMARY KEY, body BLOB, etag TEXT, last_modified TEXT, '
+                       'expires REAL, content_type TEXT, accessed REAL)')
+            db.execute('CREATE INDEX IF NOT EXISTS odata_cache_accessed ON odata_cache (accessed)')
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM odata_cache').fetchone()[0]
+
+    def get(self, key):
+        db = self._connect()
+        row = db.execute('SELECT body, etag, last_modified, expires, content_type '
+                         'FROM odata_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return
+        with db:
+            db.execute('UPDATE odata_cache SET accessed = ? WHERE key = ?', (time.time(), key))
+        entry = dict(zip(self.columns, row))
+        entry['body'] = bytes(entry['body'])
+        return entry
+
+    def set(self, key, entry):
+        values = [entry.get(c) for c in self.columns]
+        with self._connect() as db:
+            db.execute('INSERT OR REPLACE INTO odata_cache '
+                       '(key, body, etag, last_modified, expires, content_type, accessed) '
+                       'VALUES (?, ?, ?, ?, ?, ?, ?)', [key] + values + [time.time()])
+            db.execute('DELETE FROM odata_cache WHERE key IN ('
+                       'SELECT key FROM odata_cache ORDER BY accessed DESC, rowid DESC LIMIT -1 OFFSET ?)',
+                       (self.max_entries,))
+
+    def delete(self, key):
+        with self._connect() as db:
+            db.execute('DELETE FROM odata_cache WHERE key = ?', (key,))
+
+    def clear(self):
+        with self._connect() as db:
+            db.execute('DELETE FROM odata_cache')
+
+    def close(self):
+        """
+        Close the database connection of the current thread
+        """
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+def parse_cache_control(value):
+    """
+    :return: Dictionary of ``Cache-Control`` directives. Directives without a value map to True
+    """
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else True
+    return directives
+
+
+class HTTPCache(object):
+    """
+    Conditional cache of GET responses. Used by the connection of a
+    Service or a Context, see the module documentation
+
+    :param store: Entry store. Defaults to a :py:class:`MemoryStore`
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else MemoryStore()
+        self._lock = threading.Lock()
+        self.hits = 0
+        """Responses served from the store without a request"""
+        self.revalidations = 0
+        """Responses served from the store after a ``304 Not Modified`` response"""
+        self.misses = 0
+        """Responses downloaded in full"""
+
+    def __repr__(self):
+        return '<HTTPCache {0}>'.format(self.store.__class__.__name__)
+
+    @property
+    def stats(self):
+        """
+        Dictionary of hits, revalidations, misses and the hit ratio: the
+        share of requests answered with a stored body
+        """
+        with self._lock:
+            served = self.hits + self.revalidations
+            total = served + self.misses
+            return dict(hits=self.hits, revalidations=self.revalidations, misses=self.misses,
+                        hit_ratio=float(served) / total if total else 0.0)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def lookup(self, url, params=None, headers=None, scope=None):
+        """
+        Find the stored response of a request
+
+        :param scope: Credentials of the request, see :py:func:`~odata.connection.ODataConnection.credential_scope`
+        :return: Tuple of cache key, entry or None and True if the entry is fresh. A fresh entry can be used without a request
+        """
+        key = cache_key(url, params, headers)
+        if scope:
+            key = scope + ' ' + key
+        entry = self.store.get(key)
+        fresh = bool(entry and entry.get('expires') and entry['expires'] > time.time())
+        if fresh:
+            self._count('hits')
+        return key, entry, fresh
+
+    def conditional_headers(self, entry):
+        """
+        :return: Dictionary of validator headers for revalidating ``entry``
+        """
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def update(self, key, entry, status, headers, body):
+        """
+        Store a response, or refresh a stored one after ``304 Not Modified``
+
+        :param entry: Entry from :py:func:`lookup`
+        :param headers: Response headers
+        :return: Tuple of status code, Content-Type and body to use as the response
+        """
+        if status == 304 and entry is not None:
+            self._count('revalidations')
+            entry = dict(entry, expires=self._expires(headers))
+            self.store.set(key, entry)
+            return 200, entry['content_type'], entry['body']
+
+        self._count('misses')
+        if status == 200:
+            self._store(key, headers, body)
+        return status, headers.get('content-type', ''), body
+
+    def _store(self, key, headers, body):
+        directives = parse_cache_control(headers.get('cache-control'))
+        if 'no-store' in directives or ('private' in directives
+                                        and getattr(self.store, 'shared', False)):
+            self.store.delete(key)
+            return
+        entry = dict(
+            body=bytes(body),
+            etag=headers.get('etag'),
+            last_modified=headers.get('last-modified'),
+            expires=self._expires(headers),
+            content_type=headers.get('content-type', ''),
+        )
+        if entry['etag'] or entry['last_modified'] or entry['expires']:
+            self.store.set(key, entry)
+
+    def _expires(self, headers):
+        directives = parse_cache_control(headers.get('cache-control'))
+        if 'no-cache' in directives:
+            return
+        try:
+            max_age = int(directives.get('max-age'))
+        except (TypeError, ValueError):
+            return
+        if max_age > 0:
+            return time.time() + max_age
+
+    def clear(self):
+        """
+        Remove all stored responses
+        """
+        self.store.clear()
@@ -27,6 +27,22 @@ properties:
     # assign for the new Order
     order.Shipper = my_shipper
     Service.save(order)
+
+Expanded navigation properties can be restricted with the same options as
+queries. The options are sent as nested ``$expand`` options:
+
+.. code-block:: python
+
+    >>> query.expand(
+    ...     Order.Customer.select(Customer.CompanyName),
+    ...     Order.Order_Details.filter(OrderDetail.Quantity > 10).limit(5)
+    ...         .expand(OrderDetail.Product.select(Product.ProductName)),
+    ... )
+
+Related entities read from a ``$select`` restricted expansion only have the
+selected properties loaded. A filtered or limited collection is cached on
+the entity as it was returned, so ``order.Order_Details`` then contains only
+the matching entities.
 """
 
 try:
@@ -36,6 +52,9 @@ except ImportError:
     # noinspection PyUnresolvedReferences
     from urlparse import urljoin
 
+from odata.exceptions import ODataError, ODataQueryError
+from odata.expression import Expression, Lambda, And
+
 
 class NavigationProperty(object):
     """
@@ -55,11 +74,79 @@ class NavigationProperty(object):
     def __repr__(self):
         return u'<NavigationProperty to {0}>'.format(self.entitycls)
 
-    def instances_from_data(self, raw_data):
+    def any(self, expression=None):
+        """
+        Filter for entities with at least one related entity matching the
+        expression, or any related entities at all
+
+        :param expression: Filter expression using the properties of the related entity
+        :return: ``Nav/any(x: ...)`` expression
+        """
+        return Lambda('any', self, expression)
+
+    def all(self, expression):
+        """
+        Filter for entities whose related entities all match the expression
+
+        :param expression: Filter expression using the properties of the related entity
+        :return: ``Nav/all(x: ...)`` expression
+        """
+        return Lambda('all', self, expression)
+
+    def instances_from_data(self, raw_data, partial=False, expand=None):
+        """
+        :param partial: Only load the properties present in ``raw_data``, as returned by a restricted ``$expand``
+        :param expand: Dictionary of navigation property names and the :py:class:`ExpandOption` they were expanded with
+        """
+        cls = self.entitycls
         if self.is_collection:
-            return [self.entitycls.__new__(self.entitycls, from_data=d) for d in raw_data]
+            return [cls.__new__(cls, from_data=d, partial=partial, expand=expand) for d in raw_data]
         else:
-            return self.entitycls.__new__(self.entitycls, from_data=raw_data)
+            return cls.__new__(cls, from_data=raw_data, partial=partial, expand=expand)
+
+    # Expand options ###########################################################
+
+    def select(self, *values):
+        """
+        Expand only the given properties of the related entity
+
+        :return: ExpandOption instance
+        """
+        return ExpandOption(self).select(*values)
+
+    def filter(self, value):
+        """
+        Expand only the related entities matching the filter
+
+        :return: ExpandOption instance
+        """
+        return ExpandOption(self).filter(value)
+
+    def order_by(self, *values):
+        """
+        :return: ExpandOption instance
+        """
+        return ExpandOption(self).order_by(*values)
+
+    def limit(self, value):
+        """
+        :return: ExpandOption instance
+        """
+        return ExpandOption(self).limit(value)
+
+    def offset(self, value):
+        """
+        :return: ExpandOption instance
+        """
+        return ExpandOption(self).offset(value)
+
+    def expand(self, *values):
+        """
+        Expand navigation properties of the related entity
+
+        :return: ExpandOption instance
+        """
+        return ExpandOption(self).expand(*values)
 
     def _get_parent_cache(self, instance):
         es = instance.__odata__
@@ -91,31 +178,215 @@ class NavigationProperty(object):
 
         es = instance.__odata__
         connection = es.connection
-        parent_url = es.instance_url
-        new_object = parent_url is None
+        url = self._get_url(instance)
         cache = self._get_parent_cache(instance)
+        cache_key = self._cache_key
 
-        if new_object:
+        if url is None:
             if self.is_collection:
                 return cache.get('collection', [])
             return cache.get('single', None)
 
-        parent_url += '/'
-        url = urljoin(parent_url, self.name)
+        if cache_key not in cache:
+            if connection is not None and connection.is_async:
+                msg = ('Navigation property \'{0}\' is not loaded. Load it '
+                       'with AsyncContext.load()').format(self.name)
+                raise ODataError(msg)
+            raw_data = connection.execute_get(url)
+            self._set_cache_from_data(cache, raw_data)
+        return cache[cache_key]
+
+    async def load_async(self, instance, connection):
+        """
+        Load the related entities with an asynchronous connection and store
+        them in the instance's navigation cache
+
+        :type instance: odata.entity.EntityBase
+        :type connection: odata.connection.AsyncODataConnection
+        :return: Related Entity instance, a list of them or None
+        """
+        url = self._get_url(instance)
+        cache = self._get_parent_cache(instance)
+        if url is not None and self._cache_key not in cache:
+            raw_data = await connection.execute_get(url)
+            self._set_cache_from_data(cache, raw_data)
+        return self.__get__(instance, instance.__class__)
+
+    def count(self, instance):
+        """
+        Return the number of related entities in a collection navigation
+        property, without loading the collection. Uses the ``/$count``
+        resource, unless the collection is already loaded
+
+        .. code-block:: python
+
+            >>> Order.Order_Details.count(order)
+            3
 
+        :type instance: odata.entity.EntityBase
+        :return: Integer
+        """
+        url = self._get_count_url(instance)
+        if url is None:
+            return len(self.__get__(instance, instance.__class__))
+        connection = instance.__odata__.connection
+        if connection is None:
+            connection = instance.__odata_service__.default_context.connection
+        return connection.execute_count(url)
+
+    async def count_async(self, instance, connection):
+        """
+        Return the number of related entities in a collection navigation
+        property with an asynchronous connection
+
+        :type instance: odata.entity.EntityBase
+        :type connection: odata.connection.AsyncODataConnection
+        :return: Integer
+        """
+        url = self._get_count_url(instance)
+        if url is None:
+            return len(self.__get__(instance, instance.__class__))
+        return await connection.execute_count(url)
+
+    def _get_count_url(self, instance):
+        if not self.is_collection:
+            raise ODataError('Navigation property \'{0}\' is not a collection'.format(self.name))
+        url = self._get_url(instance)
+        if url is None or 'collection' in self._get_parent_cache(instance):
+            return
+        return url + '/$count'
+
+    @property
+    def _cache_key(self):
+        if self.is_collection:
+            return 'collection'
+        return 'single'
+
+    def _get_url(self, instance):
+        parent_url = instance.__odata__.instance_url
+        if parent_url is None:
+            return
+        return urljoin(parent_url + '/', self.name)
+
+    def _set_cache_from_data(self, cache, raw_data):
         if self.is_collection:
-            if 'collection' not in cache:
-                raw_data = connection.execute_get(url)
-                if raw_data:
-                    cache['collection'] = self.instances_from_data(raw_data['value'])
-                else:
-                    cache['collection'] = []
-            return cache['collection']
+            if raw_data:
+                cache['collection'] = self.instances_from_data(raw_data['value'])
+            else:
+                cache['collection'] = []
         else:
-            if 'single' not in cache:
-                raw_data = connection.execute_get(url)
-                if raw_data:
-                    cache['single'] = self.instances_from_data(raw_data)
-                else:
-                    cache['single'] = None
-            return cache['single']
+            if raw_data:
+                cache['single'] = self.instances_from_data(raw_data)
+            else:
+                cache['single'] = None
+
+
+class ExpandOption(object):
+    """
+    A navigation property with nested ``$expand`` options. Created with the
+    query builder methods of :py:class:`NavigationProperty` and passed to
+    :py:func:`~odata.query.Query.expand`:
+
+    .. code-block:: python
+
+        >>> str(Order.Customer.select(Customer.CompanyName))
+        'Customer($select=CompanyName)'
+    """
+
+    def __init__(self, prop, options=None):
+        self.prop = prop
+        self.options = options or {}
+
+    def __repr__(self):
+        return '<ExpandOption({0})>'.format(self)
+
+    def __str__(self):
+        options = []
+        _select = self.options.get('$select')
+        if _select:
+            options.append('$select=' + ','.join(_select))
+        _filters = self.options.get('$filter')
+        if _filters:
+            options.append('$filter=' + str(_filters[0] if len(_filters) == 1 else And(*_filters)))
+        _order_by = self.options.get('$orderby')
+        if _order_by:
+            options.append('$orderby=' + ','.join(_order_by))
+        if self.options.get('$top') is not None:
+            options.append('$top={0}'.format(self.options['$top']))
+        if self.options.get('$skip') is not None:
+            options.append('$skip={0}'.format(self.options['$skip']))
+        _expand = self.options.get('$expand')
+        if _expand:
+            options.append('$expand=' + ','.join(_expand))
+        if options:
+            return u'{0}({1})'.format(self.name, ';'.join(options))
+        return self.name
+
+    @property
+    def name(self):
+        return self.prop.name
+
+    @property
+    def partial(self):
+        """
+        The related entities are not returned with all of their properties
+        """
+        return bool(self.options.get('$select'))
+
+    @property
+    def expanded(self):
+        """
+        Dictionary of the nested :py:class:`ExpandOption` instances by
+        navigation property name
+        """
+        return self.options.get('expanded') or {}
+
+    def _with(self, name, value):
+        options = dict(self.options)
+        options[name] = value
+        return ExpandOption(self.prop, options)
+
+    def select(self, *values):
+        """
+        :param values: Properties of the related entity
+        :return: ExpandOption instance
+        """
+        return self._with('$select', self.options.get('$select', ()) + tuple(prop.name for prop in values))
+
+    def filter(self, value):
+        """
+        :param value: Filter expression using the properties of the related entity
+        :return: ExpandOption instance
+        """
+        if isinstance(value, Expression) and value.params:
+            raise ODataQueryError('Bind parameters are not supported in $expand options')
+        return self._with('$filter', self.options.get('$filter', ()) + (value,))
+
+    def order_by(self, *values):
+        """
+        :param values: One or more of Property.asc() or Property.desc()
+        :return: ExpandOption instance
+        """
+        return self._with('$orderby', self.options.get('$orderby', ()) + values)
+
+    def limit(self, value):
+        """
+        :return: ExpandOption instance
+        """
+        return self._with('$top', value)
+
+    def offset(self, value):
+        """
+        :return: ExpandOption instance
+        """
+        return self._with('$skip', value)
+
+    def expand(self, *values):
+        """
+        :param values: Navigation properties of the related entity, or ExpandOptions
+        :return: ExpandOption instance
+        """
+        names = tuple(str(prop) if isinstance(prop, ExpandOption) else prop.name for prop in values)
+        expanded = dict(self.expanded)
+        expanded.update((prop.name, prop) for prop in values if isinstance(prop, ExpandOption))
+        return self._with('$expand', self.options.get('$expand', ()) + names)._with('expanded', expanded)
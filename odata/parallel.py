@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parallel scans
+==============
+
+Splits a query into disjoint partitions that are fetched concurrently.
+Used by :py:func:`~odata.query.Query.parallel`.
+
+Two partitioning strategies are supported:
+
+- ``range``: The minimum and maximum values of the partition property are
+  probed from the endpoint, and the value range is split into equal
+  ``$filter`` bounds. Requires a numeric partition property
+- ``skip``: The number of matching rows is probed from ``/$count``, and the
+  result is split into ``$skip``/``$top`` slices ordered by the partition
+  property
+"""
+
+import contextvars
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from odata.exceptions import ODataQueryError
+from odata.property import IntegerProperty, DecimalProperty, FloatProperty
+
+STRATEGIES = ('range', 'skip')
+NUMERIC_PROPERTIES = (IntegerProperty, DecimalProperty, FloatProperty)
+
+
+def _base_query(query):
+    q = query._new_query()
+    q.options['parallel'] = None
+    q.options['prefetch'] = None
+    return q
+
+
+def _probe_value(query, prop, order):
+    q = _base_query(query)
+    q.options['$select'] = [prop.name]
+    q.options['$orderby'] = [order]
+    q.options['$top'] = 1
+    rows = q.all()
+    if rows:
+        return prop.deserialize(rows[0].get(prop.name))
+
+
+def _range_bounds(low, high, workers):
+    if isinstance(low, int) and isinstance(high, int):
+        step = max(1, -(-(high - low + 1) // workers))
+        bounds = list(range(low, high + 1, step))
+    else:
+        step = (high - low) / workers
+        bounds = [low + step * i for i in range(workers)]
+        bounds = sorted(set(bounds))
+    return bounds
+
+
+def partition(query, workers, partition_by, strategy):
+    """
+    Split the query into disjoint queries
+
+    :return: List of Query instances, ordered by the partition property
+    """
+    if strategy not in STRATEGIES:
+        raise ODataQueryError('Unknown partitioning strategy: {0}'.format(strategy))
+    if query.options.get('$top') is not None or query.options.get('$skip') is not None:
+        raise ODataQueryError('Parallel scans can not be combined with limit() or offset()')
+
+    if strategy == 'skip':
+        total = _base_query(query).count()
+        if total == 0:
+            return []
+        size = max(1, -(-total // workers))
+        base = _base_query(query)
+        if not base.options.get('$orderby'):
+            base = base.order_by(partition_by.asc())
+        return [base.offset(start).limit(size) for start in range(0, total, size)]
+
+    if not isinstance(partition_by, NUMERIC_PROPERTIES):
+        raise ODataQueryError('Range partitioning requires a numeric property, '
+                              'got {0}'.format(partition_by))
+
+    low = _probe_value(query, partition_by, partition_by.asc())
+    high = _probe_value(query, partition_by, partition_by.desc())
+    if low is None or high is None:
+        return []
+
+    base = _base_query(query)
+    bounds = _range_bounds(low, high, workers)
+    partitions = []
+    for i, lower in enumerate(bounds):
+        q = base
+        if i > 0:
+            q = q.filter(partition_by >= lower)
+        if i + 1 < len(bounds):
+            q = q.filter(partition_by < bounds[i + 1])
+        partitions.append(q)
+    return partitions
+
+
+def iter_parallel(query, workers, partition_by, strategy='range',
+                  preserve_order=False, max_pages=None):
+    """
+    Fetch the partitions of a query concurrently and yield the resulting
+    entities
+
+    :param preserve_order: Yield partitions in partition property order
+    :param max_pages: Maximum number of pages fetched but not yet consumed
+    """
+    partitions = partition(query, workers, partition_by, strategy)
+    if not partitions:
+        return
+
+    order_by = query.options.get('$orderby') or []
+    if partition_by.desc() in order_by[:1]:
+        partitions.reverse()
+
+    max_pages = max_pages or workers * 2
+    per_partition = max(1, max_pages // len(partitions))
+    slots = [threading.Semaphore(per_partition) for _ in partitions]
+    stop = threading.Event()
+    pages = queue.Queue()
+
+    def fetch(index, partition_query):
+        try:
+            page_iter = partition_query._iter_page_data()
+            while True:
+                slots[index].acquire()
+                if stop.is_set():
+                    return
+                try:
+                    page = next(page_iter)
+                except StopIteration:
+                    pages.put((index, 'done', None))
+                    return
+                pages.put((index, 'page', page))
+        except Exception as e:
+            pages.put((index, 'error', e))
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    for index, partition_query in enumerate(partitions):
+        executor.submit(contextvars.copy_context().run, fetch, index, partition_query)
+
+    pending = [deque() for _ in partitions]
+    finished = [False] * len(partitions)
+    current = 0
+
+    def take():
+        index, kind, value = pages.get()
+        if kind == 'error':
+            raise value
+        if kind == 'done':
+            finished[index] = True
+        else:
+            pending[index].append(value)
+
+    try:
+        while current < len(partitions):
+            if preserve_order:
+                while not pending[current] and not finished[current]:
+                    take()
+                index = current
+            else:
+                ready = [i for i, p in enumerate(pending) if p]
+                if not ready:
+                    if all(finished):
+                        return
+                    take()
+                    continue
+                index = ready[0]
+
+            if pending[index]:
+                page = pending[index].popleft()
+                slots[index].release()
+                rows, _ = query._read_page(page)
+                for row in rows:
+                    yield query._create_model(row)
+            elif preserve_order:
+                current += 1
+    finally:
+        stop.set()
+        for slot in slots:
+            slot.release()
+        executor.shutdown(wait=False)
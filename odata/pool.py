@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+
+"""
+Connection pooling
+==================
+
+By default every Context has its own Requests session, with pools of ten
+connections per host. Threads beyond that open extra connections that are
+closed after each request, so busy thread pools keep repeating TCP and TLS
+handshakes. A :py:class:`ConnectionPool` sets up the pools of all contexts
+of a service:
+
+.. code-block:: python
+
+    >>> from odata.pool import ConnectionPool
+    >>> pool = ConnectionPool(size=64, block=True, prewarm=16)
+    >>> Service = ODataService(url, pool=pool)
+    >>> # ... run 64 worker threads
+    >>> pool.stats
+    {'size': 64, 'in_use': 61, 'utilization': 0.95, 'checkouts': 18234, 'opened': 64,
+     'waited': 412, 'wait_time': 3.1, 'max_wait': 0.08, 'avg_wait': 0.0002}
+
+The pool applies to the sessions the contexts create themselves. A
+custom ``session`` given to a Service or Context keeps its own transport
+adapters, and a warning is logged.
+
+With ``block=True`` a request waits for a free connection instead of
+opening an extra one. ``prewarm`` connections to the service url are
+opened when the service is created, so the first requests do not pay for
+connecting.
+
+Statistics
+----------
+
+:py:attr:`ConnectionPool.stats` reports the connections in use, their
+share of ``size``, the number of connections taken from the pools and
+opened, and how long requests waited for a free connection.
+
+Asynchronous contexts
+---------------------
+
+Sessions created by :py:class:`~odata.context.AsyncContext` get an aiohttp
+connector with ``size`` connections per host, which always waits for a
+free connection. aiohttp enables ``TCP_NODELAY`` and TCP keep-alive on all
+connections, ``tcp_nodelay``, ``tcp_keepalive`` and ``prewarm`` apply to
+blocking connections only. The connections in use are not counted.
+
+----
+
+API
+---
+"""
+
+import logging
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class ConnectionPool(object):
+    """
+    Connection pool settings and statistics shared by the contexts of a
+    service, see the module documentation
+
+    :param size: Maximum number of connections kept open per host
+    :param block: Wait for a free connection when all are in use, instead of opening an extra connection that is closed after its request
+    :param keep_alive: Reuse connections for following requests. False closes every connection after its response
+    :param tcp_keepalive: Send TCP keep-alive probes on idle connections, so that firewalls and load balancers do not drop them
+    :param tcp_nodelay: Send requests without delay (``TCP_NODELAY``)
+    :param prewarm: Number of connections opened when the service is created
+    """
+
+    def __init__(self, size=10, block=False, keep_alive=True, tcp_keepalive=False, tcp_nodelay=True,
+                 prewarm=0):
+        self.size = size
+        self.block = block
+        self.keep_alive = keep_alive
+        self.tcp_keepalive = tcp_keepalive
+        self.tcp_nodelay = tcp_nodelay
+        self.prewarm = prewarm
+        self.log = logging.getLogger('odata.pool')
+        self._lock = threading.Lock()
+        self._adapter = None
+        self.in_use = 0
+        """Number of connections in use by blocking connections"""
+        self.checkouts = 0
+        """Number of times a connection was taken for a request"""
+        self.opened = 0
+        """Number of connections opened"""
+        self.waited = 0
+        """Number of requests that waited for a free connection"""
+        self.wait_time = 0.0
+        """Total seconds spent waiting for free connections"""
+        self.max_wait = 0.0
+        """Longest wait for a free connection, in seconds"""
+
+    def __repr__(self):
+        return '<ConnectionPool(size={0})>'.format(self.size)
+
+    @property
+    def stats(self):
+        """
+        Dictionary of pool utilization and wait time statistics
+        """
+        with self._lock:
+            return dict(
+                size=self.size,
+                in_use=self.in_use,
+                utilization=float(self.in_use) / self.size if self.size else 0.0,
+                checkouts=self.checkouts,
+                opened=self.opened,
+                waited=self.waited,
+                wait_time=self.wait_time,
+                max_wait=self.max_wait,
+                avg_wait=self.wait_time / self.checkouts if self.checkouts else 0.0,
+            )
+
+    def _checkout(self, wait):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            if wait > 0.001:
+                self.waited += 1
+                self.wait_time += wait
+                self.max_wait = max(self.max_wait, wait)
+
+    def _checkin(self):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def _connection_opened(self):
+        with self._lock:
+            self.opened += 1
+
+    def socket_options(self):
+        """
+        :return: List of socket options for new blocking connections
+        """
+        options = []
+        if self.tcp_nodelay:
+            options.append((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1))
+        if self.tcp_keepalive:
+            options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        return options
+
+    def adapter(self):
+        """
+        :return: Requests transport adapter of the pool. Created on first use and shared by all sessions
+        """
+        with self._lock:
+            if self._adapter is None:
+                self._adapter = _PoolAdapter(self)
+            return self._adapter
+
+    def mount(self, session):
+        """
+        Use the pool for the http and https requests of a Requests session.
+        Replaces the transport adapters of the session
+        """
+        adapter = self.adapter()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+    def warm(self, url, connections=None, session=None):
+        """
+        Open connections to the host of ``url`` ahead of the first requests
+
+        :param url: Url of the host
+        :param connections: Number of connections to open. Defaults to ``prewarm``, at most ``size``
+        :param session: Requests session whose TLS and proxy settings the requests will use
+        :return: Number of connections in the pool of the host
+        """
+        if connections is None:
+            connections = self.prewarm
+        host_pool = self.adapter().host_pool(url, session)
+        return host_pool.warm(min(connections, self.size))
+
+    def aiohttp_options(self):
+        """
+        :return: Keyword arguments for an ``aiohttp.ClientSession`` using the pool settings
+        """
+        from odata.connection import _import_aiohttp
+        aiohttp = _import_aiohttp()
+
+        async def on_queued_start(session, ctx, params):
+            ctx.queued = time.monotonic()
+
+        async def on_queued_end(session, ctx, params):
+            ctx.wait = time.monotonic() - ctx.queued
+
+        async def on_connection(session, ctx, params):
+            self._checkout(getattr(ctx, 'wait', 0))
+            self._checkin()
+
+        async def on_connection_created(session, ctx, params):
+            self._connection_opened()
+            await on_connection(session, ctx, params)
+
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_queued_start.append(on_queued_start)
+        trace.on_connection_queued_end.append(on_queued_end)
+        trace.on_connection_reuseconn.append(on_connection)
+        trace.on_connection_create_end.append(on_connection_created)
+        connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.size,
+                                         force_close=not self.keep_alive)
+        return dict(connector=connector, trace_configs=[trace])
+
+
+class _MeasuredPool(object):
+    """
+    Mixin for urllib3 connection pools that reports to a :py:class:`ConnectionPool`
+    """
+    odata_pool = None
+
+    def _get_conn(self, timeout=None):
+        started = time.monotonic()
+        conn = super(_MeasuredPool, self)._get_conn(timeout)
+        self.odata_pool._checkout(time.monotonic() - started if self.block else 0)
+        return conn
+
+    def _put_conn(self, conn):
+        self.odata_pool._checkin()
+        super(_MeasuredPool, self)._put_conn(conn)
+
+    def warm(self, count):
+        conns = []
+        try:
+            for _ in range(count):
+                conn = super(_MeasuredPool, self)._get_conn() or self._new_conn()
+                conns.append(conn)
+                if conn.sock is None:
+                    conn.connect()
+        finally:
+            for conn in conns:
+                super(_MeasuredPool, self)._put_conn(conn)
+        return len(conns)
+
+
+class _MeasuredConnection(object):
+    """
+    Mixin for urllib3 connections that counts the sockets opened, including
+    reconnects of dropped connections
+    """
+    odata_pool = None
+
+    def connect(self):
+        super(_MeasuredConnection, self).connect()
+        self.odata_pool._connection_opened()
+
+
+def _measured(cls, mixin, pool, **attrs):
+    attrs['odata_pool'] = pool
+    return type('Measured' + cls.__name__, (mixin, cls), attrs)
+
+
+class _PoolAdapter(HTTPAdapter):
+
+    def __init__(self, pool):
+        self.odata_pool = pool
+        super(_PoolAdapter, self).__init__(pool_maxsize=pool.size, pool_block=pool.block)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs['socket_options'] = self.odata_pool.socket_options()
+        super(_PoolAdapter, self).init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        pool = self.odata_pool
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _measured(HTTPConnectionPool, _MeasuredPool, pool,
+                              ConnectionCls=_measured(HTTPConnection, _MeasuredConnection, pool)),
+            'https': _measured(HTTPSConnectionPool, _MeasuredPool, pool,
+                               ConnectionCls=_measured(HTTPSConnection, _MeasuredConnection, pool)),
+        }
+
+    def host_pool(self, url, session=None):
+        """
+        :return: urllib3 connection pool used for requests to ``url`` made with ``session``
+        """
+        session = session or requests.Session()
+        settings = session.merge_environment_settings(url, {}, None, None, None)
+        if hasattr(self, 'get_connection_with_tls_context'):
+            # Requests 2.32 adds the TLS settings to the key of the pool
+            request = requests.Request('GET', url).prepare()
+            return self.get_connection_with_tls_context(request, settings['verify'],
+                                                        settings['proxies'], settings['cert'])
+        return self.get_connection(url, settings['proxies'])
+
+    def send(self, request, *args, **kwargs):
+        if not self.odata_pool.keep_alive:
+            request.headers['Connection'] = 'close'
+        return super(_PoolAdapter, self).send(request, *args, **kwargs)
@@ -13,9 +13,11 @@ At entity class level, these properties are used in querying entities:
 
     >>> import datetime
     >>> Order.ShippedDate > datetime.datetime.now()
-    'ShippedDate gt 2016-02-19T12:02:04.956226'
+    <Comparison('ShippedDate gt 2016-02-19T12:02:04.956226')>
     >>> Service.query(Order).filter(Order.OrderID == 1234)
 
+Comparisons create filter expressions, see :py:mod:`odata.expression`.
+
 Once the entity is instanced, the properties act as data getters and setters:
 
 .. code-block:: python
@@ -56,6 +58,7 @@ import datetime
 import dateutil.parser
 
 from .navproperty import NavigationProperty
+from .expression import BindParam, Comparison, In, Function
 
 
 class PropertyBase(object):
@@ -111,18 +114,17 @@ class PropertyBase(object):
 
         es = instance.__odata__
 
-        if self.name in es:
-            if self.is_collection:
-                data = []
-                for i in (value or []):
-                    data.append(self.serialize(i))
-                new_value = data
-            else:
-                new_value = self.serialize(value)
-            old_value = es[self.name]
-            if new_value != old_value:
-                es[self.name] = new_value
-                es.set_property_dirty(self)
+        if self.is_collection:
+            data = []
+            for i in (value or []):
+                data.append(self.serialize(i))
+            new_value = data
+        else:
+            new_value = self.serialize(value)
+        # properties not loaded by a restricted $expand are always dirty
+        if self.name not in es or new_value != es[self.name]:
+            es[self.name] = new_value
+            es.set_property_dirty(self)
 
     def serialize(self, value):
         """
@@ -163,36 +165,97 @@ class PropertyBase(object):
         return '{0} desc'.format(self.name)
 
     def __eq__(self, other):
-        value = self.escape_value(other)
-        return u'{0} eq {1}'.format(self.name, value)
+        return Comparison('eq', self, other)
 
     def __ne__(self, other):
-        value = self.escape_value(other)
-        return u'{0} ne {1}'.format(self.name, value)
+        return Comparison('ne', self, other)
 
     def __ge__(self, other):
-        value = self.escape_value(other)
-        return u'{0} ge {1}'.format(self.name, value)
+        return Comparison('ge', self, other)
 
     def __gt__(self, other):
-        value = self.escape_value(other)
-        return u'{0} gt {1}'.format(self.name, value)
+        return Comparison('gt', self, other)
 
     def __le__(self, other):
-        value = self.escape_value(other)
-        return u'{0} le {1}'.format(self.name, value)
+        return Comparison('le', self, other)
 
     def __lt__(self, other):
-        value = self.escape_value(other)
-        return u'{0} lt {1}'.format(self.name, value)
+        return Comparison('lt', self, other)
+
+    def in_(self, values):
+        """
+        :param values: Iterable of values, or a :py:class:`~odata.expression.BindParam`
+        :return: ``Property in (...)`` expression
+        """
+        if not isinstance(values, BindParam):
+            values = tuple(values)
+        return In(self, values)
 
     def startswith(self, value):
-        value = self.escape_value(value)
-        return u'startswith({0}, {1})'.format(self.name, value)
+        return Function('startswith', self, value)
 
     def endswith(self, value):
-        value = self.escape_value(value)
-        return u'endswith({0}, {1})'.format(self.name, value)
+        return Function('endswith', self, value)
+
+    def contains(self, value):
+        return Function('contains', self, value)
+
+    def sum(self):
+        return AggregateExpression(self, 'sum')
+
+    def avg(self):
+        return AggregateExpression(self, 'average')
+
+    def min(self):
+        return AggregateExpression(self, 'min')
+
+    def max(self):
+        return AggregateExpression(self, 'max')
+
+    def count_distinct(self):
+        return AggregateExpression(self, 'countdistinct')
+
+
+class AggregateExpression(object):
+    """
+    An aggregation of a property, used with
+    :py:func:`~odata.query.Query.aggregate`. Created with the aggregation
+    methods of properties:
+
+    .. code-block:: python
+
+        >>> str(Order.Freight.sum().label('total'))
+        'Freight with sum as total'
+
+    :param prop: Aggregated property
+    :param method: OData aggregation method
+    :param alias: Name of the aggregated value in results
+    """
+    def __init__(self, prop, method, alias=None):
+        self.prop = prop
+        self.method = method
+        self.alias = alias or '{0}_{1}'.format(prop.name.replace('/', '_'), method)
+
+    def __repr__(self):
+        return '<Aggregate({0})>'.format(self)
+
+    def __str__(self):
+        return u'{0} with {1} as {2}'.format(self.prop.name, self.method, self.alias)
+
+    def label(self, alias):
+        """
+        Set the name of the aggregated value in results
+
+        :return: AggregateExpression instance
+        """
+        return AggregateExpression(self.prop, self.method, alias=alias)
+
+    def deserialize(self, value):
+        if value is None:
+            return
+        if self.method == 'countdistinct':
+            return int(value)
+        return self.prop.deserialize(value)
 
 
 class IntegerProperty(PropertyBase):
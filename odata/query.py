@@ -37,6 +37,23 @@ Navigation properties can be loaded in the same request with
     >>> query.expand(Order.Shipper, Order.Customer)
     >>> order = query.first()
 
+Large result sets are returned in pages. With :py:func:`~Query.prefetch`, the
+following pages are downloaded in the background while the current one is
+being iterated:
+
+.. code-block:: python
+
+    >>> for order in query.prefetch(2):
+    ...     process(order)
+
+Consumers that write rows in batches can iterate whole pages instead, and
+ask the endpoint for a page size with ``Prefer: odata.maxpagesize``:
+
+.. code-block:: python
+
+    >>> for page in query.max_page_size(5000).iter_pages():
+    ...     bulk_insert(page.rows)
+
 ----
 
 API
@@ -45,12 +62,31 @@ API
 
 try:
     # noinspection PyUnresolvedReferences
-    from urllib.parse import urljoin
+    from urllib.parse import urljoin, urlencode, quote_plus
 except ImportError:
     # noinspection PyUnresolvedReferences
     from urlparse import urljoin
+    from urllib import urlencode, quote_plus
+
+import asyncio
+import contextlib
+import contextvars
+import operator
+import threading
+import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 import odata.exceptions as exc
+from odata import parallel, columns, timeout as timeouts
+from odata.expression import Expression, And, Or, Grouped, resolver
+from odata.navproperty import ExpandOption
+from odata.state import format_entity_id
+from odata.cache import cache_key
+from odata.delta import EntityChanged, EntityRemoved, is_removed, is_link
+from odata.stream import JSONStreamParser
 
 
 class Query(object):
@@ -58,31 +94,268 @@ class Query(object):
     This class should not be instantiated directly, but from a
     :py:class:`~odata.service.ODataService` object.
     """
-    def __init__(self, entitycls, connection=None, options=None):
+
+    max_url_length = 2048
+    """Default url length budget of :py:func:`get_many` requests"""
+
+    def __init__(self, entitycls, connection=None, options=None, cache=None):
         self.entity = entitycls
         self.options = options or dict()
         self.connection = connection
+        self.cache = cache
 
     def __iter__(self):
-        url = self._get_url()
-        options = self._get_options()
+        iterator = QueryIterator()
+        iterator._rows = self._start_deadline()._iter_rows(iterator)
+        return iterator
+
+    def _iter_rows(self, iterator, request=None):
+        if self.options.get('stream'):
+            for entity in self._iter_streamed_rows(iterator, request):
+                yield entity
+            return
+
+        parallel_options = self.options.get('parallel')
+        if parallel_options:
+            if self.options.get('track_changes'):
+                raise exc.ODataQueryError('track_changes() can not be combined with parallel()')
+            for entity in parallel.iter_parallel(self, **parallel_options):
+                yield entity
+            return
+
+        pages = self._iter_page_data(request)
+        prefetch = self.options.get('prefetch')
+        if prefetch:
+            pages = _prefetch_pages(pages, prefetch)
+
+        for data in pages:
+            iterator._read_annotations(data)
+            rows, _ = self._read_page(data)
+            for row in rows:
+                yield self._create_model(row)
+
+    def _iter_streamed_rows(self, iterator, request=None):
+        """
+        Parse response pages incrementally, yielding rows as soon as they
+        are complete
+        """
+        self._check_stream()
+        url, options, _ = request or self._first_page_request()
+        while url:
+            parser = JSONStreamParser()
+            chunks = self.connection.execute_get_stream(url, options, headers=self._get_headers(),
+                                                        chunk_size=self.options['stream'])
+            received = False
+            try:
+                for chunk in self._pull(chunks):
+                    received = True
+                    rows = parser.feed(chunk)
+                    iterator._read_annotations(parser.annotations)
+                    for row in rows:
+                        yield self._create_model(row)
+            finally:
+                chunks.close()
+            if not received:
+                return
+            rows, url = self._close_stream(parser, iterator)
+            options = {}  # we get all options in the nextLink url
+            for row in rows:
+                yield self._create_model(row)
+
+    def _check_stream(self):
+        for option in ('keyset', 'parallel', 'prefetch'):
+            if self.options.get(option):
+                raise exc.ODataQueryError('stream() can not be combined with {0}()'.format(option))
+
+    def _close_stream(self, parser, iterator):
+        """
+        Finish parsing a streamed response page
+
+        :return: Tuple of the remaining raw rows and next page url or None
+        """
+        rows = parser.close()
+        data = parser.annotations
+        iterator._read_annotations(data)
+        if parser.has_array:
+            data = dict(data, value=rows)
+        return self._read_page(data)
+
+    def _iter_page_data(self, request=None):
+        """
+        Fetch response pages one by one, following ``@odata.nextLink``
+
+        :param request: First request tuple, instead of the one formatted from the query options
+        """
+        for data, _ in self._iter_responses(request):
+            yield data
+
+    def _iter_responses(self, request=None):
+        """
+        Like :py:func:`_iter_page_data`, with the ``elapsed`` time and
+        ``size`` of each response
+
+        :return: Iterator of (page data, info dictionary) tuples
+        """
+        request = request or self._first_page_request()
+        while request:
+            url, options, _ = request
+            info = dict(size=None)
+            started = time.perf_counter()
+            data = self._execute_get(url, options, self._get_headers(), info=info)
+            info['elapsed'] = time.perf_counter() - started
+            yield data, info
+            request = self._next_page_request(request, data)
+
+    def _execute_get(self, url, params=None, headers=None, info=None):
+        """
+        GET a response, through the result cache if the query has one
+        """
+        if self.cache is None:
+            with self._limits():
+                return self.connection.execute_get(url, params, headers=headers, info=info)
+        key = cache_key(url, params, headers)
+        data = self.cache.get(key)
+        if data is None:
+            with self._limits():
+                data = self.connection.execute_get(url, params, headers=headers, info=info)
+            self.cache.set(key, data, self.entity.__odata_collection__)
+        return data
+
+    @contextlib.contextmanager
+    def _limits(self):
+        """
+        Apply the :py:func:`timeout` and :py:func:`deadline` of the query
+        to the requests made within
+        """
+        with timeouts.timeout(self.options.get('timeout')), \
+                timeouts.deadline(self.options.get('deadline')):
+            yield
+
+    def _start_deadline(self):
+        """
+        Start the clock of the :py:func:`deadline` of the query, so that
+        all requests of one iteration share it
+
+        :return: Query instance
+        """
+        seconds = self.options.get('deadline')
+        if seconds is None or isinstance(seconds, timeouts.Deadline):
+            return self
+        q = self._new_query()
+        q.options['deadline'] = timeouts.Deadline(seconds)
+        return q
+
+    def _pull(self, iterator):
+        """
+        Iterate ``iterator`` with the limits of the query applied to each step
+        """
         while True:
-            data = self.connection.execute_get(url, options)
-            if 'value' in data:
-                value = data.get('value', [])
-                for row in value:
-                    yield self._create_model(row)
-
-                if '@odata.nextLink' in data:
-                    url = urljoin(self.entity.__odata_url_base__, data['@odata.nextLink'])
-                    options = {}  # we get all options in the nextLink url
-                else:
-                    break
-            elif self.entity.__odata_singleton__:
-                yield self._create_model(data)
-                break
-            else:
-                break
+            with self._limits():
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def _get_headers(self):
+        """
+        :return: Dictionary of request headers for the query options, or None
+        """
+        preferences = []
+        if self.options.get('track_changes'):
+            preferences.append('odata.track-changes')
+        if self.options.get('maxpagesize'):
+            preferences.append('odata.maxpagesize={0}'.format(self.options['maxpagesize']))
+        if preferences:
+            return {'Prefer': ','.join(preferences)}
+
+    def _first_page_request(self):
+        """
+        :return: Tuple of url, options and number of rows fetched so far
+        """
+        if self.options.get('keyset'):
+            if self.options.get('track_changes'):
+                raise exc.ODataQueryError('track_changes() can not be combined with keyset()')
+            if self.options.get('$skip') is not None:
+                raise exc.ODataQueryError('keyset() can not be combined with offset()')
+            if self.options.get('$orderby'):
+                raise exc.ODataQueryError('keyset() orders results by key, can not be combined with order_by()')
+            return self._keyset_request(None, None, 0)
+        return self._get_url(), self._get_options(), 0
+
+    def _next_page_request(self, request, data):
+        """
+        :return: Request tuple for the page following ``data``, or None
+        """
+        rows, next_url = self._read_page(data)
+        if self.options.get('keyset'):
+            _, options, fetched = request
+            fetched += len(rows)
+            page_size = options['$top']
+            if not rows or (len(rows) < page_size and next_url is None):
+                return
+            return self._keyset_request(options, rows[-1], fetched)
+
+        if next_url:
+            return next_url, {}, 0  # we get all options in the nextLink url
+
+    def _keyset_request(self, options, last_row, fetched):
+        keyset = self.options['keyset']
+        properties = keyset['properties']
+
+        base_options = self._get_options()
+        limit = base_options.get('$top')
+        page_size = keyset['page_size']
+        if limit is not None:
+            page_size = min(page_size, limit - fetched)
+            if page_size <= 0:
+                return
+
+        options = dict(base_options)
+        options['$top'] = page_size
+        options['$orderby'] = ','.join(prop.asc() for prop in properties)
+        if '$select' in options:
+            selected = options['$select'].split(',')
+            selected.extend(prop.name for prop in properties if prop.name not in selected)
+            options['$select'] = ','.join(selected)
+        if last_row is not None:
+            seek = self._keyset_filter(properties, last_row)
+            if '$filter' in options:
+                seek = '({0}) and ({1})'.format(options['$filter'], seek)
+            options['$filter'] = seek
+        return self._get_url(), options, fetched
+
+    def _keyset_filter(self, properties, last_row):
+        """
+        Filter for rows that come after ``last_row`` in key order. For
+        keys (A, B): ``A gt a or (A eq a and B gt b)``
+        """
+        values = [prop.deserialize(last_row.get(prop.name)) for prop in properties]
+        clauses = []
+        for i, prop in enumerate(properties):
+            parts = [properties[j] == values[j] for j in range(i)]
+            parts.append(prop > values[i])
+            clause = ' and '.join(parts)
+            if len(parts) > 1:
+                clause = self.grouped(clause)
+            clauses.append(clause)
+        return ' or '.join(clauses)
+
+    def _read_page(self, data):
+        """
+        Split a response page to its rows and the url of the next page
+
+        :return: Tuple of raw rows and next page url or None
+        """
+        if 'value' in data:
+            rows = data.get('value', [])
+            next_url = None
+            if '@odata.nextLink' in data:
+                next_url = urljoin(self.entity.__odata_url_base__, data['@odata.nextLink'])
+            return rows, next_url
+        elif self.entity.__odata_singleton__:
+            return [data], None
+        return [], None
 
     def __repr__(self):
         return '<Query for {0}>'.format(self.entity)
@@ -93,9 +366,11 @@ class Query(object):
     def _get_url(self):
         return self.entity.__odata_url__()
 
-    def _get_options(self):
+    def _get_options(self, resolve=None):
         """
         Format current query options to a dict that can be passed to requests
+
+        :param resolve: Function rendering bind parameters, see :py:func:`odata.expression.resolver`
         :return: Dictionary
         """
         options = dict()
@@ -114,7 +389,7 @@ class Query(object):
 
         _filters = self.options.get('$filter')
         if _filters:
-            options['$filter'] = ' and '.join(_filters)
+            options['$filter'] = self._format_filters(_filters, resolve)
 
         _expand = self.options.get('$expand')
         if _expand:
@@ -123,17 +398,100 @@ class Query(object):
         _order_by = self.options.get('$orderby')
         if _order_by:
             options['$orderby'] = ','.join(_order_by)
+
+        if self.options.get('$count'):
+            options['$count'] = 'true'
+
+        _apply = self._get_apply_steps()
+        if _apply:
+            # filters are applied before aggregation
+            if _filters:
+                _apply.insert(0, 'filter({0})'.format(options.pop('$filter')))
+            options['$apply'] = '/'.join(_apply)
         return options
 
+    def _get_apply_steps(self):
+        steps = list(self.options.get('$apply') or [])
+        _group_by = self.options.get('groupby')
+        _aggregate = self.options.get('aggregate')
+
+        aggregate = None
+        if _aggregate:
+            aggregate = 'aggregate({0})'.format(','.join(str(i) for i in _aggregate))
+
+        if _group_by:
+            group_by = '({0})'.format(','.join(prop.name for prop in _group_by))
+            if aggregate:
+                steps.append('groupby({0},{1})'.format(group_by, aggregate))
+            else:
+                steps.append('groupby({0})'.format(group_by))
+        elif aggregate:
+            steps.append(aggregate)
+        return steps
+
+    def _get_count_options(self):
+        """
+        Format the options that apply to a ``/$count`` request
+        :return: Dictionary
+        """
+        options = dict()
+        _filters = self.options.get('$filter')
+        if _filters:
+            options['$filter'] = self._format_filters(_filters)
+        return options
+
+    def _format_filters(self, filters, resolve=None):
+        if not any(isinstance(f, Expression) for f in filters):
+            return ' and '.join(filters)
+        if len(filters) == 1:
+            expression = filters[0]
+        else:
+            expression = And(*filters)
+        if resolve is None and expression.params:
+            resolve = resolver(self.options.get('params'))
+        return expression.render(resolve=resolve)
+
     def _create_model(self, row):
-        if len(self.options.get('$select', [])):
+        if self.options.get('rows'):
+            return self._get_row_factory()(row)
+        if self.options.get('groupby') or self.options.get('aggregate'):
+            return self._get_aggregate_row_class().from_data(row)
+        if len(self.options.get('$select', [])) or self.options.get('$apply'):
             return row
         else:
-            e = self.entity.__new__(self.entity, from_data=row)
-            es = e.__odata__
-            es.connection = self.connection
+            e = self.entity.__new__(self.entity, from_data=row, expand=self.options.get('expanded'))
+            e.__odata__.bind(self.connection)
             return e
 
+    def _get_aggregate_row_class(self):
+        row_class = self.__dict__.get('_aggregate_row_class')
+        if row_class is None:
+            columns = []
+            for prop in self.options.get('groupby') or []:
+                columns.append((prop.name, prop.name.replace('/', '_'), prop.deserialize))
+            for expression in self.options.get('aggregate') or []:
+                columns.append((expression.alias, expression.alias, expression.deserialize))
+            row_class = AggregateRow.create_class(columns)
+            self._aggregate_row_class = row_class
+        return row_class
+
+    def _get_row_factory(self):
+        factory = self.__dict__.get('_row_factory')
+        if factory is None:
+            rows = self.options['rows']
+            columns = [(prop.name, prop.name.replace('/', '_'), prop.deserialize)
+                       for prop in rows['properties']]
+            if rows['tuples']:
+                decoders = tuple((key, decode) for key, _, decode in columns)
+
+                def factory(data):
+                    get = data.get
+                    return tuple([decode(get(key)) for key, decode in decoders])
+            else:
+                factory = Row.create_class(columns).from_data
+            self._row_factory = factory
+        return factory
+
     def _get_or_create_option(self, name):
         if name not in self.options:
             self.options[name] = []
@@ -155,11 +513,28 @@ class Query(object):
         o['$select'] = self.options.get('$select', [])[:]
         o['$filter'] = self.options.get('$filter', [])[:]
         o['$expand'] = self.options.get('$expand', [])[:]
+        o['expanded'] = dict(self.options.get('expanded') or {})
         o['$orderby'] = self.options.get('$orderby', [])[:]
-        return Query(self.entity, options=o, connection=self.connection)
+        o['$count'] = self.options.get('$count', None)
+        o['$apply'] = self.options.get('$apply', [])[:]
+        o['params'] = dict(self.options.get('params') or {})
+        o['rows'] = self.options.get('rows')
+        o['groupby'] = self.options.get('groupby', [])[:]
+        o['aggregate'] = self.options.get('aggregate', [])[:]
+        o['prefetch'] = self.options.get('prefetch', None)
+        o['parallel'] = self.options.get('parallel', None)
+        o['keyset'] = self.options.get('keyset', None)
+        o['track_changes'] = self.options.get('track_changes', None)
+        o['maxpagesize'] = self.options.get('maxpagesize', None)
+        o['stream'] = self.options.get('stream', None)
+        o['timeout'] = self.options.get('timeout', None)
+        o['deadline'] = self.options.get('deadline', None)
+        return self.__class__(self.entity, options=o, connection=self.connection,
+                              cache=self.cache)
 
     def as_string(self):
-        query = self._format_params(self._get_options())
+        options = self._get_options(resolve=resolver(self.options.get('params'), strict=False))
+        query = self._format_params(options)
         return urljoin(self._get_url(), '?{0}'.format(query))
 
     # Query builders ###########################################################
@@ -176,6 +551,26 @@ class Query(object):
             option.append(prop.name)
         return q
 
+    def rows(self, *values, tuples=False):
+        """
+        Fetch only the given properties and return them as lightweight
+        read-only :py:class:`Row` objects instead of Entities. Values are
+        deserialized with the properties' types:
+
+        .. code-block:: python
+
+            >>> for row in query.rows(Order.OrderID, Order.ShippedDate):
+            ...     print(row.OrderID, row.ShippedDate.year)
+
+        :param values: ``Entity.Property`` instances
+        :param tuples: Return plain tuples instead of Row objects
+        :return: Query instance
+        """
+        q = self._new_query()
+        q.options['$select'] = [prop.name for prop in values]
+        q.options['rows'] = dict(properties=tuple(values), tuples=tuples)
+        return q
+
     def filter(self, value):
         """
         Set ``$filter`` query parameter. Can be called multiple times. Multiple
@@ -191,15 +586,22 @@ class Query(object):
 
     def expand(self, *values):
         """
-        Set ``$expand`` query parameter
+        Set ``$expand`` query parameter. Navigation properties can be given
+        nested options:
+
+        .. code-block:: python
 
-        :param values: ``Entity.Property`` instance
+            >>> query.expand(Order.Customer.select(Customer.CompanyName))
+
+        :param values: ``Entity.Property`` instance, or an :py:class:`~odata.navproperty.ExpandOption`
         :return: Query instance
         """
         q = self._new_query()
         option = q._get_or_create_option('$expand')
         for prop in values:
-            option.append(prop.name)
+            option.append(str(prop) if isinstance(prop, ExpandOption) else prop.name)
+            if isinstance(prop, ExpandOption):
+                q.options['expanded'][prop.name] = prop
         return q
 
     def order_by(self, *values):
@@ -236,16 +638,277 @@ class Query(object):
         q.options['$skip'] = value
         return q
 
+    def keyset(self, *values, **kwargs):
+        """
+        Page through results by key instead of ``$skip``. Each page is
+        ordered by the given properties and limited with ``$top``, and the
+        next page continues after the last received key:
+
+        .. code-block:: python
+
+            >>> for order in Service.query(Order).keyset(Order.OrderID, page_size=500):
+            ...     export(order)
+
+        Fetches ``$orderby=OrderID asc&$top=500``, then
+        ``$filter=OrderID gt 10748`` and so on. Deep pages stay as fast as
+        the first one, and rows do not shift between pages under concurrent
+        writes. Composite keys are compared in order. Server-driven paging
+        (``@odata.nextLink``) is not followed, as the next key range is
+        always requested explicitly.
+
+        :param values: Properties that uniquely identify rows. Defaults to the primary key
+        :param page_size: Number of rows requested per page. Defaults to 1000
+        :return: Query instance
+        """
+        page_size = kwargs.pop('page_size', 1000)
+        if kwargs:
+            raise TypeError('Unexpected keyword arguments: {0}'.format(', '.join(kwargs)))
+        if not values:
+            values = [prop for _, prop in self.entity.__odata_registry__.primary_key_properties]
+
+        q = self._new_query()
+        q.options['keyset'] = dict(properties=tuple(values), page_size=page_size)
+        return q
+
+    def apply(self, *transformations):
+        """
+        Add raw transformations to the ``$apply`` query parameter. Results
+        are returned as raw JSON values
+
+        :param transformations: Transformation strings, for example ``'topcount(5,Freight)'``
+        :return: Query instance
+        """
+        q = self._new_query()
+        option = q._get_or_create_option('$apply')
+        option.extend(transformations)
+        return q
+
+    def group_by(self, *values):
+        """
+        Group results by the given properties with the ``groupby``
+        transformation of ``$apply``. Combine with :py:func:`aggregate` to
+        compute values per group on the server:
+
+        .. code-block:: python
+
+            >>> query = Service.query(Order).filter(Order.ShipCountry != None)
+            >>> query = query.group_by(Order.ShipCountry)
+            >>> query = query.aggregate(Order.Freight.sum().label('total'))
+            >>> for row in query:
+            ...     print(row.ShipCountry, row.total)
+
+        Filters set with :py:func:`filter` are applied before grouping.
+
+        :param values: ``Entity.Property`` instances
+        :return: Query instance
+        """
+        q = self._new_query()
+        option = q._get_or_create_option('groupby')
+        option.extend(values)
+        return q
+
+    def aggregate(self, *values):
+        """
+        Compute aggregated values with the ``aggregate`` transformation of
+        ``$apply``. Results are returned as :py:class:`AggregateRow`
+        instances with the grouped properties and aggregation labels as
+        attributes
+
+        :param values: Aggregations, for example ``Order.Freight.sum().label('total')``
+        :return: Query instance
+        """
+        q = self._new_query()
+        option = q._get_or_create_option('aggregate')
+        option.extend(values)
+        return q
+
+    def with_count(self):
+        """
+        Set ``$count=true`` query parameter. The endpoint then includes the
+        total number of matching rows in the response, available as
+        :py:attr:`QueryIterator.count` once iteration has started:
+
+        .. code-block:: python
+
+            >>> rows = iter(query.with_count())
+            >>> first = next(rows)
+            >>> rows.count
+            830
+
+        :return: Query instance
+        """
+        q = self._new_query()
+        q.options['$count'] = True
+        return q
+
+    def track_changes(self):
+        """
+        Ask the endpoint to track changes to the results with
+        ``Prefer: odata.track-changes``. Once the results have been read,
+        the delta link for reading the changes later with
+        :py:func:`from_delta` is available as
+        :py:attr:`QueryIterator.delta_link`:
+
+        .. code-block:: python
+
+            >>> rows = iter(query.track_changes())
+            >>> customers = list(rows)
+            >>> rows.delta_link
+            'http://services.example.com/Customers?$deltatoken=8015'
+
+        Can not be combined with :py:func:`keyset` or :py:func:`parallel`.
+        See :py:mod:`odata.delta`
+
+        :return: Query instance
+        """
+        q = self._new_query()
+        q.options['track_changes'] = True
+        return q
+
+    def max_page_size(self, size):
+        """
+        Ask the endpoint to return at most ``size`` rows per response page
+        with ``Prefer: odata.maxpagesize``. Endpoints may return smaller
+        pages than requested, or ignore the preference. Useful with
+        :py:func:`iter_pages` to match pages to the batch size of the
+        consumer
+
+        :param size: Maximum number of rows per page
+        :return: Query instance
+        """
+        q = self._new_query()
+        q.options['maxpagesize'] = size
+        return q
+
+    def prefetch(self, pages=1):
+        """
+        Fetch up to ``pages`` result pages ahead in the background while
+        the current page is being iterated. The next page request is then
+        already under way when the current page runs out. Pages are fetched
+        in a background thread, or in a task when using asyncio
+
+        :param pages: Number of pages to fetch ahead. ``0`` disables prefetching
+        :return: Query instance
+        """
+        q = self._new_query()
+        q.options['prefetch'] = pages
+        return q
+
+    def stream(self, chunk_size=65536):
+        """
+        Download response pages in chunks and decode rows as soon as they
+        are complete, instead of reading whole pages to memory first. See
+        :py:mod:`odata.stream`
+
+        :param chunk_size: Maximum bytes to read at a time. ``0`` or None disables streaming
+        :return: Query instance
+        """
+        q = self._new_query()
+        q.options['stream'] = chunk_size
+        return q
+
+    def timeout(self, value):
+        """
+        Set the timeout of every request of the query, instead of the
+        timeout of the connection. See :py:mod:`odata.timeout`
+
+        :param value: Seconds, or a tuple of connect and read timeouts
+        :return: Query instance
+        """
+        q = self._new_query()
+        q.options['timeout'] = value
+        return q
+
+    def deadline(self, seconds):
+        """
+        Limit the total time of reading the results, including the
+        requests of all pages and their retries. The time starts when
+        iteration starts, and :py:class:`~odata.exceptions.DeadlineExceeded`
+        is raised when it runs out. See :py:mod:`odata.timeout`
+
+        :param seconds: Seconds
+        :return: Query instance
+        """
+        q = self._new_query()
+        q.options['deadline'] = seconds
+        return q
+
+    def parallel(self, workers=4, partition_by=None, strategy='range',
+                 preserve_order=False, max_pages=None):
+        """
+        Split the query into ``workers`` disjoint partitions and fetch them
+        concurrently in a thread pool. Meant for exporting large EntitySets:
+
+        .. code-block:: python
+
+            >>> query = Service.query(Order).parallel(workers=8, partition_by=Order.OrderID)
+            >>> for order in query:
+            ...     export(order)
+
+        :param workers: Number of partitions and concurrent requests
+        :param partition_by: Property to partition by. Defaults to the primary key
+        :param strategy: ``'range'`` to split by ``$filter`` bounds between the probed minimum and maximum values, or ``'skip'`` to split ``$count`` rows into ``$skip``/``$top`` slices
+        :param preserve_order: Yield partitions one after another in partition property order instead of as soon as pages arrive. Keeps ``$orderby`` intact when ordering by the partition property
+        :param max_pages: Maximum number of pages fetched but not yet iterated. Defaults to two per worker
+        :return: Query instance
+        :raises ODataQueryError: Iterating an :py:class:`AsyncQuery` that uses parallel scans
+        """
+        if partition_by is None:
+            partition_by = self.entity.__odata_registry__.primary_key_properties[0][1]
+
+        q = self._new_query()
+        q.options['parallel'] = dict(
+            workers=workers,
+            partition_by=partition_by,
+            strategy=strategy,
+            preserve_order=preserve_order,
+            max_pages=max_pages,
+        )
+        return q
+
+    def params(self, **values):
+        """
+        Give values for the bind parameters of the filter expressions. See
+        :py:mod:`odata.expression`
+
+        :param values: Parameter values by name
+        :return: Query instance
+        """
+        q = self._new_query()
+        q.options['params'].update(values)
+        return q
+
+    def compile(self):
+        """
+        Render the query options once into a template that can be executed
+        many times with different bind parameter values:
+
+        .. code-block:: python
+
+            >>> by_city = query.filter(Order.ShipCity == bindparam('city')).compile()
+            >>> by_city.all(city='Oulu')
+
+        :return: PreparedQuery instance
+        :raises ODataQueryError: The query uses keyset pagination or parallel scans
+        """
+        return PreparedQuery(self)
+
     @staticmethod
     def and_(value1, value2):
+        if isinstance(value1, Expression) and isinstance(value2, Expression):
+            return And(value1, value2)
         return '{0} and {1}'.format(value1, value2)
 
     @staticmethod
     def or_(value1, value2):
+        if isinstance(value1, Expression) and isinstance(value2, Expression):
+            return Or(value1, value2)
         return '{0} or {1}'.format(value1, value2)
 
     @staticmethod
     def grouped(value):
+        if isinstance(value, Expression):
+            return Grouped(value)
         return '({0})'.format(value)
 
     # Actions ##################################################################
@@ -260,6 +923,104 @@ class Query(object):
         """
         return list(iter(self))
 
+    def iter_pages(self, raw=False):
+        """
+        Iterate the results one response page at a time, for consumers
+        that process rows in batches:
+
+        .. code-block:: python
+
+            >>> for page in query.max_page_size(5000).iter_pages(raw=True):
+            ...     bulk_insert(page.rows)
+
+        Pages are fetched ahead in the background with :py:func:`prefetch`
+
+        :param raw: Return the rows as decoded JSON dictionaries instead of Entity instances
+        :return: Iterator of :py:class:`Page` instances
+        :raises ODataQueryError: The query uses :py:func:`parallel`
+        """
+        if self.options.get('parallel'):
+            raise exc.ODataQueryError('iter_pages() can not be combined with parallel()')
+        query = self._start_deadline()
+        responses = query._iter_responses()
+        prefetch = self.options.get('prefetch')
+        if prefetch:
+            responses = _prefetch_pages(responses, prefetch)
+        for data, info in responses:
+            yield query._create_page(data, info, raw)
+
+    def _create_page(self, data, info, raw):
+        rows, next_link = self._read_page(data or {})
+        if not raw:
+            rows = [self._create_model(row) for row in rows]
+        page = Page(rows, next_link=next_link, elapsed=info['elapsed'], size=info['size'])
+        page._read_annotations(data or {})
+        return page
+
+    def to_columns(self, *values, decimals='float'):
+        """
+        Read the results into columns. See :py:mod:`odata.columns`
+
+        :param values: Properties to read. Defaults to all properties of the Entity
+        :param decimals: Read ``DecimalProperty`` values as ``'float'`` or ``'decimal'``
+        :return: Dictionary of property names and lists of values
+        """
+        return self._read_columns(values, decimals).to_lists()
+
+    def to_numpy(self, *values, decimals='float'):
+        """
+        Read the results into NumPy arrays. Requires ``numpy``
+
+        :return: Dictionary of property names and arrays
+        """
+        return self._read_columns(values, decimals).to_numpy()
+
+    def to_pandas(self, *values, decimals='float'):
+        """
+        Read the results into a pandas DataFrame. Requires ``pandas``
+
+        :return: DataFrame
+        """
+        return self._read_columns(values, decimals).to_pandas()
+
+    def to_arrow(self, *values, decimals='float'):
+        """
+        Read the results into an Arrow table. Requires ``pyarrow``
+
+        :return: pyarrow.Table
+        """
+        return self._read_columns(values, decimals).to_arrow()
+
+    def _column_query(self, values, decimals):
+        if not values:
+            values = [prop for _, prop in self.entity.__odata_registry__.properties]
+        q = self._new_query()
+        q.options['$select'] = [prop.name for prop in values]
+        q.options['rows'] = None
+        return q, columns.ColumnReader(values, decimals=decimals)
+
+    def _read_columns(self, values, decimals):
+        q, reader = self._start_deadline()._column_query(values, decimals)
+        pages = q._iter_page_data()
+        if q.options.get('prefetch'):
+            pages = _prefetch_pages(pages, q.options['prefetch'])
+        for data in pages:
+            rows, _ = q._read_page(data)
+            reader.add(rows)
+        return reader
+
+    def count(self):
+        """
+        Return the number of Entities that match the current filters,
+        without downloading them. Sends a request to the ``/$count``
+        resource of the EntitySet
+
+        :return: Integer
+        """
+        url = self._get_url() + '/$count'
+        with self._limits():
+            return self.connection.execute_count(url, self._get_count_options())
+
     def first(self):
         """
         Return the first Entity instance that matches current query
@@ -295,34 +1056,165 @@ class Query(object):
 
     def get(self, *pk, **composite_keys):
         """
-        Return a Entity with the given primary key
+        Return a Entity with the given primary key. The Entity is read from
+        its canonical url, for example ``Products(1)`` or
+        ``Sales(ProductID=1,ManufacturerID=2)``. Only the ``$select`` and
+        ``$expand`` options of the query are applied
 
         :param pk: Primary key value
         :param composite_keys: Primary key values for Entities with composite keys
-        :return: Entity instance or None
+        :return: Entity instance
+        :raises NoResultsFound: Entity was not found
+        """
+        url = self._get_key_url(pk, composite_keys)
+        try:
+            data = self._execute_get(url, self._get_key_options())
+        except exc.ODataError as e:
+            _raise_not_found(e)
+        if data is None:
+            raise exc.NoResultsFound()
+        return self._create_model(data)
+
+    def get_many(self, keys, max_url_length=None):
         """
-        i = self.entity.__new__(self.entity)
-        es = i.__odata__
+        Return the Entities with the given primary keys. Keys are fetched
+        in chunks with ``Key in (...)`` filters, or grouped ``eq``
+        comparisons for composite keys, so that the url of a single
+        request stays within ``max_url_length``. Only the ``$select`` and
+        ``$expand`` options of the query are applied
 
-        oldfilters = self._get_or_create_option('$filter')
+        .. code-block:: python
 
-        tempfilters = []
+            >>> query.get_many([1, 2, 3])
+            [<Product 1>, None, <Product 3>]
+            >>> query.get_many([dict(ProductID=1, ManufacturerID=2)])
+            [<ProductManufacturerSales>]
 
+        :param keys: Iterable of primary key values. Composite keys are given as dicts keyed by property name, or as tuples in primary key order
+        :param max_url_length: Url length budget for one request. Defaults to :py:attr:`max_url_length`
+        :return: List of Entity instances in the order of ``keys``. None for keys that were not found
+        """
+        key_ids, queries = self._start_deadline()._get_many_queries(keys, max_url_length)
+        found = {}
+        for q in queries:
+            for data in q._iter_page_data():
+                rows, _ = q._read_page(data)
+                self._collect_keyed_rows(rows, found)
+        return [found.get(key_id) for key_id in key_ids]
+
+    def _get_key_properties(self):
+        return [prop for _, prop in self.entity.__odata_registry__.primary_key_properties]
+
+    def _get_key_values(self, pk, composite_keys):
+        """
+        :return: List of (primary key property, value) tuples
+        """
+        properties = self._get_key_properties()
         if pk:
-            pk = pk[0]
-            prop = es.primary_key_properties[0][1]
-            tempfilters.append(prop == pk)
-        else:
-            for _, prop in es.primary_key_properties:
-                tempfilters.append(prop == composite_keys[prop.name])
+            if len(properties) > 1 and len(pk) == 1 and isinstance(pk[0], (tuple, list)):
+                pk = pk[0]
+            if isinstance(pk[0], dict):
+                composite_keys = pk[0]
+            else:
+                if len(pk) != len(properties):
+                    raise exc.ODataQueryError('Expected {0} primary key values, got {1}'.format(len(properties), len(pk)))
+                return list(zip(properties, pk))
+        try:
+            return [(prop, composite_keys[prop.name]) for prop in properties]
+        except KeyError as e:
+            raise exc.ODataQueryError('Missing primary key value: {0}'.format(e.args[0]))
+
+    def _get_key_id(self, key_values):
+        return tuple(str(prop.escape_value(value)) for prop, value in key_values)
+
+    def _get_key_url(self, pk, composite_keys):
+        key_values = self._get_key_values(pk, composite_keys)
+        ids = list(zip([prop for prop, _ in key_values], self._get_key_id(key_values)))
+        entity_id = format_entity_id(self.entity.__odata_collection__, ids)
+        return self.entity.__odata_url_base__ + entity_id
+
+    def _get_key_options(self):
+        options = dict()
+        for name in ('$select', '$expand'):
+            value = self.options.get(name)
+            if value:
+                options[name] = ','.join(value)
+        return options
 
-        self.options['$filter'] = tempfilters
-        data = list(iter(self))
+    def _get_many_queries(self, keys, max_url_length):
+        """
+        Split the keys to queries that fit the url length budget
 
-        self.options['$filter'] = oldfilters
-        if len(data) > 0:
-            return data[0]
-        raise exc.NoResultsFound()
+        :return: Tuple of key ids in input order and list of Query instances
+        """
+        max_url_length = max_url_length or self.max_url_length
+        properties = self._get_key_properties()
+
+        key_ids = []
+        key_filters = []
+        seen = set()
+        for key in keys:
+            if isinstance(key, dict):
+                key_values = self._get_key_values((), key)
+            elif isinstance(key, (tuple, list)):
+                key_values = self._get_key_values(tuple(key), {})
+            else:
+                key_values = self._get_key_values((key,), {})
+            key_id = self._get_key_id(key_values)
+            key_ids.append(key_id)
+            if key_id in seen:
+                continue
+            seen.add(key_id)
+            if len(properties) == 1:
+                key_filters.append(key_id[0])
+            else:
+                key_filters.append(self.grouped(' and '.join(
+                    '{0} eq {1}'.format(prop.name, value) for prop, value in zip(properties, key_id))))
+
+        base = self._new_query()
+        base.options['$top'] = None
+        base.options['$skip'] = None
+        base.options['$filter'] = []
+        base.options['$orderby'] = []
+        base.options['$count'] = None
+        for name in ('prefetch', 'parallel', 'keyset'):
+            base.options[name] = None
+        if base.options['$select']:
+            base.options['$select'].extend(prop.name for prop in properties
+                                           if prop.name not in base.options['$select'])
+
+        if len(properties) == 1:
+            prefix, separator, suffix = '{0} in ('.format(properties[0].name), ',', ')'
+        else:
+            prefix, separator, suffix = '', ' or ', ''
+        base_length = len(base._get_url()) + len('?' + quote_plus('$filter') + '=') + len(quote_plus(prefix + suffix))
+        base_options = base._get_options()
+        if base_options:
+            base_length += len(urlencode(base_options)) + 1
+        separator_length = len(quote_plus(separator))
+
+        queries = []
+        chunk = []
+        length = base_length
+        for key_filter in key_filters:
+            filter_length = len(quote_plus(key_filter))
+            if chunk and length + separator_length + filter_length > max_url_length:
+                queries.append(base.filter(prefix + separator.join(chunk) + suffix))
+                chunk = []
+                length = base_length
+            if chunk:
+                length += separator_length
+            chunk.append(key_filter)
+            length += filter_length
+        if chunk:
+            queries.append(base.filter(prefix + separator.join(chunk) + suffix))
+        return key_ids, queries
+
+    def _collect_keyed_rows(self, rows, found):
+        properties = self._get_key_properties()
+        for row in rows:
+            key_values = [(prop, prop.deserialize(row.get(prop.name))) for prop in properties]
+            found[self._get_key_id(key_values)] = self._create_model(row)
 
     def raw(self, query_params):
         """
@@ -341,5 +1233,720 @@ class Query(object):
         :return: Query result
         """
         url = self.entity.__odata_url__()
-        response_data = self.connection.execute_get(url, params=query_params)
+        with self._limits():
+            response_data = self.connection.execute_get(url, params=query_params)
         return (response_data or {}).get('value')
+
+    def from_delta(self, delta_link):
+        """
+        Read the changes made since ``delta_link`` was returned. The query
+        options of the tracked query are part of the delta link, only the
+        Entity class of this query is used. Responses are never served from
+        the result cache:
+
+        .. code-block:: python
+
+            >>> events = Service.query(Customer).from_delta(stored_link)
+            >>> for event in events:
+            ...     print(event.kind)
+            >>> stored_link = events.delta_link
+
+        :param delta_link: Delta link from :py:attr:`QueryIterator.delta_link`
+        :return: :py:class:`QueryIterator` of :py:class:`~odata.delta.EntityChanged` and :py:class:`~odata.delta.EntityRemoved` events
+        """
+        iterator = QueryIterator()
+        iterator._rows = self._start_deadline()._iter_delta(iterator, delta_link)
+        return iterator
+
+    def _iter_delta(self, iterator, delta_link):
+        url = urljoin(self.entity.__odata_url_base__, delta_link)
+        while url:
+            with self._limits():
+                data = self.connection.execute_get(url, headers=self._get_headers()) or {}
+            iterator._read_annotations(data)
+            rows, url = self._read_page(data)
+            for row in rows:
+                event = self._delta_event(row)
+                if event is not None:
+                    yield event
+
+    def _delta_event(self, row):
+        """
+        :return: Delta event of a response row, or None for entity links
+        """
+        if is_removed(row):
+            return self._removed_event(row)
+        if not is_link(row):
+            return EntityChanged(self._create_model(row))
+
+    def _removed_event(self, row):
+        removed = row.get('@removed') or {}
+        reason = removed.get('reason') or row.get('reason')
+        entity_id = row.get('id') or row.get('@id') or row.get('@odata.id')
+        if not entity_id:
+            properties = self._get_key_properties()
+            if all(row.get(prop.name) is not None for prop in properties):
+                key_values = [(prop, prop.deserialize(row[prop.name])) for prop in properties]
+                ids = list(zip(properties, self._get_key_id(key_values)))
+                entity_id = format_entity_id(self.entity.__odata_collection__, ids)
+        return EntityRemoved(entity_id, reason=reason, data=row)
+
+
+class AsyncQuery(Query):
+    """
+    Query bound to an :py:class:`~odata.connection.AsyncODataConnection`.
+    Created by :py:func:`~odata.context.AsyncContext.query`. Results are
+    iterated with ``async for`` and the fetching methods are coroutines:
+
+    .. code-block:: python
+
+        >>> async for order in context.query(Order).filter(...):
+        ...     print(order)
+        >>> orders = await context.query(Order).all()
+    """
+
+    def __iter__(self):
+        raise TypeError('AsyncQuery must be iterated with "async for"')
+
+    def compile(self):
+        """
+        :return: AsyncPreparedQuery instance, see :py:func:`Query.compile`
+        """
+        return AsyncPreparedQuery(self)
+
+    def __aiter__(self):
+        iterator = AsyncQueryIterator()
+        iterator._rows = self._start_deadline()._aiter_rows(iterator)
+        return iterator
+
+    async def _aiter_rows(self, iterator, request=None):
+        self._check_not_parallel('async iteration')
+        if self.options.get('stream'):
+            async for entity in self._aiter_streamed_rows(iterator, request):
+                yield entity
+            return
+
+        pages = self._aiter_page_data(request)
+        prefetch = self.options.get('prefetch')
+        if prefetch:
+            pages = _prefetch_pages_async(pages, prefetch)
+
+        async for data in pages:
+            iterator._read_annotations(data)
+            rows, _ = self._read_page(data)
+            for row in rows:
+                yield self._create_model(row)
+
+    async def _aiter_streamed_rows(self, iterator, request=None):
+        self._check_stream()
+        url, options, _ = request or self._first_page_request()
+        while url:
+            parser = JSONStreamParser()
+            chunks = self.connection.execute_get_stream(url, options, headers=self._get_headers(),
+                                                        chunk_size=self.options['stream'])
+            received = False
+            try:
+                async for chunk in self._apull(chunks):
+                    received = True
+                    rows = parser.feed(chunk)
+                    iterator._read_annotations(parser.annotations)
+                    for row in rows:
+                        yield self._create_model(row)
+            finally:
+                await chunks.aclose()
+            if not received:
+                return
+            rows, url = self._close_stream(parser, iterator)
+            options = {}
+            for row in rows:
+                yield self._create_model(row)
+
+    async def _execute_get_async(self, url, params=None, headers=None, info=None):
+        if self.cache is None:
+            with self._limits():
+                return await self.connection.execute_get(url, params, headers=headers, info=info)
+        key = cache_key(url, params, headers)
+        data = self.cache.get(key)
+        if data is None:
+            with self._limits():
+                data = await self.connection.execute_get(url, params, headers=headers, info=info)
+            self.cache.set(key, data, self.entity.__odata_collection__)
+        return data
+
+    async def _apull(self, iterator):
+        """
+        Asynchronous version of :py:func:`Query._pull`
+        """
+        while True:
+            with self._limits():
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield item
+
+    async def _aiter_page_data(self, request=None):
+        async for data, _ in self._aiter_responses(request):
+            yield data
+
+    def _check_not_parallel(self, operation):
+        if self.options.get('parallel'):
+            raise exc.ODataQueryError('{0} can not be combined with parallel(), '
+                                      'use asyncio.gather() on separate queries'.format(operation))
+
+    async def _aiter_responses(self, request=None):
+        request = request or self._first_page_request()
+        while request:
+            url, options, _ = request
+            info = dict(size=None)
+            started = time.perf_counter()
+            data = await self._execute_get_async(url, options, self._get_headers(), info=info)
+            info['elapsed'] = time.perf_counter() - started
+            yield data, info
+            request = self._next_page_request(request, data)
+
+    async def all(self):
+        """
+        Returns a list of all Entity instances that match the current query
+        options
+
+        :return: A list of Entity instances
+        """
+        return [row async for row in self]
+
+    async def iter_pages(self, raw=False):
+        """
+        See :py:func:`Query.iter_pages`. Pages are iterated with
+        ``async for``
+        """
+        self._check_not_parallel('iter_pages()')
+        query = self._start_deadline()
+        responses = query._aiter_responses()
+        prefetch = self.options.get('prefetch')
+        if prefetch:
+            responses = _prefetch_pages_async(responses, prefetch)
+        async for data, info in responses:
+            yield query._create_page(data, info, raw)
+
+    async def to_columns(self, *values, decimals='float'):
+        """
+        See :py:func:`Query.to_columns`
+        """
+        return (await self._read_columns(values, decimals)).to_lists()
+
+    async def to_numpy(self, *values, decimals='float'):
+        """
+        See :py:func:`Query.to_numpy`
+        """
+        return (await self._read_columns(values, decimals)).to_numpy()
+
+    async def to_pandas(self, *values, decimals='float'):
+        """
+        See :py:func:`Query.to_pandas`
+        """
+        return (await self._read_columns(values, decimals)).to_pandas()
+
+    async def to_arrow(self, *values, decimals='float'):
+        """
+        See :py:func:`Query.to_arrow`
+        """
+        return (await self._read_columns(values, decimals)).to_arrow()
+
+    async def _read_columns(self, values, decimals):
+        q, reader = self._start_deadline()._column_query(values, decimals)
+        pages = q._aiter_page_data()
+        if q.options.get('prefetch'):
+            pages = _prefetch_pages_async(pages, q.options['prefetch'])
+        async for data in pages:
+            rows, _ = q._read_page(data)
+            reader.add(rows)
+        return reader
+
+    async def count(self):
+        """
+        Return the number of Entities that match the current filters,
+        without downloading them
+
+        :return: Integer
+        """
+        url = self._get_url() + '/$count'
+        with self._limits():
+            return await self.connection.execute_count(url, self._get_count_options())
+
+    async def first(self):
+        """
+        Return the first Entity instance that matches current query
+
+        :return: Entity instance or None
+        """
+        data = await self.limit(1).all()
+        if data:
+            return data[0]
+
+    async def one(self):
+        """
+        Return only one resulting Entity
+
+        :return: Entity instance
+        :raises NoResultsFound: Zero results returned
+        :raises MultipleResultsFound: Multiple results returned
+        """
+        data = await self.limit(2).all()
+        if len(data) == 0:
+            raise exc.NoResultsFound()
+        if len(data) > 1:
+            raise exc.MultipleResultsFound()
+        return data[0]
+
+    async def get(self, *pk, **composite_keys):
+        """
+        Return a Entity with the given primary key
+
+        :param pk: Primary key value
+        :param composite_keys: Primary key values for Entities with composite keys
+        :return: Entity instance
+        :raises NoResultsFound: Entity was not found
+        """
+        url = self._get_key_url(pk, composite_keys)
+        try:
+            data = await self._execute_get_async(url, self._get_key_options())
+        except exc.ODataError as e:
+            _raise_not_found(e)
+        if data is None:
+            raise exc.NoResultsFound()
+        return self._create_model(data)
+
+    async def get_many(self, keys, max_url_length=None):
+        """
+        Return the Entities with the given primary keys, see
+        :py:func:`Query.get_many`
+
+        :return: List of Entity instances in the order of ``keys``. None for keys that were not found
+        """
+        key_ids, queries = self._start_deadline()._get_many_queries(keys, max_url_length)
+        found = {}
+        for q in queries:
+            async for data in q._aiter_page_data():
+                rows, _ = q._read_page(data)
+                self._collect_keyed_rows(rows, found)
+        return [found.get(key_id) for key_id in key_ids]
+
+    async def raw(self, query_params):
+        """
+        Execute a query with custom parameters. Results are not converted
+        to Entity objects
+
+        :param query_params: A dictionary of query params containing $filter, $orderby, etc.
+        :type query_params: dict
+        :return: Query result
+        """
+        url = self.entity.__odata_url__()
+        with self._limits():
+            response_data = await self.connection.execute_get(url, params=query_params)
+        return (response_data or {}).get('value')
+
+    def from_delta(self, delta_link):
+        """
+        See :py:func:`Query.from_delta`. The events are iterated with
+        ``async for``
+
+        :return: :py:class:`AsyncQueryIterator` of delta events
+        """
+        iterator = AsyncQueryIterator()
+        iterator._rows = self._start_deadline()._aiter_delta(iterator, delta_link)
+        return iterator
+
+    async def _aiter_delta(self, iterator, delta_link):
+        url = urljoin(self.entity.__odata_url_base__, delta_link)
+        while url:
+            with self._limits():
+                data = await self.connection.execute_get(url, headers=self._get_headers()) or {}
+            iterator._read_annotations(data)
+            rows, url = self._read_page(data)
+            for row in rows:
+                event = self._delta_event(row)
+                if event is not None:
+                    yield event
+
+
+class PreparedQuery(object):
+    """
+    A query rendered into a template. Created by :py:func:`Query.compile`.
+    Executing it only substitutes the bind parameter values into the
+    rendered options
+
+    :param query: Query to compile
+    """
+
+    _marker = '\x00{0}\x00'
+
+    def __init__(self, query):
+        if query.options.get('keyset') or query.options.get('parallel'):
+            raise exc.ODataQueryError('Queries using keyset() or parallel() can not be compiled')
+        self.query = query
+        self.url = query._get_url()
+        self.defaults = dict(query.options.get('params') or {})
+
+        slots = []
+
+        def mark(slot):
+            slots.append(slot)
+            return self._marker.format(len(slots) - 1)
+
+        self.options = {}
+        self.templates = []
+        for name, value in query._get_options(resolve=mark).items():
+            if isinstance(value, str) and '\x00' in value:
+                parts = value.split('\x00')
+                self.templates.append((name, parts[0::2], [slots[int(i)] for i in parts[1::2]]))
+            else:
+                self.options[name] = value
+        self.params = frozenset(slot.name for slot in slots)
+
+    def __repr__(self):
+        return '<PreparedQuery for {0}>'.format(self.query.entity)
+
+    def _get_options(self, values, top=None):
+        if self.defaults:
+            values = dict(self.defaults, **values)
+        options = dict(self.options)
+        for name, literals, slots in self.templates:
+            parts = [literals[0]]
+            for slot, literal in zip(slots, literals[1:]):
+                if slot.name not in values:
+                    raise exc.ODataQueryError('No value given for bind parameter: {0}'.format(slot.name))
+                parts.append(slot.render(values[slot.name]))
+                parts.append(literal)
+            options[name] = ''.join(parts)
+        if top is not None:
+            options['$top'] = top
+        return options
+
+    def as_string(self, **values):
+        return urljoin(self.url, '?{0}'.format(self.query._format_params(self._get_options(values))))
+
+    def execute(self, **values):
+        """
+        Iterate the results with the given parameter values
+
+        :return: QueryIterator
+        """
+        return self._execute(values)
+
+    def _execute(self, values, top=None):
+        iterator = QueryIterator()
+        request = (self.url, self._get_options(values, top=top), 0)
+        iterator._rows = self.query._start_deadline()._iter_rows(iterator, request)
+        return iterator
+
+    def all(self, **values):
+        """
+        :return: A list of all Entity instances matching the query with the given parameter values
+        """
+        return list(self._execute(values))
+
+    def first(self, **values):
+        """
+        :return: The first matching Entity instance or None
+        """
+        data = list(self._execute(values, top=1))
+        if data:
+            return data[0]
+
+    def one(self, **values):
+        """
+        :return: The only matching Entity instance
+        :raises NoResultsFound: Zero results returned
+        :raises MultipleResultsFound: Multiple results returned
+        """
+        data = list(self._execute(values, top=2))
+        if len(data) == 0:
+            raise exc.NoResultsFound()
+        if len(data) > 1:
+            raise exc.MultipleResultsFound()
+        return data[0]
+
+
+class AsyncPreparedQuery(PreparedQuery):
+    """
+    A compiled :py:class:`AsyncQuery`. The fetching methods are coroutines
+    """
+
+    def _execute(self, values, top=None):
+        iterator = AsyncQueryIterator()
+        request = (self.url, self._get_options(values, top=top), 0)
+        iterator._rows = self.query._start_deadline()._aiter_rows(iterator, request)
+        return iterator
+
+    async def all(self, **values):
+        return [row async for row in self._execute(values)]
+
+    async def first(self, **values):
+        data = [row async for row in self._execute(values, top=1)]
+        if data:
+            return data[0]
+
+    async def one(self, **values):
+        data = [row async for row in self._execute(values, top=2)]
+        if len(data) == 0:
+            raise exc.NoResultsFound()
+        if len(data) > 1:
+            raise exc.MultipleResultsFound()
+        return data[0]
+
+
+def _raise_not_found(error):
+    """
+    Raise NoResultsFound in place of a 404 response to a key lookup
+    """
+    if error.status_code == 'HTTP 404':
+        raise exc.NoResultsFound()
+    raise error
+
+
+class Row(tuple):
+    """
+    A lightweight read-only result row, returned by :py:func:`Query.rows`.
+    Values can be accessed as attributes, by index or by name:
+
+    .. code-block:: python
+
+        >>> row.ProductName
+        'Chai'
+        >>> row[0]
+        'Chai'
+        >>> row['ProductName']
+        'Chai'
+    """
+    __slots__ = ()
+    _columns = ()
+    _decoders = ()
+    _index = {}
+
+    @classmethod
+    def create_class(cls, columns):
+        """
+        :param columns: List of (JSON key, attribute name, decoder) tuples
+        """
+        attrs = dict(
+            __slots__=(),
+            _columns=tuple(columns),
+            _decoders=tuple((key, decode) for key, _, decode in columns),
+            _index=dict((name, i) for i, (_, name, _) in enumerate(columns)),
+        )
+        for i, (_, name, _) in enumerate(columns):
+            attrs[name] = property(operator.itemgetter(i))
+        return type(cls.__name__, (cls,), attrs)
+
+    @classmethod
+    def from_data(cls, data):
+        get = data.get
+        return tuple.__new__(cls, [decode(get(key)) for key, decode in cls._decoders])
+
+    def __getitem__(self, item):
+        if isinstance(item, str):
+            item = self._index[item]
+        return tuple.__getitem__(self, item)
+
+    def __repr__(self):
+        values = ', '.join('{0}={1!r}'.format(name, value)
+                           for (_, name, _), value in zip(self._columns, self))
+        return '<{0}({1})>'.format(self.__class__.__name__, values)
+
+    def as_dict(self):
+        return dict((name, value) for (_, name, _), value in zip(self._columns, self))
+
+
+class AggregateRow(Row):
+    """
+    A lightweight read-only result row of an aggregating query. Values can
+    be accessed as attributes, by index or by name:
+
+    .. code-block:: python
+
+        >>> row.total
+        Decimal('3120.55')
+        >>> row['ShipCountry']
+        'Finland'
+    """
+    __slots__ = ()
+
+
+class Page(object):
+    """
+    One response page of a query, from :py:func:`Query.iter_pages`
+    """
+
+    def __init__(self, rows, next_link=None, elapsed=None, size=None):
+        self.rows = rows
+        """List of Entity instances, or JSON dictionaries of raw pages"""
+        self.next_link = next_link
+        """Url of the following page, or None on the last page"""
+        self.elapsed = elapsed
+        """Seconds taken to fetch and decode the page"""
+        self.size = size
+        """Size of the response body in bytes. None if the page was served from the result cache"""
+        self.count = None
+        """Total number of matching rows, if requested with :py:func:`Query.with_count`"""
+        self.delta_link = None
+        """Delta link on the last page, if requested with :py:func:`Query.track_changes`"""
+
+    def __repr__(self):
+        return '<Page of {0} rows>'.format(len(self.rows))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def _read_annotations(self, data):
+        _read_annotations(self, data)
+
+
+class QueryIterator(object):
+    """
+    Iterator over the results of a :py:class:`Query`
+    """
+
+    def __init__(self):
+        self._rows = None
+
+        self.count = None
+        """
+        Total number of matching rows, if requested with
+        :py:func:`Query.with_count`. Available once the first page has
+        been received
+        """
+
+        self.delta_link = None
+        """
+        Delta link for reading later changes with :py:func:`Query.from_delta`,
+        if requested with :py:func:`Query.track_changes`. Available once the
+        last page has been received
+        """
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._rows)
+
+    next = __next__
+
+    def close(self):
+        """
+        Stop iterating. Releases any background work started by the query
+        """
+        self._rows.close()
+
+    def _read_annotations(self, data):
+        _read_annotations(self, data)
+
+
+class AsyncQueryIterator(QueryIterator):
+    """
+    Asynchronous iterator over the results of an :py:class:`AsyncQuery`
+    """
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._rows.__anext__()
+
+    async def aclose(self):
+        await self._rows.aclose()
+
+
+def _read_annotations(target, data):
+    """
+    Copy the count and delta link annotations of a response page to
+    ``target``
+    """
+    if '@odata.count' in data:
+        target.count = int(data['@odata.count'])
+    if '@odata.deltaLink' in data:
+        target.delta_link = data['@odata.deltaLink']
+
+
+def _prefetch_pages(pages, size):
+    """
+    Consume the ``pages`` iterator in a background thread, keeping at most
+    ``size`` pages fetched ahead of the caller. The thread stops fetching
+    when the returned generator is closed
+    """
+    buffered = queue.Queue()
+    slots = threading.Semaphore(size)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            while True:
+                slots.acquire()
+                if stop.is_set():
+                    return
+                try:
+                    page = next(pages)
+                except StopIteration:
+                    buffered.put(('done', None))
+                    return
+                buffered.put(('page', page))
+        except Exception as e:
+            buffered.put(('error', e))
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(produce,),
+                              name='odata-prefetch')
+    thread.daemon = True
+    thread.start()
+
+    try:
+        while True:
+            kind, value = buffered.get()
+            if kind == 'done':
+                return
+            if kind == 'error':
+                raise value
+            slots.release()
+            yield value
+    finally:
+        stop.set()
+        slots.release()
+
+
+async def _prefetch_pages_async(pages, size):
+    """
+    Consume the ``pages`` async iterator in a task, keeping at most
+    ``size`` pages fetched ahead of the caller. The task is cancelled when
+    the returned generator is closed
+    """
+    buffered = asyncio.Queue()
+    slots = asyncio.Semaphore(size)
+
+    async def produce():
+        try:
+            while True:
+                await slots.acquire()
+                try:
+                    page = await pages.__anext__()
+                except StopAsyncIteration:
+                    await buffered.put(('done', None))
+                    return
+                await buffered.put(('page', page))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await buffered.put(('error', e))
+
+    task = asyncio.ensure_future(produce())
+    try:
+        while True:
+            kind, value = await buffered.get()
+            if kind == 'done':
+                return
+            if kind == 'error':
+                raise value
+            slots.release()
+            yield value
+    finally:
+        task.cancel()
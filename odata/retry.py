@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""
+Retrying requests
+=================
+
+Overloaded endpoints and gateways answer with ``429 Too Many Requests`` or
+``503 Service Unavailable``, often with a ``Retry-After`` header. With a
+:py:class:`RetryPolicy`, such responses and connection errors are retried
+after a delay instead of raising an error right away:
+
+.. code-block:: python
+
+    >>> from odata.retry import RetryPolicy
+    >>> Service = ODataService(url, retry=RetryPolicy(max_attempts=6, max_elapsed=300))
+
+Delays grow exponentially with random jitter, and ``Retry-After`` is used
+instead when the response has one. Only idempotent requests are retried
+after errors, ``POST`` and ``PATCH`` requests only when the endpoint
+refused them with ``429``.
+
+Retries happen for each request separately. A query that fails on its
+tenth page retries the request of that page, the pages already read are
+not requested again.
+
+----
+
+API
+---
+"""
+
+import datetime
+import email.utils
+import random
+import time
+
+
+class RetryPolicy(object):
+    """
+    :param max_attempts: Maximum number of attempts per request, including the first one
+    :param backoff: Delay before the first retry, in seconds. Doubled for every following retry
+    :param max_backoff: Upper limit of the exponential delay, in seconds
+    :param max_elapsed: Seconds after the first attempt after which no more retries are made. None for no limit
+    :param jitter: Randomize delays between zero and the exponential delay
+    :param statuses: HTTP status codes that are retried
+    :param methods: HTTP methods that are safe to retry after any error
+    """
+
+    def __init__(self, max_attempts=5, backoff=0.5, max_backoff=30, max_elapsed=120, jitter=True,
+                 statuses=(429, 502, 503, 504),
+                 methods=('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_elapsed = max_elapsed
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(methods)
+
+    def __repr__(self):
+        return '<RetryPolicy(max_attempts={0})>'.format(self.max_attempts)
+
+    def get_delay(self, method, attempt, elapsed, status=None, retry_after=None):
+        """
+        Decide whether a failed attempt is retried
+
+        :param method: HTTP method
+        :param attempt: Number of attempts made so far
+        :param elapsed: Seconds since the first attempt
+        :param status: HTTP status code, or None after a connection error
+        :param retry_after: Value of the ``Retry-After`` response header
+        :return: Seconds to wait before the next attempt, or None to give up
+        """
+        if attempt >= self.max_attempts:
+            return
+        if status is not None and status not in self.statuses:
+            return
+        if method not in self.methods and status != 429:
+            return
+
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+            if self.jitter:
+                delay = random.uniform(0, delay)
+        if self.max_elapsed is not None and elapsed + delay > self.max_elapsed:
+            return
+        return delay
+
+    def sleep(self, delay):
+        time.sleep(delay)
+
+
+def parse_retry_after(value):
+    """
+    :param value: ``Retry-After`` header value, in seconds or as an HTTP date
+    :return: Seconds to wait, or None if the value is missing or invalid
+    """
+    if not value:
+        return
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
@@ -58,7 +58,7 @@ import logging
 from .entity import EntityBase, declarative_base
 from .metadata import MetaData
 from .exceptions import ODataError
-from .context import Context
+from .context import Context, AsyncContext
 from .action import Action, Function
 
 __all__ = (
@@ -74,14 +74,42 @@ class ODataService(object):
     :param reflect_entities: Create a request to the service for its metadata, and create entity classes automatically
     :param session: Custom Requests session to use for communication with the endpoint
     :param auth: Custom Requests auth object to use for credentials
+    :param cache: :py:class:`~odata.cache.QueryCache` used by the default context
+    :param codec: JSON codec instance or name used by the contexts of the service, see :py:mod:`odata.codec`
+    :param retry: :py:class:`~odata.retry.RetryPolicy` used by the contexts of the service
+    :param http_cache: :py:class:`~odata.httpcache.HTTPCache` shared by the contexts of the service
+    :param single_flight: :py:class:`~odata.singleflight.SingleFlight` shared by the contexts of the service
+    :param throttle: :py:class:`~odata.throttle.Throttle` shared by the contexts of the service
+    :param circuit_breaker: :py:class:`~odata.circuit.CircuitBreaker` shared by the contexts of the service
+    :param timeout: Request timeout of the contexts of the service in seconds, or a tuple of connect and read timeouts. See :py:mod:`odata.timeout`
+    :param pool: :py:class:`~odata.pool.ConnectionPool` shared by the contexts of the service. Its ``prewarm`` connections are opened right away. Not applied to a custom ``session``
     :raises ODataConnectionError: Fetching metadata failed. Server returned an HTTP error code
     """
-    def __init__(self, url, base=None, reflect_entities=False, session=None, auth=None):
+    def __init__(self, url, base=None, reflect_entities=False, session=None, auth=None, cache=None,
+                 codec=None, retry=None, http_cache=None, single_flight=None,
+                 throttle=None, circuit_breaker=None, timeout=None, pool=None):
         self.url = url
+        self.codec = codec
+        self.retry = retry
+        self.http_cache = http_cache
+        self.single_flight = single_flight
+        self.throttle = throttle
+        self.circuit_breaker = circuit_breaker
+        self.timeout = timeout
+        self.pool = pool
         self.metadata_url = ''
         self.collections = {}
         self.log = logging.getLogger('odata.service')
-        self.default_context = Context(auth=auth, session=session)
+        self.default_context = Context(auth=auth, session=session, url=url, cache=cache,
+                                       codec=codec, retry=retry, http_cache=http_cache,
+                                       single_flight=single_flight, throttle=throttle,
+                                       circuit_breaker=circuit_breaker, timeout=timeout,
+                                       pool=pool)
+        if pool is not None and pool.prewarm and session is None:
+            try:
+                pool.warm(url, session=self.default_context.connection.session)
+            except Exception as e:
+                self.log.warning(u'Could not prewarm connections to {0}: {1}'.format(url, e))
 
         self.entities = {}
         """
@@ -147,16 +175,63 @@ class ODataService(object):
     def __repr__(self):
         return u'<ODataService at {0}>'.format(self.url)
 
-    def create_context(self, auth=None, session=None):
+    def create_context(self, auth=None, session=None, cache=None, codec=None, retry=None,
+                       http_cache=None, single_flight=None, throttle=None,
+                       circuit_breaker=None, timeout=None, pool=None):
         """
         Create new context to use for session-like usage
 
         :param auth: Custom Requests auth object to use for credentials
         :param session: Custom Requests session to use for communication with the endpoint
+        :param cache: :py:class:`~odata.cache.QueryCache` for query results
+        :param codec: JSON codec instance or name. Defaults to the codec of the service
+        :param retry: :py:class:`~odata.retry.RetryPolicy`. Defaults to the policy of the service
+        :param http_cache: :py:class:`~odata.httpcache.HTTPCache`. Defaults to the cache of the service
+        :param single_flight: :py:class:`~odata.singleflight.SingleFlight`. Defaults to the one of the service
+        :param throttle: :py:class:`~odata.throttle.Throttle`. Defaults to the throttle of the service
+        :param circuit_breaker: :py:class:`~odata.circuit.CircuitBreaker`. Defaults to the breaker of the service
+        :param timeout: Request timeout. Defaults to the timeout of the service
+        :param pool: :py:class:`~odata.pool.ConnectionPool`. Defaults to the pool of the service
         :return: Context instance
         :rtype: Context
         """
-        return Context(auth=auth, session=session)
+        return Context(auth=auth, session=session, url=self.url, cache=cache,
+                       codec=codec or self.codec, retry=retry or self.retry,
+                       http_cache=http_cache or self.http_cache,
+                       single_flight=single_flight or self.single_flight,
+                       throttle=throttle or self.throttle,
+                       circuit_breaker=circuit_breaker or self.circuit_breaker,
+                       timeout=timeout or self.timeout,
+                       pool=pool or self.pool)
+
+    def create_async_context(self, auth=None, session=None, cache=None, codec=None, retry=None,
+                             http_cache=None, single_flight=None, throttle=None,
+                             circuit_breaker=None, timeout=None, pool=None):
+        """
+        Create new context for use with asyncio. Requires ``aiohttp``
+
+        :param auth: ``aiohttp.BasicAuth`` instance or a ``(username, password)`` tuple
+        :param session: Custom aiohttp ClientSession to use for communication with the endpoint
+        :param cache: :py:class:`~odata.cache.QueryCache` for query results
+        :param codec: JSON codec instance or name. Defaults to the codec of the service
+        :param retry: :py:class:`~odata.retry.RetryPolicy`. Defaults to the policy of the service
+        :param http_cache: :py:class:`~odata.httpcache.HTTPCache`. Defaults to the cache of the service
+        :param single_flight: :py:class:`~odata.singleflight.SingleFlight`. Defaults to the one of the service
+        :param throttle: :py:class:`~odata.throttle.Throttle`. Defaults to the throttle of the service
+        :param circuit_breaker: :py:class:`~odata.circuit.CircuitBreaker`. Defaults to the breaker of the service
+        :param timeout: Request timeout. Defaults to the timeout of the service
+        :param pool: :py:class:`~odata.pool.ConnectionPool`. Defaults to the pool of the service
+        :return: AsyncContext instance
+        :rtype: AsyncContext
+        """
+        return AsyncContext(auth=auth, session=session, url=self.url, cache=cache,
+                            codec=codec or self.codec, retry=retry or self.retry,
+                            http_cache=http_cache or self.http_cache,
+                            single_flight=single_flight or self.single_flight,
+                            throttle=throttle or self.throttle,
+                            circuit_breaker=circuit_breaker or self.circuit_breaker,
+                            timeout=timeout or self.timeout,
+                            pool=pool or self.pool)
 
     def describe(self, entity):
         """
@@ -179,6 +254,18 @@ class ODataService(object):
         """
         return self.default_context.query(entitycls)
 
+    def batch(self, json_format=False, raise_on_error=True):
+        """
+        Collect requests to be sent in a single ``$batch`` call. See
+        :py:mod:`odata.batch`
+
+        :param json_format: Use the JSON batch format instead of ``multipart/mixed``
+        :param raise_on_error: Raise the first failed request's error after the batch has been executed
+        :return: Batch instance
+        """
+        return self.default_context.batch(json_format=json_format,
+                                          raise_on_error=raise_on_error)
+
     def delete(self, entity):
         """
         Creates a DELETE call to the service, deleting the entity
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+"""
+Request coalescing
+==================
+
+Many threads or tasks often request the same url at the same moment, for
+example the same query or the same navigation property. With a
+:py:class:`SingleFlight`, identical GET requests that are sent while one
+is already in flight wait for it instead of reaching the endpoint:
+
+.. code-block:: python
+
+    >>> from odata.singleflight import SingleFlight
+    >>> Service = ODataService(url, single_flight=SingleFlight())
+    >>> # ... many threads run Service.query(Country).all() at once
+    >>> Service.single_flight.stats
+    {'requests': 48, 'collapsed': 45, 'in_flight': 0}
+
+Requests are identical when their url, query options, additional headers
+and credentials are. Requests made with a session given to the Context are
+only coalesced with requests through the same session, and asyncio
+requests only with requests in the same event loop. Every waiter receives
+its own copy of the decoded response, or the error the request raised. A
+waiter stops waiting at its own deadline (see :py:mod:`odata.timeout`).
+If the request was cancelled, or failed with the deadline or the open
+circuit breaker of its caller, the waiters send their own requests
+instead. Requests are only coalesced while in flight, nothing is kept after the response has been handed out; see
+:py:mod:`odata.cache` for caching results.
+
+Blocking and asyncio connections can share one instance.
+
+----
+
+API
+---
+"""
+
+import asyncio
+import copy
+import threading
+
+from odata.exceptions import CircuitOpenError, DeadlineExceeded
+from odata.timeout import current_deadline
+
+# errors that depend on the caller, waiters retry instead of sharing them
+RETRY_ERRORS = (CircuitOpenError, DeadlineExceeded)
+
+
+class _Call(object):
+
+    def __init__(self, done):
+        self.done = done
+        self.waiters = 0
+        self.result = None
+        self.error = None
+        self.retry = False
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls with the same key into one
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        self.requests = 0
+        """Number of calls made"""
+        self.collapsed = 0
+        """Number of calls that waited for another call instead of running"""
+
+    def __repr__(self):
+        return '<SingleFlight {0} collapsed>'.format(self.collapsed)
+
+    @property
+    def in_flight(self):
+        """Number of calls currently running"""
+        return len(self._calls) + len(self._async_calls)
+
+    @property
+    def stats(self):
+        """
+        Dictionary of requests, collapsed requests and calls in flight
+        """
+        with self._lock:
+            return dict(requests=self.requests, collapsed=self.collapsed, in_flight=self.in_flight)
+
+    def call(self, key, fn):
+        """
+        Run ``fn``, or wait for the result of a running call with the same key
+
+        :param key: Hashable key identifying the call
+        :param fn: Function to run
+        :return: Return value of ``fn``. Waiting callers receive a deep copy
+        :raises DeadlineExceeded: The deadline of a waiting caller passed
+        """
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call(threading.Event())
+            else:
+                call.waiters += 1
+                self.collapsed += 1
+
+        if not leader:
+            current = current_deadline()
+            while not call.done.wait(None if current is None else current.remaining()):
+                current.check()
+            if call.retry:
+                return self.call(key, fn)
+            return _result_of(call)
+
+        result = None
+        try:
+            result = fn()
+        except BaseException as e:
+            _fail(call, e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            self._share(call, result)
+            call.done.set()
+        return result
+
+    async def call_async(self, key, fn):
+        """
+        Asynchronous version of :py:func:`call`. Calls are coalesced within
+        one event loop
+
+        :param fn: Coroutine function to run
+        """
+        key = asyncio.get_running_loop(), key
+        with self._lock:
+            self.requests += 1
+            call = self._async_calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._async_calls[key] = _Call(asyncio.get_running_loop().create_future())
+            else:
+                call.waiters += 1
+                self.collapsed += 1
+
+        if not leader:
+            current = current_deadline()
+            while not call.done.done():
+                await asyncio.wait([call.done], timeout=None if current is None else current.remaining())
+                if current is not None and not call.done.done():
+                    current.check()
+            if call.retry:
+                return await self.call_async(key[1], fn)
+            return _result_of(call)
+
+        result = None
+        try:
+            result = await fn()
+        except BaseException as e:
+            _fail(call, e)
+            raise
+        finally:
+            with self._lock:
+                del self._async_calls[key]
+            self._share(call, result)
+            call.done.set_result(None)
+        return result
+
+    def _share(self, call, result):
+        # Waiters copy the result while the caller may already modify it
+        if call.waiters and call.error is None and not call.retry:
+            call.result = copy.deepcopy(result)
+
+
+def _fail(call, error):
+    if isinstance(error, Exception) and not isinstance(error, RETRY_ERRORS):
+        call.error = error
+    else:
+        # cancelled, interrupted or failed for reasons of the caller only
+        call.retry = True
+
+
+def _result_of(call):
+    if call.error is not None:
+        raise call.error
+    return copy.deepcopy(call.result)
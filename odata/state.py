@@ -8,6 +8,49 @@ from collections import OrderedDict
 from odata.property import PropertyBase, NavigationProperty
 
 
+def format_entity_id(entity_name, key_values):
+    """
+    Format the canonical address of an entity, for example
+    ``Products(1)`` or ``Sales(ProductID=1,ManufacturerID=2)``
+
+    :param entity_name: Name of the EntitySet
+    :param key_values: List of (primary key property, escaped value) tuples
+    :return: String or None if there are no key values
+    """
+    if len(key_values) == 1:
+        key_value = key_values[0][1]
+        return u'{0}({1})'.format(entity_name,
+                                  key_value)
+    if len(key_values) > 1:
+        key_ids = []
+        for prop, key_value in key_values:
+            key_ids.append('{0}={1}'.format(prop.name, key_value))
+        return u'{0}({1})'.format(entity_name, ','.join(key_ids))
+
+
+class PropertyRegistry(object):
+    """
+    Compiled lookup tables for the properties of an Entity class. Built once
+    per class by :py:class:`~odata.entity.EntityMeta` and dropped whenever
+    a property is assigned to or removed from the class or its bases
+    """
+
+    def __init__(self, entitycls):
+        props = []
+        navs = []
+        for key, value in inspect.getmembers(entitycls):
+            if isinstance(value, PropertyBase):
+                props.append((key, value))
+            elif isinstance(value, NavigationProperty):
+                navs.append((key, value))
+
+        self.properties = tuple(props)
+        self.primary_key_properties = tuple(
+            (key, prop) for key, prop in props if prop.primary_key is True
+        )
+        self.navigation_properties = tuple(navs)
+
+
 class EntityState(object):
 
     def __init__(self, entity):
@@ -35,6 +78,19 @@ class EntityState(object):
 
     def update(self, other):
         self.data.update(other)
+
+    def bind(self, connection):
+        """
+        Set the connection of the entity and the expanded entities in its
+        navigation cache
+        """
+        self.connection = connection
+        for cache in self.nav_cache.values():
+            for value in cache.values():
+                related = value if isinstance(value, list) else [value]
+                for entity in related:
+                    if entity is not None:
+                        entity.__odata__.bind(connection)
     # /dictionary access
 
     def __repr__(self):
@@ -83,51 +139,36 @@ class EntityState(object):
             value = self.data.get(prop.name)
             if value:
                 ids.append((prop, str(prop.escape_value(value))))
-        if len(ids) == 1:
-            key_value = ids[0][1]
-            return u'{0}({1})'.format(entity_name,
-                                      key_value)
-        if len(ids) > 1:
-            key_ids = []
-            for prop, key_value in ids:
-                key_ids.append('{0}={1}'.format(prop.name, key_value))
-            return u'{0}({1})'.format(entity_name, ','.join(key_ids))
+        return format_entity_id(entity_name, ids)
 
     @property
     def instance_url(self):
         if self.id:
             return self.entity.__odata_url_base__ + self.id
 
+    @property
+    def registry(self):
+        """:rtype: PropertyRegistry"""
+        return self.entity.__class__.__odata_registry__
+
     @property
     def properties(self):
-        props = []
-        cls = self.entity.__class__
-        for key, value in inspect.getmembers(cls):
-            if isinstance(value, PropertyBase):
-                props.append((key, value))
-        return props
+        return self.registry.properties
 
     @property
     def primary_key_properties(self):
-        pks = []
-        for prop_name, prop in self.properties:
-            if prop.primary_key is True:
-                pks.append((prop_name, prop))
-        return pks
+        return self.registry.primary_key_properties
 
     @property
     def navigation_properties(self):
-        props = []
-        cls = self.entity.__class__
-        for key, value in inspect.getmembers(cls):
-            if isinstance(value, NavigationProperty):
-                props.append((key, value))
-        return props
+        return self.registry.navigation_properties
 
     @property
     def dirty_properties(self):
         rv = []
-        for prop_name, prop in self.properties:
+        if not self.dirty:
+            return rv
+        for prop_name, prop in self.registry.properties:
             if prop.name in self.dirty:
                 rv.append((prop_name, prop))
         return rv
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+"""
+Streaming responses
+===================
+
+By default a response page is read and decoded completely before its first
+row is returned. With :py:func:`~odata.query.Query.stream`, the response
+body is downloaded in chunks and the rows of the ``value`` array are
+decoded as soon as they are complete:
+
+.. code-block:: python
+
+    >>> for order in Service.query(Order).stream():
+    ...     export(order)
+
+Only the current chunk and the row being decoded are kept in memory, which
+bounds memory use on very large pages. Annotations such as
+``@odata.nextLink`` may appear before or after ``value``; the next page is
+requested once the current one has been read to the end.
+
+Streamed responses are not stored in the result cache, and streaming can
+not be combined with prefetching, keyset pagination or parallel scans.
+
+----
+
+API
+---
+"""
+
+import codecs
+import json
+import re
+
+from odata.exceptions import ODataError
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_INCOMPLETE = object()
+
+
+class JSONStreamParser(object):
+    """
+    Incremental parser of a JSON response object. Members other than the
+    streamed array are collected to :py:attr:`annotations`, items of the
+    array are returned from :py:func:`feed` as soon as they are complete
+
+    :param array_key: Name of the member whose items are streamed
+    """
+
+    def __init__(self, array_key='value'):
+        self.array_key = array_key
+        self.annotations = {}
+        """Dictionary of the members read so far, except the streamed array"""
+        self.has_array = False
+        """True once the streamed array has been found"""
+
+        # some servers prefix the body with a byte order mark
+        self._decode_text = codecs.getincrementaldecoder('utf-8-sig')().decode
+        self._scan = json.JSONDecoder().raw_decode
+        self._buffer = ''
+        self._pos = 0
+        self._state = 'start'
+        self._key = None
+
+    def feed(self, chunk, final=False):
+        """
+        Parse the next chunk of the response body
+
+        :param chunk: Bytes or string
+        :param final: True when there is no more data
+        :return: List of array items completed by this chunk
+        :raises ODataError: The response is not a valid JSON object
+        """
+        if isinstance(chunk, bytes):
+            chunk = self._decode_text(chunk, final)
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        items = []
+        while self._step(items, final):
+            pass
+        return items
+
+    def close(self):
+        """
+        Parse the rest of the buffered data
+
+        :return: List of the remaining array items
+        :raises ODataError: The response ended before the JSON object was complete
+        """
+        items = self.feed(b'', final=True)
+        if self._state != 'done':
+            raise ODataError('Incomplete JSON response')
+        return items
+
+    def _step(self, items, final):
+        buf = self._buffer
+        pos = self._pos = _WHITESPACE.match(buf, self._pos).end()
+        if pos == len(buf):
+            return False
+        char = buf[pos]
+        state = self._state
+
+        if state == 'start':
+            if char != '{':
+                self._fail()
+            self._pos += 1
+            self._state = 'key'
+        elif state == 'key':
+            if char == '}':
+                self._pos += 1
+                self._state = 'done'
+            elif char == ',':
+                self._pos += 1
+            else:
+                key = self._value(final)
+                if key is _INCOMPLETE:
+                    return False
+                self._key = key
+                self._state = 'colon'
+        elif state == 'colon':
+            if char != ':':
+                self._fail()
+            self._pos += 1
+            self._state = 'member'
+        elif state == 'member':
+            if self._key == self.array_key and char == '[':
+                self._pos += 1
+                self.has_array = True
+                self._state = 'item'
+            else:
+                value = self._value(final)
+                if value is _INCOMPLETE:
+                    return False
+                if self._key == self.array_key and value is None:
+                    # a null array is an empty page
+                    self.has_array = True
+                else:
+                    self.annotations[self._key] = value
+                self._state = 'key'
+        elif state == 'item':
+            if char == ']':
+                self._pos += 1
+                self._state = 'key'
+            elif char == ',':
+                self._pos += 1
+            else:
+                value = self._value(final)
+                if value is _INCOMPLETE:
+                    return False
+                items.append(value)
+        else:
+            self._fail()
+        return True
+
+    def _value(self, final):
+        """
+        Decode the value at the current position
+
+        :return: Value, or ``_INCOMPLETE`` if more data is needed
+        """
+        buf = self._buffer
+        try:
+            value, end = self._scan(buf, self._pos)
+        except ValueError:
+            if final:
+                self._fail()
+            return _INCOMPLETE
+        if end == len(buf) and not final and isinstance(value, (int, float)):
+            # a number at the end of the buffer may continue in the next chunk
+            return _INCOMPLETE
+        self._pos = end
+        return value
+
+    def _fail(self):
+        snippet = self._buffer[self._pos:self._pos + 20]
+        raise ODataError(u'Invalid JSON response near: {0}'.format(snippet))
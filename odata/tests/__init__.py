@@ -4,6 +4,7 @@ from odata import ODataService
 from odata.property import StringProperty, IntegerProperty, DecimalProperty, \
     NavigationProperty, DatetimeProperty
 from odata.enumtype import EnumType, EnumTypeProperty
+from odata.retry import RetryPolicy
 
 url = 'http://unittest.server.local/odata/'
 Service = ODataService(url)
@@ -103,3 +104,16 @@ class ProductManufacturerSales(Service.Entity):
     product_id = IntegerProperty('ProductID', primary_key=True)
     manufacturer_id = IntegerProperty('ManufacturerID', primary_key=True)
     sales_amount = DecimalProperty('SalesAmount')
+
+
+class NoSleepPolicy(RetryPolicy):
+    """
+    RetryPolicy that records its delays instead of sleeping
+    """
+
+    def __init__(self, **kwargs):
+        super(NoSleepPolicy, self).__init__(**kwargs)
+        self.delays = []
+
+    def sleep(self, delay):
+        self.delays.append(delay)
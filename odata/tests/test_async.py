@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from decimal import Decimal
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from urllib.parse import urlsplit, parse_qs
+except ImportError:
+    BaseHTTPRequestHandler = HTTPServer = None
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from odata import ODataService
+from odata.entity import declarative_base
+from odata.exceptions import ODataError, ODataQueryError, NoResultsFound, CircuitOpenError, DeadlineExceeded
+from odata.circuit import CircuitBreaker
+from odata.pool import ConnectionPool
+from odata.retry import RetryPolicy
+from odata.singleflight import SingleFlight
+from odata.throttle import Throttle
+from odata.property import IntegerProperty, StringProperty, DecimalProperty, \
+    NavigationProperty
+
+
+class StandInServer(object):
+    """
+    Minimal OData endpoint on a local port. Routes map (method, path) to
+    a callable receiving the parsed query and json body, returning
+    (status, json body or None)
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                body = json.loads(body.decode('utf-8')) if body else None
+                query = dict((k, v[0]) for k, v in parse_qs(parts.query).items())
+                server.requests.append((self.command, parts.path, query, body))
+
+                route = server.routes.get((self.command, parts.path))
+                if route is None:
+                    status, data = 404, {'error': {'code': 'NotFound', 'message': 'No route'}}
+                else:
+                    status, data = route(query, body)
+
+                payload = b'' if data is None else json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                if data is not None:
+                    self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+        self.httpd = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{0}/odata/'.format(self.httpd.server_address[1])
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       kwargs=dict(poll_interval=0.05))
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@unittest.skipIf(aiohttp is None or HTTPServer is None, 'aiohttp not installed')
+class TestAsyncContext(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer()
+        self.server.start()
+
+        Base = declarative_base()
+        self.Service = ODataService(self.server.url, Base)
+
+        class Supplier(Base):
+            __odata_collection__ = 'Suppliers'
+            __odata_type__ = 'Test.Supplier'
+            id = IntegerProperty('SupplierID', primary_key=True)
+            name = StringProperty('Name')
+
+        class _Restock(self.Service.Action):
+            name = 'Test.Restock'
+            parameters = dict(Amount=DecimalProperty)
+            bound_to_collection = True
+
+        class Item(Base):
+            __odata_collection__ = 'Items'
+            __odata_type__ = 'Test.Item'
+            id = IntegerProperty('ItemID', primary_key=True)
+            name = StringProperty('Name')
+            supplier = NavigationProperty('Supplier', Supplier)
+
+            Restock = _Restock()
+
+        self.Item = Item
+        self.Supplier = Supplier
+
+    def tearDown(self):
+        self.server.stop()
+
+    def run_async(self, fn):
+        async def runner():
+            async with self.Service.create_async_context() as context:
+                return await fn(context)
+        return asyncio.run(runner())
+
+    def test_async_iteration_follows_next_link(self):
+        def items(query, body):
+            if query.get('page') == '2':
+                return 200, {'value': [{'ItemID': 3, 'Name': 'c'}]}
+            return 200, {
+                'value': [{'ItemID': 1, 'Name': 'a'}, {'ItemID': 2, 'Name': 'b'}],
+                '@odata.nextLink': 'Items?page=2',
+            }
+        self.server.routes[('GET', '/odata/Items')] = items
+
+        async def fn(context):
+            query = context.query(self.Item).filter(self.Item.name != 'x')
+            return [item async for item in query]
+
+        result = self.run_async(fn)
+        self.assertEqual([i.id for i in result], [1, 2, 3])
+        self.assertIsInstance(result[0], self.Item)
+        first_request = self.server.requests[0]
+        self.assertEqual(first_request[2].get('$filter'), "Name ne 'x'")
+
+    def test_async_prefetch(self):
+        def items(query, body):
+            page = int(query.get('page', 0))
+            data = {'value': [{'ItemID': page, 'Name': str(page)}]}
+            if page < 4:
+                data['@odata.nextLink'] = 'Items?page={0}'.format(page + 1)
+            return 200, data
+        self.server.routes[('GET', '/odata/Items')] = items
+
+        async def fn(context):
+            query = context.query(self.Item).prefetch(2)
+            return [item.id async for item in query]
+
+        self.assertEqual(self.run_async(fn), [0, 1, 2, 3, 4])
+
+    def test_async_stream(self):
+        def items(query, body):
+            page = int(query.get('page', 0))
+            data = {'value': [{'ItemID': page, 'Name': str(page)}]}
+            if page < 2:
+                data['@odata.nextLink'] = 'Items?page={0}'.format(page + 1)
+            return 200, data
+        self.server.routes[('GET', '/odata/Items')] = items
+
+        async def fn(context):
+            query = context.query(self.Item).stream(chunk_size=8)
+            return [item.id async for item in query]
+
+        self.assertEqual(self.run_async(fn), [0, 1, 2])
+
+    def test_count(self):
+        self.server.routes[('GET', '/odata/Items/$count')] = lambda q, b: (200, 5)
+
+        async def fn(context):
+            return await context.query(self.Item).filter(self.Item.id > 1).count()
+
+        self.assertEqual(self.run_async(fn), 5)
+        self.assertEqual(self.server.requests[0][2].get('$filter'), 'ItemID gt 1')
+
+    def test_all_first_one_get(self):
+        def items(query, body):
+            rows = [{'ItemID': 1, 'Name': 'a'}, {'ItemID': 2, 'Name': 'b'}]
+            top = int(query.get('$top', len(rows)))
+            return 200, {'value': rows[:top]}
+        self.server.routes[('GET', '/odata/Items')] = items
+
+        async def fn(context):
+            query = context.query(self.Item)
+            everything = await query.all()
+            first = await query.first()
+            with self.assertRaises(NoResultsFound):
+                await query.get(5)
+            return everything, first
+
+        everything, first = self.run_async(fn)
+        self.assertEqual(len(everything), 2)
+        self.assertEqual(first.id, 1)
+        self.assertEqual(self.server.requests[1][2].get('$top'), '1')
+
+    def test_save_insert_and_update(self):
+        def insert(query, body):
+            body['ItemID'] = 10
+            return 201, body
+        self.server.routes[('POST', '/odata/Items')] = insert
+        self.server.routes[('PATCH', '/odata/Items(10)')] = lambda q, b: (204, None)
+        self.server.routes[('GET', '/odata/Items(10)')] = lambda q, b: (200, {'ItemID': 10, 'Name': 'changed'})
+
+        item = self.Item()
+        item.name = 'new'
+
+        async def fn(context):
+            await context.save(item)
+            self.assertEqual(item.id, 10)
+            item.name = 'changed'
+            await context.save(item)
+
+        self.run_async(fn)
+        self.assertEqual(item.name, 'changed')
+        methods = [r[0] for r in self.server.requests]
+        self.assertEqual(methods, ['POST', 'PATCH', 'GET'])
+        self.assertEqual(self.server.requests[1][3]['Name'], 'changed')
+
+    def test_delete(self):
+        self.server.routes[('DELETE', '/odata/Items(4)')] = lambda q, b: (204, None)
+        item = self.Item.__new__(self.Item, from_data={'ItemID': 4, 'Name': 'd'})
+
+        async def fn(context):
+            await context.delete(item)
+
+        self.run_async(fn)
+        self.assertFalse(item.__odata__.persisted)
+
+    def test_navigation_load(self):
+        self.server.routes[('GET', '/odata/Items')] = lambda q, b: (200, {'value': [{'ItemID': 1, 'Name': 'a'}]})
+        self.server.routes[('GET', '/odata/Items(1)/Supplier')] = lambda q, b: (200, {'SupplierID': 7, 'Name': 'S'})
+
+        async def fn(context):
+            item = await context.query(self.Item).first()
+            with self.assertRaises(ODataError):
+                item.supplier
+            supplier = await context.load(item, self.Item.supplier)
+            return item, supplier
+
+        item, supplier = self.run_async(fn)
+        self.assertIsInstance(supplier, self.Supplier)
+        self.assertEqual(supplier.id, 7)
+        self.assertIs(item.supplier, supplier)
+
+    def test_call_action(self):
+        self.server.routes[('POST', '/odata/Items/Test.Restock')] = lambda q, b: (200, {'value': b['Amount']})
+
+        async def fn(context):
+            return await context.call(self.Item.Restock, Amount=Decimal('2.5'))
+
+        self.assertEqual(self.run_async(fn), 2.5)
+
+    def test_error_handling(self):
+        async def fn(context):
+            await context.query(self.Item).all()
+
+        with self.assertRaises(ODataError) as ctx:
+            self.run_async(fn)
+        self.assertEqual(ctx.exception.code, 'NotFound')
+        self.assertEqual(ctx.exception.status_code, 'HTTP 404')
+
+    def test_retry(self):
+        calls = []
+
+        def items(query, body):
+            calls.append(query)
+            if len(calls) == 1:
+                return 503, None
+            return 200, {'value': [{'ItemID': 1, 'Name': 'a'}]}
+        self.server.routes[('GET', '/odata/Items')] = items
+
+        async def fn():
+            retry = RetryPolicy(backoff=0)
+            async with self.Service.create_async_context(retry=retry) as context:
+                return await context.query(self.Item).all()
+
+        self.assertEqual([i.id for i in asyncio.run(fn())], [1])
+        self.assertEqual(len(calls), 2)
+
+    def test_batch_is_not_supported(self):
+        context = self.Service.create_async_context()
+        self.assertRaises(ODataError, context.batch)
+        self.assertRaises(ODataError, context.connection.execute_batch,
+                          self.server.url + '$batch', [])
+        self.assertIsNone(context.connection.session)
+
+    def test_parallel_is_not_supported(self):
+        async def fn(context):
+            query = context.query(self.Item).parallel(workers=2)
+            with self.assertRaises(ODataQueryError):
+                await query.all()
+            with self.assertRaises(ODataQueryError):
+                async for page in query.iter_pages():
+                    pass
+
+        self.run_async(fn)
+        self.assertEqual(self.server.requests, [])
+
+    def test_single_flight(self):
+        calls = []
+
+        def items(query, body):
+            calls.append(query)
+            return 200, {'value': [{'ItemID': 1, 'Name': 'a'}]}
+        self.server.routes[('GET', '/odata/Items')] = items
+        flight = SingleFlight()
+
+        async def fn():
+            async with self.Service.create_async_context(single_flight=flight) as context:
+                return await asyncio.gather(*[context.query(self.Item).all() for _ in range(5)])
+
+        results = asyncio.run(fn())
+        self.assertEqual([[i.id for i in r] for r in results], [[1]] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.collapsed, 4)
+
+    def test_throttle(self):
+        def items(query, body):
+            return 200, {'value': [{'ItemID': 1, 'Name': 'a'}]}
+        self.server.routes[('GET', '/odata/Items')] = items
+        throttle = Throttle(max_concurrency=2)
+
+        async def fn():
+            async with self.Service.create_async_context(throttle=throttle) as context:
+                return await asyncio.gather(*[context.query(self.Item).all() for _ in range(5)])
+
+        self.assertEqual(len(asyncio.run(fn())), 5)
+        host = self.server.url.split('/')[2]
+        self.assertEqual(throttle.stats[host], dict(limit=2, in_flight=0, queued=0, rate=None))
+
+    def test_pool(self):
+        def items(query, body):
+            return 200, {'value': [{'ItemID': 1, 'Name': 'a'}]}
+        self.server.routes[('GET', '/odata/Items')] = items
+        pool = ConnectionPool(size=2)
+
+        async def fn():
+            async with self.Service.create_async_context(pool=pool) as context:
+                connector = context.connection._get_session().connector
+                self.assertEqual(connector.limit_per_host, 2)
+                return await asyncio.gather(*[context.query(self.Item).all() for _ in range(4)])
+
+        self.assertEqual(len(asyncio.run(fn())), 4)
+        self.assertEqual(pool.stats['checkouts'], 4)
+        self.assertEqual(pool.stats['in_use'], 0)
+
+    def test_circuit_breaker(self):
+        calls = []
+
+        def items(query, body):
+            calls.append(query)
+            return 503, None
+        self.server.routes[('GET', '/odata/Items')] = items
+        breaker = CircuitBreaker(failure_threshold=2)
+
+        async def fn():
+            async with self.Service.create_async_context(circuit_breaker=breaker) as context:
+                for _ in range(2):
+                    with self.assertRaises(ODataError):
+                        await context.query(self.Item).all()
+                with self.assertRaises(CircuitOpenError):
+                    await context.query(self.Item).all()
+
+        asyncio.run(fn())
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(breaker.state, 'open')
+
+    def test_deadline(self):
+        def items(query, body):
+            time.sleep(0.3)
+            return 200, {'value': []}
+        self.server.routes[('GET', '/odata/Items')] = items
+
+        async def fn(context):
+            with context.deadline(0.1):
+                await context.query(self.Item).all()
+
+        started = time.monotonic()
+        self.assertRaises(DeadlineExceeded, self.run_async, fn)
+        self.assertLess(time.monotonic() - started, 0.3)
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata import batch
+from odata.context import Context
+from odata.exceptions import ODataError, NoResultsFound
+from odata.tests import Service, Product, DemoUnboundAction
+
+
+def http_part(status, body=None, content_id=None, content_type='application/json;odata.metadata=minimal'):
+    lines = [
+        'Content-Type: application/http',
+        'Content-Transfer-Encoding: binary',
+    ]
+    if content_id:
+        lines.append('Content-ID: {0}'.format(content_id))
+    lines.append('')
+    lines.append('HTTP/1.1 {0} Status'.format(status))
+    if body is not None:
+        lines.append('Content-Type: ' + content_type)
+    lines.append('')
+    if body is None:
+        lines.append('')
+    else:
+        lines.append(json.dumps(body) if content_type.startswith('application/json') else body)
+    return '\r\n'.join(lines)
+
+
+def multipart(parts, boundary):
+    lines = []
+    for part in parts:
+        lines.append('--' + boundary)
+        lines.append(part)
+    lines.append('--' + boundary + '--')
+    return '\r\n'.join(lines)
+
+
+def parse_request_parts(request):
+    content_type = request.headers['Content-Type']
+    body = request.body
+    decoded = []
+    for part in batch._split_multipart(body, batch._get_boundary(content_type)):
+        _, headers, payload = batch._split_headers(part)
+        if headers['content-type'].startswith('multipart/mixed'):
+            inner = []
+            for cs_part in batch._split_multipart(payload, batch._get_boundary(headers['content-type'])):
+                _, cs_headers, cs_payload = batch._split_headers(cs_part)
+                inner.append((cs_headers.get('content-id'), cs_payload))
+            decoded.append(inner)
+        else:
+            decoded.append(payload)
+    return decoded
+
+
+class TestBatch(TestCase):
+
+    def test_multipart_batch(self):
+        product = Product.__new__(Product, from_data={'ProductID': 7, 'ProductName': 'Old'})
+        product.name = 'Changed'
+
+        new_product = Product()
+        new_product.name = 'New'
+
+        def request_callback(request):
+            parts = parse_request_parts(request)
+            self.assertEqual(len(parts), 3)
+            self.assertTrue(parts[0].startswith(b'GET ProductParts(1) HTTP/1.1'))
+
+            changeset = parts[1]
+            self.assertEqual([cid for cid, _ in changeset], ['2', '3'])
+            self.assertTrue(changeset[0][1].startswith(b'PATCH ProductParts(7) HTTP/1.1'))
+            self.assertIn(b'Prefer: return=representation', changeset[0][1])
+            self.assertTrue(changeset[1][1].startswith(b'POST ProductParts HTTP/1.1'))
+            self.assertTrue(parts[2].startswith(b'POST ODataTest.DemoUnboundAction HTTP/1.1'))
+
+            changeset_response = multipart([
+                http_part(200, {'ProductID': 7, 'ProductName': 'Changed'}, content_id='2'),
+                http_part(201, {'ProductID': 8, 'ProductName': 'New'}, content_id='3'),
+            ], 'changesetresponse_1')
+            body = multipart([
+                http_part(200, {'ProductID': 1, 'ProductName': 'First'}),
+                'Content-Type: multipart/mixed; boundary=changesetresponse_1\r\n\r\n' + changeset_response,
+                http_part(200, {'value': 'ok'}),
+            ], 'batchresponse_1')
+            headers = {'Content-Type': 'multipart/mixed; boundary=batchresponse_1'}
+            return requests.codes.ok, headers, body
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.POST, Service.url + '$batch',
+                              callback=request_callback)
+
+            with Service.batch() as b:
+                found = b.query(Product).get(1)
+                with b.changeset():
+                    saved = b.save(product)
+                    b.save(new_product)
+                action_result = b.call(DemoUnboundAction)
+
+                self.assertFalse(found.done())
+
+        self.assertEqual(found.result().name, 'First')
+        self.assertIs(saved.result(), product)
+        self.assertEqual(new_product.id, 8)
+        self.assertTrue(new_product.__odata__.persisted)
+        self.assertEqual(action_result.result(), 'ok')
+
+    def test_failed_request(self):
+        def request_callback(request):
+            body = multipart([
+                http_part(404, {'error': {'code': 'NotFound', 'message': 'Gone'}}),
+                http_part(404, {'error': {'code': 'NotFound', 'message': 'No entity'}}),
+            ], 'batchresponse_1')
+            headers = {'Content-Type': 'multipart/mixed; boundary=batchresponse_1'}
+            return requests.codes.ok, headers, body
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.POST, Service.url + '$batch',
+                              callback=request_callback)
+
+            b = Service.batch(raise_on_error=False)
+            with b:
+                missing = b.query(Product).raw({'$top': 1})
+                empty = b.query(Product).get(2)
+
+        self.assertIsInstance(missing.exception(), ODataError)
+        self.assertEqual(missing.exception().code, 'NotFound')
+        self.assertRaises(NoResultsFound, empty.result)
+
+    def test_json_batch(self):
+        product = Product.__new__(Product, from_data={'ProductID': 5, 'ProductName': 'Old'})
+
+        def request_callback(request):
+            payload = json.loads(request.body)
+            requests_ = payload['requests']
+            self.assertEqual(requests_[0]['method'], 'DELETE')
+            self.assertEqual(requests_[0]['url'], 'ProductParts(5)')
+            self.assertEqual(requests_[0]['atomicityGroup'], 'changeset1')
+            self.assertEqual(requests_[1]['url'], 'ProductParts?%24top=1')
+
+            body = {'responses': [
+                {'id': requests_[1]['id'], 'status': 200, 'body': {'value': [{'ProductID': 3}]}},
+                {'id': requests_[0]['id'], 'status': 204},
+            ]}
+            headers = {'Content-Type': 'application/json'}
+            return requests.codes.ok, headers, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.POST, Service.url + '$batch',
+                              callback=request_callback)
+
+            with Service.batch(json_format=True) as b:
+                with b.changeset():
+                    b.delete(product)
+                first = b.query(Product).first()
+
+        self.assertFalse(product.__odata__.persisted)
+        self.assertEqual(first.result().id, 3)
+
+    def test_get_not_allowed_in_changeset(self):
+        b = Service.batch()
+        with b.changeset():
+            self.assertRaises(ODataError, b.query(Product).all)
+
+    def test_result_before_execute(self):
+        b = Service.batch()
+        future = b.query(Product).all()
+        self.assertRaises(ODataError, future.result)
+
+    def test_count(self):
+        def request_callback(request):
+            parts = parse_request_parts(request)
+            self.assertTrue(parts[0].startswith(b'GET ProductParts/$count?'))
+            self.assertIn(b'Accept: text/plain', parts[0])
+            body = multipart([http_part(200, '42', content_type='text/plain')], 'batchresponse_1')
+            headers = {'Content-Type': 'multipart/mixed; boundary=batchresponse_1'}
+            return requests.codes.ok, headers, body
+
+        context = Context(url=Service.url.rstrip('/'))
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.POST, Service.url + '$batch',
+                              callback=request_callback)
+            with context.batch() as b:
+                count = b.query(Product).filter(Product.price > 1).count()
+
+        self.assertEqual(count.result(), 42)
+
+    def test_text_error(self):
+        body = multipart([http_part(500, 'Internal error', content_type='text/plain')], 'batchresponse_1')
+        headers = {'Content-Type': 'multipart/mixed; boundary=batchresponse_1'}
+
+        context = Context(url=Service.url.rstrip('/'))
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.POST, Service.url + '$batch', body=body, headers=headers)
+            b = context.batch(raise_on_error=False)
+            count = b.query(Product).count()
+            b.execute()
+
+        error = count.exception()
+        self.assertIsInstance(error, ODataError)
+        self.assertEqual(error.status_code, 'HTTP 500')
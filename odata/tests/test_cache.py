@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.cache import QueryCache, cache_key
+from odata.tests import Service, Product
+
+
+class TestQueryCache(TestCase):
+
+    def setUp(self):
+        self.cache = QueryCache(max_entries=2, ttl=10)
+        self.context = Service.create_context(cache=self.cache)
+        self.requests = 0
+
+    def request_callback(self, request):
+        self.requests += 1
+        body = {'value': [{'ProductID': 1, 'ProductName': 'Product 1'}]}
+        return requests.codes.ok, {}, json.dumps(body)
+
+    def test_cache_hit(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=self.request_callback,
+                              content_type='application/json')
+            first = self.context.query(Product).filter(Product.id == 1).all()
+            first[0].name = 'Changed'
+            second = self.context.query(Product).filter(Product.id == 1).all()
+
+        self.assertEqual(self.requests, 1)
+        self.assertEqual(second[0].name, 'Product 1')
+        self.assertEqual(self.cache.stats, dict(hits=1, misses=1, evictions=0,
+                                                expirations=0, entries=1))
+
+    def test_ttl(self):
+        now = [100]
+        self.cache._now = lambda: now[0]
+        self.cache.set('a', {'value': []})
+        self.assertEqual(self.cache.get('a'), {'value': []})
+        now[0] = 110
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.expirations, 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.get('c'), 3)
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_invalidated_on_save(self):
+        product = Product.__new__(Product, from_data={'ProductID': 1, 'ProductName': 'Product 1'})
+        product.name = 'Changed'
+        self.cache.set('other', 1, entity_set='Other')
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=self.request_callback,
+                              content_type='application/json')
+            rsps.add(rsps.PATCH, Product.__odata_url__() + '(1)', status=204)
+            self.context.query(Product).all()
+            self.context.save(product, force_refresh=False)
+            self.context.query(Product).all()
+
+        self.assertEqual(self.requests, 2)
+        self.assertEqual(self.cache.get('other'), 1)
+
+    def test_cache_key_is_canonical(self):
+        url = Product.__odata_url__()
+        self.assertEqual(cache_key(url, {'$top': 1, '$filter': 'a eq 1'}),
+                         cache_key(url, {'$filter': 'a eq 1', '$top': 1}))
+        self.assertEqual(cache_key(url), url)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.circuit import CircuitBreaker
+from odata.exceptions import CircuitOpenError, ODataConnectionError, ODataError
+from odata.tests import Service, Product
+
+
+class TestCircuitBreaker(TestCase):
+
+    def setUp(self):
+        self.changes = []
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60,
+                                      on_state_change=lambda old, new: self.changes.append((old, new)))
+
+    def fail(self, times, status=None):
+        for _ in range(times):
+            self.breaker.before_request()
+            self.breaker.record(status)
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail(2)
+        self.breaker.record(200)
+        self.fail(2, status=503)
+        self.assertEqual(self.breaker.state, 'closed')
+        self.fail(1)
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertRaises(CircuitOpenError, self.breaker.before_request, 'http://demo.local/')
+        self.assertEqual(self.changes, [('closed', 'open')])
+        self.assertEqual(self.breaker.stats['rejected'], 1)
+
+    def test_client_errors_are_not_failures(self):
+        self.fail(5, status=404)
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_half_open_probe(self):
+        self.fail(3)
+        self.breaker.reset_timeout = 0
+        self.breaker.before_request()
+        self.assertEqual(self.breaker.state, 'half_open')
+        # only one probe at a time
+        self.assertRaises(CircuitOpenError, self.breaker.before_request)
+        self.breaker.record(None)
+        self.assertEqual(self.breaker.state, 'open')
+
+        self.breaker.before_request()
+        self.breaker.record(200)
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertEqual(self.changes, [('closed', 'open'), ('open', 'half_open'), ('half_open', 'open'),
+                                        ('open', 'half_open'), ('half_open', 'closed')])
+        self.assertEqual(self.breaker.stats['transitions'], dict(closed=1, open=2, half_open=2))
+
+
+class TestCircuitBreakerContext(TestCase):
+
+    def test_fails_fast_while_open(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        context = Service.create_context(circuit_breaker=breaker)
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__(),
+                     body=requests.exceptions.ConnectionError('refused'))
+            for _ in range(2):
+                self.assertRaises(ODataConnectionError, context.query(Product).all)
+            self.assertRaises(CircuitOpenError, context.query(Product).all)
+            self.assertEqual(len(rsps.calls), 2)
+
+    def test_server_errors_open_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        context = Service.create_context(circuit_breaker=breaker)
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__(), status=500)
+            self.assertRaises(ODataError, context.query(Product).all)
+        self.assertEqual(breaker.state, 'open')
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+import unittest
+from collections import OrderedDict
+from decimal import Decimal
+
+import requests
+import responses
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from odata.codec import get_codec, JSONCodec, OrjsonCodec, CODECS
+from odata.exceptions import ODataError
+from odata.tests import Service, Product
+
+
+class TestCodecs(unittest.TestCase):
+
+    def check_codec(self, codec):
+        data = OrderedDict([
+            ('Name', u'Äö'),
+            ('Price', Decimal('1.25')),
+            ('Created', datetime.datetime(2020, 1, 2, 3, 4, 5)),
+            ('Updated', datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)),
+        ])
+        encoded = codec.dumps(data)
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(json.loads(encoded.decode('utf-8')), {
+            'Name': u'Äö',
+            'Price': 1.25,
+            'Created': '2020-01-02T03:04:05Z',
+            'Updated': '2020-01-02T03:04:05+00:00',
+        })
+        self.assertEqual(codec.loads(b'\xef\xbb\xbf{"value": [1.5]}'), {'value': [1.5]})
+        self.assertRaises(TypeError, codec.dumps, {'a': object()})
+
+    def test_json(self):
+        self.check_codec(get_codec())
+
+    @unittest.skipIf(orjson is None, 'orjson not installed')
+    def test_orjson(self):
+        codec = get_codec('orjson')
+        self.assertIsInstance(codec, OrjsonCodec)
+        self.check_codec(codec)
+
+    def test_get_codec(self):
+        codec = JSONCodec()
+        self.assertIs(get_codec(codec), codec)
+        self.assertIsInstance(get_codec('auto'), tuple(CODECS.values()))
+        self.assertRaises(ODataError, get_codec, 'xml')
+
+    @unittest.skipIf(orjson is None, 'orjson not installed')
+    def test_context_codec(self):
+        context = Service.create_context(codec='orjson')
+        self.assertIsInstance(context.connection.codec, OrjsonCodec)
+
+        def request_callback(request):
+            payload = json.loads(request.body)
+            self.assertEqual(payload['Price'], 2.5)
+            return requests.codes.created, {}, json.dumps(dict(payload, ProductID=1))
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.POST, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            product = Product()
+            product.name = 'Test'
+            product.price = Decimal('2.5')
+            context.save(product)
+
+        self.assertEqual(product.id, 1)
+        self.assertEqual(product.price, Decimal('2.5'))
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+import unittest
+from decimal import Decimal
+
+import requests
+import responses
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from odata.tests import Service, Manufacturer, Product
+
+UTC = datetime.timezone.utc
+
+
+def manufacturer_pages():
+    return [
+        [
+            {'ManufacturerID': 1, 'Name': 'A', 'DateEstablished': '2001-02-03T04:05:06Z'},
+            {'ManufacturerID': None, 'Name': None, 'DateEstablished': None},
+        ],
+        [
+            {'ManufacturerID': 3, 'Name': 'C', 'DateEstablished': '2001-02-03T04:05:06.5+02:00'},
+        ],
+    ]
+
+
+class TestColumns(unittest.TestCase):
+
+    def fetch(self, method, *args, **kwargs):
+        pages = manufacturer_pages()
+
+        def request_callback(request):
+            page = int(request.params.get('page', 0))
+            if page == 0:
+                expected = [a.name for a in args] or ['DateEstablished', 'ManufacturerID', 'Name']
+                self.assertEqual(request.params['$select'].split(','), expected)
+            body = {'value': pages[page]}
+            if page + 1 < len(pages):
+                body['@odata.nextLink'] = Manufacturer.__odata_url__() + '?page={0}'.format(page + 1)
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Manufacturer.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            query = Service.query(Manufacturer)
+            return getattr(query, method)(*args, **kwargs)
+
+    def test_to_columns(self):
+        columns = self.fetch('to_columns')
+        self.assertEqual(columns['ManufacturerID'], [1, None, 3])
+        self.assertEqual(columns['Name'], ['A', None, 'C'])
+        self.assertEqual(columns['DateEstablished'], [
+            datetime.datetime(2001, 2, 3, 4, 5, 6, tzinfo=UTC),
+            None,
+            datetime.datetime(2001, 2, 3, 2, 5, 6, 500000, tzinfo=UTC),
+        ])
+
+    def test_decimals(self):
+        def request_callback(request):
+            body = {'value': [{'Price': 1.25}, {'Price': None}, {'Price': '2.5'}]}
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            floats = Service.query(Product).to_columns(Product.price)
+            decimals = Service.query(Product).to_columns(Product.price, decimals='decimal')
+
+        self.assertEqual(floats['Price'], [1.25, None, 2.5])
+        self.assertEqual(decimals['Price'], [Decimal('1.25'), None, Decimal('2.5')])
+
+    @unittest.skipIf(numpy is None, 'numpy not installed')
+    def test_to_numpy(self):
+        columns = self.fetch('to_numpy', Manufacturer.id, Manufacturer.established_date)
+        self.assertEqual(columns['ManufacturerID'].dtype, numpy.float64)
+        self.assertTrue(numpy.isnan(columns['ManufacturerID'][1]))
+        dates = columns['DateEstablished']
+        self.assertEqual(dates.dtype, numpy.dtype('datetime64[us]'))
+        self.assertTrue(numpy.isnat(dates[1]))
+        self.assertEqual(str(dates[0]), '2001-02-03T04:05:06.000000')
+
+    @unittest.skipIf(pandas is None, 'pandas not installed')
+    def test_to_pandas(self):
+        frame = self.fetch('to_pandas')
+        self.assertEqual(list(frame.columns), ['DateEstablished', 'ManufacturerID', 'Name'])
+        self.assertEqual(str(frame['ManufacturerID'].dtype), 'Int64')
+        self.assertTrue(pandas.isna(frame['ManufacturerID'][1]))
+        self.assertEqual(frame['DateEstablished'][2],
+                         pandas.Timestamp('2001-02-03T02:05:06.5', tz='UTC'))
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow not installed')
+    def test_to_arrow(self):
+        table = self.fetch('to_arrow')
+        self.assertEqual(table.schema.field('ManufacturerID').type, pyarrow.int64())
+        self.assertEqual(table.column('ManufacturerID').to_pylist(), [1, None, 3])
+        self.assertEqual(table.column('Name').to_pylist(), ['A', None, 'C'])
+        self.assertEqual(str(table.schema.field('DateEstablished').type), 'timestamp[us, tz=UTC]')
+        self.assertEqual(table.column('DateEstablished').null_count, 1)
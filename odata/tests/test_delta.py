@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.cache import QueryCache
+from odata.delta import EntityChanged, EntityRemoved
+from odata.exceptions import ODataQueryError
+from odata.tests import Service, Product
+
+
+class TestTrackChanges(TestCase):
+
+    def test_track_changes(self):
+        url = Product.__odata_url__()
+        delta_link = url + '?$deltatoken=abc'
+        prefer = []
+
+        def request_callback(request):
+            prefer.append(request.headers.get('Prefer'))
+            if request.params.get('page') == '1':
+                body = {'value': [{'ProductID': 2}], '@odata.deltaLink': delta_link}
+            else:
+                body = {'value': [{'ProductID': 1}], '@odata.nextLink': url + '?page=1'}
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, url,
+                              callback=request_callback,
+                              content_type='application/json')
+            rows = iter(Service.query(Product).filter(Product.id > 0).track_changes())
+            products = list(rows)
+
+        self.assertEqual([p.id for p in products], [1, 2])
+        self.assertEqual(rows.delta_link, delta_link)
+        self.assertEqual(prefer, ['odata.track-changes', 'odata.track-changes'])
+
+    def test_not_combined_with_keyset(self):
+        query = Service.query(Product).keyset().track_changes()
+        self.assertRaises(ODataQueryError, query.all)
+
+    def test_from_delta(self):
+        url = Product.__odata_url__()
+        pages = [
+            {
+                '@odata.context': '$metadata#ProductParts/$delta',
+                'value': [
+                    {'ProductID': 1, 'ProductName': 'Changed'},
+                    {'@odata.context': '$metadata#ProductParts/$deletedEntity',
+                     'id': 'ProductParts(2)', 'reason': 'deleted'},
+                    {'@odata.context': '$metadata#ProductParts/$link',
+                     'source': 'ProductParts(1)', 'relationship': 'Parts', 'target': 'ProductParts(3)'},
+                ],
+                '@odata.nextLink': url + '?$skiptoken=1',
+            },
+            {
+                'value': [
+                    {'@removed': {'reason': 'changed'}, 'ProductID': 3},
+                ],
+                '@odata.deltaLink': url + '?$deltatoken=2',
+            },
+        ]
+        cache = QueryCache()
+        context = Service.create_context(cache=cache)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, url, json=pages[0])
+            rsps.add(rsps.GET, url, json=pages[1])
+            events = context.query(Product).from_delta('ProductParts?$deltatoken=1')
+            result = list(events)
+            self.assertEqual(rsps.calls[0].request.url, url + '?$deltatoken=1')
+            self.assertEqual(rsps.calls[1].request.url, url + '?$skiptoken=1')
+
+        self.assertEqual(len(result), 3)
+        changed, deleted, removed = result
+        self.assertIsInstance(changed, EntityChanged)
+        self.assertEqual(changed.entity.name, 'Changed')
+        self.assertIsInstance(deleted, EntityRemoved)
+        self.assertEqual((deleted.id, deleted.reason), ('ProductParts(2)', 'deleted'))
+        self.assertEqual((removed.kind, removed.id, removed.reason), ('removed', 'ProductParts(3)', 'changed'))
+        self.assertEqual(events.delta_link, url + '?$deltatoken=2')
+        self.assertEqual(len(cache), 0)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+from odata.entity import declarative_base
+from odata.property import IntegerProperty, StringProperty, NavigationProperty
+
+
+class TestPropertyRegistry(TestCase):
+
+    def setUp(self):
+        Base = declarative_base()
+
+        class Author(Base):
+            __odata_collection__ = 'Authors'
+            id = IntegerProperty('AuthorID', primary_key=True)
+            name = StringProperty('Name')
+
+        class Book(Base):
+            __odata_collection__ = 'Books'
+            id = IntegerProperty('BookID', primary_key=True)
+            title = StringProperty('Title')
+
+        self.Base = Base
+        self.Author = Author
+        self.Book = Book
+
+    def test_registry_is_cached(self):
+        registry = self.Book.__odata_registry__
+        self.assertIs(registry, self.Book.__odata_registry__)
+        self.assertIs(registry, self.Book().__odata__.registry)
+
+    def test_registry_contents(self):
+        es = self.Book().__odata__
+        self.assertEqual([name for name, _ in es.properties], ['id', 'title'])
+        self.assertEqual([name for name, _ in es.primary_key_properties], ['id'])
+        self.assertEqual(es.navigation_properties, ())
+
+    def test_registry_invalidated_on_setattr(self):
+        self.Book().__odata__.properties
+        self.Book.author = NavigationProperty('Author', self.Author)
+        self.Book.isbn = StringProperty('ISBN')
+
+        book = self.Book()
+        self.assertEqual([name for name, _ in book.__odata__.navigation_properties], ['author'])
+        self.assertIn('ISBN', book.__odata__.data)
+
+        del self.Book.isbn
+        self.assertNotIn('isbn', [name for name, _ in self.Book().__odata__.properties])
+
+    def test_registry_invalidated_for_subclasses(self):
+        class Novel(self.Book):
+            pass
+
+        self.assertEqual(len(Novel().__odata__.properties), 2)
+        self.Base.created = StringProperty('Created')
+        self.assertEqual(len(Novel().__odata__.properties), 3)
@@ -41,9 +41,9 @@ class TestEnums(TestCase):
             Price=0.0,
         )
         with responses.RequestsMock() as rsps:
-            rsps.add(rsps.GET, Product.__odata_url__(),
+            rsps.add(rsps.GET, Product.__odata_url__() + '(1)',
                      content_type='application/json',
-                     json=dict(value=[test_product_values]))
+                     json=test_product_values)
 
             product = Service.query(Product).get(1)
 
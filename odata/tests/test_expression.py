@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.exceptions import ODataQueryError
+from odata.expression import bindparam, Comparison, And, Or
+from odata.query import Query
+from odata.tests import Service, Product, ProductWithNavigation
+
+
+class TestExpression(TestCase):
+
+    def test_comparison_is_string(self):
+        expression = Product.name == "O'Neil"
+        self.assertIsInstance(expression, Comparison)
+        self.assertEqual(expression, "ProductName eq 'O''Neil'")
+        self.assertEqual(' and '.join([Product.id > 1, Product.id <= 5]),
+                         'ProductID gt 1 and ProductID le 5')
+        self.assertEqual(Product.id.in_([1, 2]), 'ProductID in (1,2)')
+
+    def test_boolean_operators(self):
+        expression = (Product.id == 1) | (Product.id == 2)
+        self.assertIsInstance(expression, Or)
+        self.assertEqual(expression & Product.name.startswith('A'),
+                         "(ProductID eq 1 or ProductID eq 2) and startswith(ProductName, 'A')")
+        self.assertEqual(~Product.name.contains('x'), "not (contains(ProductName, 'x'))")
+
+    def test_compatibility_helpers(self):
+        self.assertIsInstance(Query.and_(Product.id == 1, Product.id == 2), And)
+        self.assertEqual(Query.or_('a eq 1', Product.id == 2), 'a eq 1 or ProductID eq 2')
+        self.assertEqual(Query.grouped(Product.id == 1), '(ProductID eq 1)')
+
+    def test_lambda(self):
+        expression = ProductWithNavigation.parts.any(Product.name == 'Bolt')
+        self.assertEqual(expression, "Parts/any(x: x/ProductName eq 'Bolt')")
+        self.assertEqual(ProductWithNavigation.parts.any(), 'Parts/any()')
+        expression = ProductWithNavigation.parts.all(Product.id.in_(bindparam('ids')))
+        self.assertEqual(expression.render({'ids': [1, 2]}), 'Parts/all(x: x/ProductID in (1,2))')
+
+    def test_bind_params(self):
+        expression = (Product.name == bindparam('name')) & (Product.id > 1)
+        self.assertEqual(expression, 'ProductName eq @name and ProductID gt 1')
+        self.assertEqual(expression.params, frozenset(['name']))
+        self.assertEqual(expression.render({'name': 'x'}), "ProductName eq 'x' and ProductID gt 1")
+        self.assertRaises(ODataQueryError, expression.render, {})
+
+    def test_multiple_filters_keep_or_grouped(self):
+        query = Service.query(Product).filter((Product.id == 1) | (Product.id == 2)).filter(Product.name == 'a')
+        self.assertEqual(query._get_options()['$filter'],
+                         "(ProductID eq 1 or ProductID eq 2) and ProductName eq 'a'")
+
+
+class TestCompiledQuery(TestCase):
+
+    def test_compile_and_execute(self):
+        filters = []
+
+        def request_callback(request):
+            filters.append((request.params['$filter'], request.params.get('$top')))
+            body = {'value': [{'ProductID': 1, 'ProductName': 'a'}]}
+            return requests.codes.ok, {}, json.dumps(body)
+
+        query = Service.query(Product).filter(Product.name == bindparam('name')) \
+            .filter(Product.id.in_(bindparam('ids'))).order_by(Product.id.asc())
+        prepared = query.compile()
+        self.assertEqual(prepared.params, frozenset(['name', 'ids']))
+        self.assertEqual(prepared.options['$orderby'], 'ProductID asc')
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            rows = prepared.all(name="it's", ids=[1, 2])
+            first = prepared.first(name='b', ids=[3])
+
+        self.assertEqual(rows[0].id, 1)
+        self.assertEqual(first.name, 'a')
+        self.assertEqual(filters, [
+            ("ProductName eq 'it''s' and ProductID in (1,2)", None),
+            ("ProductName eq 'b' and ProductID in (3)", '1'),
+        ])
+        self.assertRaises(ODataQueryError, prepared.all, name='c')
+
+    def test_params(self):
+        query = Service.query(Product).filter(Product.id == bindparam('id'))
+        self.assertEqual(query.params(id=5)._get_options()['$filter'], 'ProductID eq 5')
+        self.assertIn('ProductID eq @id', query.as_string())
+        self.assertRaises(ODataQueryError, query._get_options)
+        prepared = query.params(id=1).compile()
+        self.assertEqual(prepared._get_options({})['$filter'], 'ProductID eq 1')
+        self.assertEqual(prepared._get_options({'id': 2})['$filter'], 'ProductID eq 2')
+
+    def test_compile_keyset(self):
+        self.assertRaises(ODataQueryError, Service.query(Product).keyset().compile)
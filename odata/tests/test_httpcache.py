@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.httpcache import HTTPCache, MemoryStore, SQLiteStore, parse_cache_control
+from odata.tests import Service, Product
+
+
+class TestHTTPCache(TestCase):
+
+    def setUp(self):
+        self.cache = HTTPCache()
+        self.context = Service.create_context(http_cache=self.cache)
+        self.conditions = []
+
+    def fetch(self, response_headers, times=2, contexts=None):
+        body = json.dumps({'value': [{'ProductID': 1, 'ProductName': 'Product 1'}]})
+
+        def request_callback(request):
+            etag = request.headers.get('If-None-Match')
+            self.conditions.append(etag)
+            if etag and etag == response_headers.get('ETag'):
+                return 304, response_headers, ''
+            return requests.codes.ok, response_headers, body
+
+        results = []
+        with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            for context in contexts or [self.context] * times:
+                results.append(context.query(Product).all())
+        return results
+
+    def test_revalidate_with_etag(self):
+        first, second = self.fetch({'ETag': 'W/"1"'})
+        self.assertEqual(self.conditions, [None, 'W/"1"'])
+        self.assertEqual(second[0].name, 'Product 1')
+        self.assertIsNot(first[0], second[0])
+        self.assertEqual(self.cache.stats, dict(hits=0, revalidations=1, misses=1, hit_ratio=0.5))
+
+    def test_fresh_response_is_not_requested(self):
+        self.fetch({'ETag': '"1"', 'Cache-Control': 'max-age=60'}, times=3)
+        self.assertEqual(self.conditions, [None])
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_no_store(self):
+        self.fetch({'ETag': '"1"', 'Cache-Control': 'no-store'})
+        self.assertEqual(self.conditions, [None, None])
+        self.assertEqual(len(self.cache.store), 0)
+
+    def test_credentials_are_not_shared(self):
+        alice = Service.create_context(auth=('alice', 'a'), http_cache=self.cache)
+        bob = Service.create_context(auth=('bob', 'b'), http_cache=self.cache)
+        alice_again = Service.create_context(auth=('alice', 'a'), http_cache=self.cache)
+        own_session = Service.create_context(session=requests.Session(), http_cache=self.cache)
+        self.fetch({'ETag': '"1"', 'Cache-Control': 'max-age=60'},
+                   contexts=[alice, bob, alice_again, own_session, self.context])
+        self.assertEqual(self.conditions, [None] * 4)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(len(self.cache.store), 4)
+
+    def test_private_response_in_shared_store(self):
+        self.fetch({'ETag': '"1"', 'Cache-Control': 'private, max-age=60'})
+        self.assertEqual(len(self.cache.store), 1)
+
+        tmpdir = tempfile.mkdtemp()
+        store = SQLiteStore(os.path.join(tmpdir, 'cache.sqlite'))
+        try:
+            self.cache = HTTPCache(store)
+            self.context = Service.create_context(http_cache=self.cache)
+            self.fetch({'ETag': '"1"', 'Cache-Control': 'private, max-age=60'})
+            self.assertEqual(len(store), 0)
+        finally:
+            store.close()
+            shutil.rmtree(tmpdir)
+
+    def test_parse_cache_control(self):
+        self.assertEqual(parse_cache_control('private, max-age="30", no-cache'),
+                         {'private': True, 'max-age': '30', 'no-cache': True})
+
+
+class TestStores(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_memory_store_lru(self):
+        store = MemoryStore(max_entries=2)
+        store.set('a', {'body': b'1'})
+        store.set('b', {'body': b'2'})
+        store.get('a')
+        store.set('c', {'body': b'3'})
+        self.assertIsNone(store.get('b'))
+        self.assertEqual(len(store), 2)
+
+    def test_sqlite_store_is_shared(self):
+        path = os.path.join(self.tmpdir, 'cache.sqlite')
+        entry = dict(body=b'{"value": []}', etag='"1"', last_modified=None, expires=None,
+                     content_type='application/json')
+        writer = SQLiteStore(path)
+        writer.set('a', entry)
+        reader = SQLiteStore(path)
+        self.assertEqual(reader.get('a'), entry)
+        reader.delete('a')
+        self.assertIsNone(writer.get('a'))
+        writer.close()
+        reader.close()
+
+    def test_sqlite_store_prunes(self):
+        store = SQLiteStore(os.path.join(self.tmpdir, 'cache.sqlite'), max_entries=2)
+        for key in 'abc':
+            store.set(key, {'body': b'x'})
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(store.get('a'))
+        store.close()
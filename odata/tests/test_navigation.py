@@ -2,6 +2,7 @@
 
 import unittest
 import json
+from urllib.parse import unquote
 
 import responses
 import requests
@@ -211,3 +212,82 @@ class TestNavigationObjects(unittest.TestCase):
             )
 
             Service.save(product)
+
+    def test_nested_expand_options(self):
+        expand = ProductWithNavigation.parts.filter(ProductPart.size > 1).order_by(ProductPart.size.desc()) \
+            .limit(5).select(ProductPart.id, ProductPart.name) \
+            .expand(ProductPart.product.select(ProductWithNavigation.name))
+        self.assertEqual(str(expand),
+                         'Parts($select=PartID,PartName;$filter=Size gt 1;$orderby=Size desc;$top=5;'
+                         '$expand=Product($select=ProductName))')
+
+        query = Service.query(ProductWithNavigation).expand(
+            ProductWithNavigation.manufacturer.select(Manufacturer.name), expand)
+        self.assertEqual(query._get_options()['$expand'],
+                         'Manufacturer($select=Name),' + str(expand))
+
+    def test_nested_expand_of_navigation_property(self):
+        expand = ProductWithNavigation.parts.expand(ProductPart.product)
+        self.assertEqual(str(expand), 'Parts($expand=Product)')
+
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, ProductWithNavigation.__odata_url__(),
+                     json={'value': []})
+            Service.query(ProductWithNavigation).expand(expand).all()
+            self.assertIn('$expand=Parts($expand=Product)',
+                          unquote(rsps.calls[0].request.url))
+
+    def test_read_plain_expanded_entities(self):
+        def request_callback(request):
+            payload = {
+                'ProductID': 51,
+                'ProductName': 'Foo',
+                'Manufacturer': {'Name': 'Acme'},
+                'Parts': [{'PartID': 512, 'PartName': 'Bits', 'Product': {'ProductName': 'Foo'}}],
+            }
+            return requests.codes.ok, {}, json.dumps({'value': [payload]})
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, ProductWithNavigation.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            query = Service.query(ProductWithNavigation).expand(
+                ProductWithNavigation.manufacturer,
+                ProductWithNavigation.parts.expand(ProductPart.product))
+            product = query.first()
+
+        self.assertEqual(product.manufacturer.name, 'Acme')
+        self.assertIsNone(product.manufacturer.established_date)
+        part = product.parts[0]
+        self.assertIsNone(part.size)
+        self.assertIsNone(part.product.category)
+
+    def test_read_partial_expanded_entities(self):
+        def request_callback(request):
+            payload = {
+                'ProductID': 51,
+                'ProductName': 'Foo',
+                'Manufacturer': {'Name': 'Acme'},
+                'Parts': [{'PartID': 512, 'PartName': 'Bits', 'Product': {'ProductName': 'Foo'}}],
+            }
+            return requests.codes.ok, {}, json.dumps({'value': [payload]})
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, ProductWithNavigation.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            query = Service.query(ProductWithNavigation).expand(
+                ProductWithNavigation.manufacturer.select(Manufacturer.name),
+                ProductWithNavigation.parts.select(ProductPart.id, ProductPart.name)
+                .expand(ProductPart.product.select(ProductWithNavigation.name)))
+            product = query.first()
+
+        self.assertEqual(product.manufacturer.name, 'Acme')
+        self.assertRaises(AttributeError, getattr, product.manufacturer, 'established_date')
+        part = product.parts[0]
+        self.assertEqual(part.name, 'Bits')
+        self.assertIs(part.__odata__.connection, product.__odata__.connection)
+        self.assertEqual(part.product.name, 'Foo')
+
+        part.size = 2
+        self.assertEqual(part.__odata__.data_for_update()['Size'], 2.0)
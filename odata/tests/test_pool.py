@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from unittest import TestCase
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from odata import ODataService
+from odata.entity import declarative_base
+from odata.pool import ConnectionPool
+
+
+class KeepAliveServer(object):
+    """
+    HTTP/1.1 endpoint on a local port that answers every GET with an empty
+    collection after ``delay`` seconds and counts the connections made to it
+    """
+
+    def __init__(self, delay=0):
+        self.connections = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                server.connections += 1
+                BaseHTTPRequestHandler.setup(self)
+
+            def do_GET(self):
+                time.sleep(delay)
+                payload = b'{"value": []}'
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self.httpd = Server(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{0}/odata/'.format(self.httpd.server_address[1])
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       kwargs=dict(poll_interval=0.05))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TestConnectionPool(TestCase):
+
+    def setUp(self):
+        self.server = KeepAliveServer()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def create_service(self, pool):
+        return ODataService(self.server.url, declarative_base(), reflect_entities=False, pool=pool)
+
+    def test_settings(self):
+        pool = ConnectionPool(size=32, block=True, tcp_keepalive=True)
+        self.assertEqual(pool.socket_options(), [
+            (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ])
+        self.assertEqual(ConnectionPool(tcp_nodelay=False).socket_options(), [])
+
+        service = self.create_service(pool)
+        context = service.create_context()
+        adapter = context.connection.session.get_adapter(self.server.url)
+        self.assertIs(adapter, pool.adapter())
+        self.assertIs(service.default_context.connection.session.get_adapter(self.server.url), adapter)
+        host_pool = adapter.host_pool(self.server.url)
+        self.assertEqual(host_pool.pool.maxsize, 32)
+        self.assertTrue(host_pool.block)
+
+    def test_custom_session_is_not_changed(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(max_retries=3)
+        session.mount('http://', adapter)
+        pool = ConnectionPool(prewarm=2)
+
+        with self.assertLogs('odata.connection', 'WARNING'):
+            service = ODataService(self.server.url, declarative_base(), reflect_entities=False,
+                                   session=session, pool=pool)
+        self.assertIs(session.get_adapter(self.server.url), adapter)
+        self.assertIs(service.default_context.connection.session, session)
+        self.assertEqual(pool.stats['opened'], 0)
+
+        context = service.create_context()
+        self.assertIs(context.connection.session.get_adapter(self.server.url), pool.adapter())
+
+    def test_connections_are_reused(self):
+        pool = ConnectionPool()
+        context = self.create_service(pool).create_context()
+        for _ in range(5):
+            context.connection.execute_get(self.server.url + 'Products')
+
+        stats = pool.stats
+        self.assertEqual(stats['checkouts'], 5)
+        self.assertEqual(stats['opened'], 1)
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['utilization'], 0.0)
+        self.assertEqual(stats['waited'], 0)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_keep_alive_off(self):
+        pool = ConnectionPool(keep_alive=False)
+        context = self.create_service(pool).create_context()
+        for _ in range(3):
+            context.connection.execute_get(self.server.url + 'Products')
+
+        self.assertEqual(pool.stats['opened'], 3)
+
+    def test_prewarm(self):
+        pool = ConnectionPool(size=4, prewarm=3)
+        service = self.create_service(pool)
+        self.assertEqual(pool.stats['opened'], 3)
+
+        context = service.create_context()
+        context.connection.execute_get(self.server.url + 'Products')
+        self.assertEqual(pool.stats['opened'], 3)
+        self.assertEqual(pool.warm(self.server.url, connections=10), 4)
+        self.assertEqual(pool.stats['opened'], 4)
+
+    def test_prewarm_failure_is_logged(self):
+        url = self.server.url
+        self.server.stop()
+        with self.assertLogs('odata.service', 'WARNING'):
+            ODataService(url, declarative_base(), reflect_entities=False,
+                         pool=ConnectionPool(prewarm=1))
+
+
+class TestBlockingPool(TestCase):
+
+    def setUp(self):
+        self.server = KeepAliveServer(delay=0.05)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_wait_for_free_connection(self):
+        pool = ConnectionPool(size=1, block=True)
+        service = ODataService(self.server.url, declarative_base(), reflect_entities=False, pool=pool)
+
+        def worker():
+            context = service.create_context()
+            context.connection.execute_get(self.server.url + 'Products')
+
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = pool.stats
+        self.assertEqual(stats['opened'], 1)
+        self.assertEqual(stats['checkouts'], 3)
+        self.assertGreaterEqual(stats['waited'], 1)
+        self.assertGreater(stats['max_wait'], 0.02)
+        self.assertGreater(stats['avg_wait'], 0)
+        self.assertEqual(self.server.connections, 1)
@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+from decimal import Decimal
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.exceptions import ODataError, ODataQueryError, NoResultsFound
+from odata.tests import Service, Product, ProductWithNavigation
+
+
+def paged_callback(pages):
+    """
+    Serve ``pages`` lists of rows, linking them together with nextLinks
+    """
+    def request_callback(request):
+        page = int(request.params.get('page', 0))
+        body = {'value': pages[page]}
+        if page + 1 < len(pages):
+            body['@odata.nextLink'] = Product.__odata_url__() + '?page={0}'.format(page + 1)
+        return requests.codes.ok, {}, json.dumps(body)
+    return request_callback
+
+
+def product_rows(start, count):
+    return [{'ProductID': i, 'ProductName': 'Product {0}'.format(i)}
+            for i in range(start, start + count)]
+
+
+class TestPrefetch(TestCase):
+
+    def test_prefetch_yields_all_pages_in_order(self):
+        pages = [product_rows(0, 3), product_rows(3, 3), product_rows(6, 2)]
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=paged_callback(pages),
+                              content_type='application/json')
+            query = Service.query(Product).prefetch(2)
+            result = [p.id for p in query]
+
+        self.assertEqual(result, list(range(8)))
+
+    def test_prefetch_stops_when_consumer_stops(self):
+        pages = [product_rows(i * 2, 2) for i in range(10)]
+
+        with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=paged_callback(pages),
+                              content_type='application/json')
+            iterator = iter(Service.query(Product).prefetch(1))
+            next(iterator)
+            iterator.close()
+            time.sleep(0.1)
+            self.assertLessEqual(len(rsps.calls), 3)
+
+    def test_prefetch_raises_errors(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__(), status=500)
+            query = Service.query(Product).prefetch(1)
+            self.assertRaises(ODataError, query.all)
+
+    def test_prefetch_is_kept_by_query_builders(self):
+        query = Service.query(Product).prefetch(3).filter(Product.id == 1)
+        self.assertEqual(query.options['prefetch'], 3)
+        self.assertNotIn('prefetch', query._get_options())
+
+
+class TestParallel(TestCase):
+
+    rows = product_rows(1, 20)
+
+    def request_callback(self, request):
+        params = request.params
+        rows = list(self.rows)
+        flt = params.get('$filter', '')
+        for clause in flt.split(' and ') if flt else []:
+            _, op, value = clause.split(' ')
+            value = int(value)
+            if op == 'ge':
+                rows = [r for r in rows if r['ProductID'] >= value]
+            elif op == 'lt':
+                rows = [r for r in rows if r['ProductID'] < value]
+        if params.get('$orderby') == 'ProductID desc':
+            rows.reverse()
+        body = {}
+        skip = int(params.get('$skip', 0))
+        top = int(params.get('$top', len(rows)))
+        body['value'] = rows[skip:skip + top]
+        return requests.codes.ok, {}, json.dumps(body)
+
+    def test_range_partitions(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=self.request_callback,
+                              content_type='application/json')
+            query = Service.query(Product).parallel(workers=3, partition_by=Product.id,
+                                                    preserve_order=True)
+            result = [p.id for p in query]
+
+            filters = [c.request.params.get('$filter') for c in rsps.calls[2:]]
+
+        self.assertEqual(result, list(range(1, 21)))
+        self.assertEqual(sorted(filters, key=str), sorted([
+            'ProductID lt 8',
+            'ProductID ge 8 and ProductID lt 15',
+            'ProductID ge 15',
+        ], key=str))
+
+    def test_skip_partitions(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=self.request_callback,
+                              content_type='application/json')
+            rsps.add(rsps.GET, Product.__odata_url__() + '/$count',
+                     body='20', content_type='text/plain')
+            query = Service.query(Product).parallel(workers=4, strategy='skip',
+                                                    max_pages=1)
+            result = sorted(p.id for p in query)
+
+        self.assertEqual(result, list(range(1, 21)))
+
+    def test_parallel_with_limit(self):
+        query = Service.query(Product).parallel(workers=2).limit(5)
+        self.assertRaises(ODataQueryError, query.all)
+
+    def test_range_requires_numeric_property(self):
+        query = Service.query(Product).parallel(workers=2, partition_by=Product.name)
+        self.assertRaises(ODataQueryError, query.all)
+
+
+class TestCount(TestCase):
+
+    def test_count(self):
+        def request_callback(request):
+            self.assertEqual(request.params.get('$filter'), "ProductName eq 'Foo'")
+            self.assertNotIn('$top', request.params)
+            return requests.codes.ok, {}, '\ufeff42'
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__() + '/$count',
+                              callback=request_callback,
+                              content_type='text/plain')
+            query = Service.query(Product).filter(Product.name == 'Foo').limit(5)
+            self.assertEqual(query.count(), 42)
+
+    def test_inline_count(self):
+        def request_callback(request):
+            self.assertEqual(request.params.get('$count'), 'true')
+            body = {'@odata.count': 12, 'value': product_rows(0, 2)}
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            rows = iter(Service.query(Product).with_count())
+            self.assertIsNone(rows.count)
+            next(rows)
+            self.assertEqual(rows.count, 12)
+
+    def test_navigation_count(self):
+        product = ProductWithNavigation.__new__(ProductWithNavigation,
+                                                from_data={'ProductID': 3})
+        product.__odata__.connection = Service.default_context.connection
+
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, product.__odata__.instance_url + '/Parts/$count',
+                     body='7', content_type='text/plain')
+            self.assertEqual(ProductWithNavigation.parts.count(product), 7)
+
+        product.__odata__.nav_cache['Parts'] = {'collection': [object(), object()]}
+        self.assertEqual(ProductWithNavigation.parts.count(product), 2)
+        self.assertRaises(ODataError, ProductWithNavigation.manufacturer.count, product)
+
+
+class TestAggregation(TestCase):
+
+    def test_group_by_aggregate(self):
+        def request_callback(request):
+            self.assertEqual(
+                request.params.get('$apply'),
+                "filter(Category ne 'Misc')/groupby((Category),"
+                "aggregate(Price with sum as total,ProductID with countdistinct as ProductID_countdistinct))")
+            self.assertNotIn('$filter', request.params)
+            body = {'value': [
+                {'Category': 'Tools', 'total': 12.5, 'ProductID_countdistinct': 3},
+                {'Category': 'Toys', 'total': 3, 'ProductID_countdistinct': 1},
+            ]}
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            query = Service.query(Product).filter(Product.category != 'Misc')
+            query = query.group_by(Product.category)
+            query = query.aggregate(Product.price.sum().label('total'),
+                                    Product.id.count_distinct())
+            rows = query.all()
+
+        self.assertEqual(rows[0].Category, 'Tools')
+        self.assertEqual(rows[0].total, Decimal('12.5'))
+        self.assertEqual(rows[0]['ProductID_countdistinct'], 3)
+        self.assertEqual(tuple(rows[1]), ('Toys', Decimal('3'), 1))
+        self.assertEqual(rows[1].as_dict(), {'Category': 'Toys', 'total': Decimal('3'),
+                                             'ProductID_countdistinct': 1})
+
+    def test_aggregate_without_grouping(self):
+        query = Service.query(Product).aggregate(Product.price.max().label('highest'))
+        self.assertEqual(query._get_options()['$apply'], 'aggregate(Price with max as highest)')
+
+    def test_raw_apply(self):
+        query = Service.query(Product).apply('topcount(5,Price)')
+        self.assertEqual(query._get_options()['$apply'], 'topcount(5,Price)')
+        self.assertEqual(query._create_model({'Price': 1}), {'Price': 1})
+
+
+class TestKeyset(TestCase):
+
+    def test_keyset_pages(self):
+        rows = product_rows(1, 7)
+        seen = []
+
+        def request_callback(request):
+            params = request.params
+            seen.append(params)
+            self.assertEqual(params['$orderby'], 'ProductID asc')
+            self.assertNotIn('$skip', params)
+            result = rows
+            flt = params.get('$filter')
+            if flt:
+                after = int(flt.split(' gt ')[1])
+                result = [r for r in rows if r['ProductID'] > after]
+            body = {'value': result[:int(params['$top'])]}
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            result = [p.id for p in Service.query(Product).keyset(page_size=3)]
+
+        self.assertEqual(result, list(range(1, 8)))
+        self.assertEqual([p.get('$filter') for p in seen],
+                         [None, 'ProductID gt 3', 'ProductID gt 6'])
+
+    def test_keyset_with_limit_and_filter(self):
+        def request_callback(request):
+            params = request.params
+            self.assertEqual(params['$top'], '2')
+            self.assertEqual(params['$filter'], "(ProductName ne 'x') and (ProductID gt 2)")
+            return requests.codes.ok, {}, json.dumps({'value': product_rows(3, 2)})
+
+        query = Service.query(Product).filter(Product.name != 'x').limit(4).keyset(page_size=2)
+        first_request = query._first_page_request()
+        self.assertEqual(first_request[1]['$top'], 2)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            request = query._keyset_request(None, {'ProductID': 2}, 2)
+            data = query.connection.execute_get(request[0], request[1])
+            self.assertIsNone(query._next_page_request(request, data))
+
+    def test_composite_keyset_filter(self):
+        from odata.tests import ProductManufacturerSales as Sales
+        query = Service.query(Sales).keyset()
+        request = query._keyset_request(None, {'ProductID': 1, 'ManufacturerID': 5}, 1)
+        self.assertEqual(request[1]['$orderby'], 'ManufacturerID asc,ProductID asc')
+        self.assertEqual(request[1]['$filter'],
+                         'ManufacturerID gt 5 or (ManufacturerID eq 5 and ProductID gt 1)')
+
+    def test_keyset_with_offset(self):
+        query = Service.query(Product).offset(10).keyset()
+        self.assertRaises(ODataQueryError, query.all)
+
+
+class TestGet(TestCase):
+
+    def test_get_uses_key_url(self):
+        def request_callback(request):
+            self.assertNotIn('$filter', request.params)
+            self.assertEqual(request.params['$select'], 'ProductID,ProductName')
+            return requests.codes.ok, {}, json.dumps(product_rows(3, 1)[0])
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__() + '(3)',
+                              callback=request_callback,
+                              content_type='application/json')
+            query = Service.query(Product).select(Product.id, Product.name).limit(5)
+            row = query.get(3)
+        self.assertEqual(row['ProductName'], 'Product 3')
+
+    def test_get_composite_key(self):
+        from odata.tests import ProductManufacturerSales as Sales
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Sales.__odata_url__() + '(ManufacturerID=2,ProductID=1)',
+                     content_type='application/json',
+                     json={'ProductID': 1, 'ManufacturerID': 2, 'SalesAmount': 5})
+            sales = Service.query(Sales).get(ProductID=1, ManufacturerID=2)
+        self.assertEqual(sales.sales_amount, Decimal('5'))
+        self.assertEqual(sales.__odata__.instance_url,
+                         Sales.__odata_url__() + '(ManufacturerID=2,ProductID=1)')
+
+    def test_get_not_found(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__() + '(4)', status=404,
+                     json={'error': {'code': 'NotFound', 'message': 'Gone'}})
+            rsps.add(rsps.GET, Product.__odata_url__() + '(5)', status=500)
+            self.assertRaises(NoResultsFound, Service.query(Product).get, 4)
+            self.assertRaises(ODataError, Service.query(Product).get, 5)
+
+    def test_get_many_in_input_order(self):
+        filters = []
+
+        def request_callback(request):
+            params = request.params
+            filters.append(params['$filter'])
+            self.assertNotIn('$top', params)
+            keys = [int(i) for i in params['$filter'][len('ProductID in ('):-1].split(',')]
+            rows = [row for row in product_rows(0, 100) if row['ProductID'] in keys and row['ProductID'] != 7]
+            rows.reverse()
+            return requests.codes.ok, {}, json.dumps({'value': rows})
+
+        keys = [12, 7, 3, 12] + list(range(20, 60))
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            query = Service.query(Product).limit(1)
+            result = query.get_many(keys, max_url_length=200)
+
+        self.assertGreater(len(filters), 1)
+        self.assertEqual(sum(len(f.split(',')) for f in filters), len(set(keys)))
+        self.assertEqual([p.id if p else None for p in result],
+                         [12, None, 3, 12] + list(range(20, 60)))
+
+    def test_get_many_url_length(self):
+        query = Service.query(Product)
+        _, queries = query._get_many_queries(range(1000), 500)
+        for q in queries:
+            prepared = requests.Request('GET', q._get_url(), params=q._get_options()).prepare()
+            self.assertLessEqual(len(prepared.url), 500)
+        self.assertEqual(queries[0]._get_options()['$filter'][:16], 'ProductID in (0,')
+
+    def test_get_many_composite_keys(self):
+        from odata.tests import ProductManufacturerSales as Sales
+        query = Service.query(Sales)
+        key_ids, queries = query._get_many_queries([dict(ProductID=1, ManufacturerID=2), (3, 4)], None)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(queries[0]._get_options()['$filter'],
+                         '(ManufacturerID eq 2 and ProductID eq 1) or (ManufacturerID eq 3 and ProductID eq 4)')
+        self.assertEqual(key_ids, [('2', '1'), ('3', '4')])
+
+
+class TestRows(TestCase):
+
+    def test_rows(self):
+        def request_callback(request):
+            self.assertEqual(request.params['$select'], 'ProductID,Price')
+            body = {'value': [{'ProductID': 1, 'Price': 1.5}, {'ProductID': 2, 'Price': None}]}
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            query = Service.query(Product).rows(Product.id, Product.price)
+            rows = query.all()
+            tuples = query.rows(Product.id, Product.price, tuples=True).all()
+
+        self.assertEqual(rows[0].ProductID, 1)
+        self.assertEqual(rows[0]['Price'], Decimal('1.5'))
+        self.assertEqual(rows[1], (2, None))
+        self.assertEqual(rows[0].as_dict(), {'ProductID': 1, 'Price': Decimal('1.5')})
+        self.assertFalse(hasattr(rows[0], '__dict__'))
+        self.assertIs(type(tuples[0]), tuple)
+        self.assertEqual(tuples, [(1, Decimal('1.5')), (2, None)])
+
+
+class TestIterPages(TestCase):
+
+    def test_iter_pages(self):
+        pages = [[{'ProductID': 1}, {'ProductID': 2}], [{'ProductID': 3}]]
+        callback = paged_callback(pages)
+        prefer = []
+
+        def request_callback(request):
+            prefer.append(request.headers.get('Prefer'))
+            return callback(request)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            result = list(Service.query(Product).max_page_size(2).iter_pages())
+
+        self.assertEqual([len(page) for page in result], [2, 1])
+        self.assertEqual([p.id for p in result[0]], [1, 2])
+        self.assertEqual(result[0].next_link, Product.__odata_url__() + '?page=1')
+        self.assertIsNone(result[1].next_link)
+        self.assertEqual(result[0].size, len(json.dumps({
+            'value': pages[0], '@odata.nextLink': result[0].next_link})))
+        self.assertGreaterEqual(result[0].elapsed, 0)
+        self.assertEqual(prefer, ['odata.maxpagesize=2', 'odata.maxpagesize=2'])
+
+    def test_raw_pages_with_count(self):
+        def request_callback(request):
+            body = {'value': [{'ProductID': 1}], '@odata.count': 1}
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            result = list(Service.query(Product).with_count().prefetch(1).iter_pages(raw=True))
+
+        self.assertEqual(result[0].rows, [{'ProductID': 1}])
+        self.assertEqual(result[0].count, 1)
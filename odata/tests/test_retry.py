@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import email.utils
+import json
+import time
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.exceptions import ODataError, ODataConnectionError
+from odata.retry import RetryPolicy, parse_retry_after
+from odata.tests import Service, Product, NoSleepPolicy
+
+
+class TestRetryPolicy(TestCase):
+
+    def test_exponential_backoff(self):
+        policy = RetryPolicy(max_attempts=4, backoff=1, max_backoff=3, jitter=False)
+        delays = [policy.get_delay('GET', attempt, 0, 503) for attempt in range(1, 5)]
+        self.assertEqual(delays, [1, 2, 3, None])
+
+    def test_jitter(self):
+        policy = RetryPolicy(backoff=1)
+        for _ in range(20):
+            self.assertTrue(0 <= policy.get_delay('GET', 3, 0, 503) <= 4)
+
+    def test_retry_after(self):
+        policy = RetryPolicy(max_elapsed=60)
+        self.assertEqual(policy.get_delay('GET', 1, 0, 429, '7'), 7)
+        self.assertIsNone(policy.get_delay('GET', 1, 55, 429, '7'))
+        http_date = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertTrue(25 < parse_retry_after(http_date) <= 30)
+        self.assertIsNone(parse_retry_after('soon'))
+
+    def test_methods_and_statuses(self):
+        policy = RetryPolicy()
+        self.assertIsNone(policy.get_delay('GET', 1, 0, 500))
+        self.assertIsNone(policy.get_delay('POST', 1, 0, 503))
+        self.assertIsNone(policy.get_delay('PATCH', 1, 0))
+        self.assertIsNotNone(policy.get_delay('POST', 1, 0, 429))
+        self.assertIsNotNone(policy.get_delay('DELETE', 1, 0))
+
+
+class TestRetries(TestCase):
+
+    def setUp(self):
+        self.policy = NoSleepPolicy()
+        self.context = Service.create_context(retry=self.policy)
+
+    def test_query_retries_current_page(self):
+        url = Product.__odata_url__()
+        calls = []
+
+        def request_callback(request):
+            page = request.params.get('page', '0')
+            calls.append(page)
+            if page == '1' and calls.count('1') == 1:
+                return 503, {'Retry-After': '2'}, ''
+            body = {'value': [{'ProductID': int(page)}]}
+            if page == '0':
+                body['@odata.nextLink'] = url + '?page=1'
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, url,
+                              callback=request_callback,
+                              content_type='application/json')
+            products = self.context.query(Product).all()
+
+        self.assertEqual([p.id for p in products], [0, 1])
+        self.assertEqual(calls, ['0', '1', '1'])
+        self.assertEqual(self.policy.delays, [2])
+
+    def test_connection_error(self):
+        url = Product.__odata_url__()
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, url, body=requests.exceptions.ConnectionError('refused'))
+            rsps.add(rsps.GET, url, json={'value': [{'ProductID': 1}]})
+            products = self.context.query(Product).all()
+        self.assertEqual(len(products), 1)
+        self.assertEqual(len(self.policy.delays), 1)
+
+    def test_gives_up(self):
+        self.policy.max_attempts = 2
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__(),
+                     body=requests.exceptions.ConnectionError('refused'))
+            self.assertRaises(ODataConnectionError, self.context.query(Product).all)
+        self.assertEqual(len(self.policy.delays), 1)
+
+    def test_post_not_retried_on_503(self):
+        product = Product()
+        product.name = 'Test'
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.POST, Product.__odata_url__(), status=503)
+            self.assertRaises(ODataError, self.context.save, product)
+        self.assertEqual(self.policy.delays, [])
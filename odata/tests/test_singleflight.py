@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import threading
+import time
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.exceptions import DeadlineExceeded
+from odata.singleflight import SingleFlight
+from odata.tests import Service, Product
+from odata.timeout import deadline
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('Timed out')
+        time.sleep(0.005)
+
+
+class TestSingleFlight(TestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight()
+
+    def run_threads(self, fn, count=4):
+        results = [None] * count
+        errors = []
+
+        def worker(i):
+            try:
+                results[i] = self.flight.call('key', fn)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_calls_are_coalesced(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            wait_for(lambda: self.flight.collapsed == 3)
+            return {'value': [1, 2]}
+
+        results, errors = self.run_threads(fn)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'value': [1, 2]}] * 4)
+        self.assertEqual(len(set(id(r) for r in results)), 4)
+        self.assertEqual(self.flight.stats, dict(requests=4, collapsed=3, in_flight=0))
+
+    def test_error_is_shared(self):
+        def fn():
+            wait_for(lambda: self.flight.collapsed == 3)
+            raise ValueError('failed')
+
+        results, errors = self.run_threads(fn)
+        self.assertEqual(len(errors), 4)
+        self.assertTrue(all(isinstance(e, ValueError) for e in errors))
+
+    def test_waiter_keeps_own_deadline(self):
+        release = threading.Event()
+
+        def fn():
+            release.wait(5)
+            return 1
+
+        leader = threading.Thread(target=self.flight.call, args=('key', fn))
+        leader.start()
+        wait_for(lambda: self.flight.in_flight == 1)
+        start = time.monotonic()
+        with deadline(0.05):
+            with self.assertRaises(DeadlineExceeded):
+                self.flight.call('key', fn)
+        self.assertLess(time.monotonic() - start, 1)
+        release.set()
+        leader.join()
+
+    def test_deadline_of_leader_is_not_shared(self):
+        def fn():
+            wait_for(lambda: self.flight.collapsed == 3)
+            raise DeadlineExceeded('Deadline exceeded')
+
+        results, errors = [None] * 4, []
+
+        def worker(i):
+            try:
+                results[i] = self.flight.call('key', fn if i == 0 else lambda: i)
+            except Exception as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=worker, args=(0,))
+        leader.start()
+        wait_for(lambda: self.flight.in_flight == 1)
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, 4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads + [leader]:
+            thread.join()
+
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], DeadlineExceeded)
+        self.assertIsNone(results[0])
+        # the waiters send the request themselves
+        self.assertTrue(set(results[1:]) <= {1, 2, 3})
+
+    def test_sequential_calls_are_not_coalesced(self):
+        self.flight.call('key', lambda: 1)
+        self.flight.call('key', lambda: 2)
+        self.assertEqual(self.flight.collapsed, 0)
+        self.assertEqual(self.flight.in_flight, 0)
+
+    def test_async_calls_are_coalesced_per_event_loop(self):
+        async def fn():
+            while self.flight.requests < 2:
+                await asyncio.sleep(0.005)
+            return 1
+
+        results, errors = [], []
+
+        def worker():
+            try:
+                results.append(asyncio.run(self.flight.call_async('key', fn)))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [1, 1])
+        self.assertEqual(self.flight.collapsed, 0)
+
+    def test_cancelled_async_leader(self):
+        async def slow():
+            await asyncio.sleep(5)
+            return 'slow'
+
+        async def fast():
+            return 'fast'
+
+        async def main():
+            leader = asyncio.ensure_future(self.flight.call_async('key', slow))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(self.flight.call_async('key', fast))
+            while self.flight.collapsed < 1:
+                await asyncio.sleep(0.005)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await waiter
+
+        self.assertEqual(asyncio.run(main()), 'fast')
+        self.assertEqual(self.flight.in_flight, 0)
+
+    def test_async_waiter_keeps_own_deadline(self):
+        async def slow():
+            await asyncio.sleep(5)
+
+        async def waiter():
+            with deadline(0.05):
+                await self.flight.call_async('key', slow)
+
+        async def main():
+            leader = asyncio.ensure_future(self.flight.call_async('key', slow))
+            await asyncio.sleep(0)
+            try:
+                with self.assertRaises(DeadlineExceeded):
+                    await asyncio.wait_for(waiter(), 1)
+            finally:
+                leader.cancel()
+
+        asyncio.run(main())
+
+
+class TestCoalescedQueries(TestCase):
+
+    def test_identical_queries_share_request(self):
+        flight = SingleFlight()
+        context = Service.create_context(single_flight=flight)
+        calls = []
+
+        def request_callback(request):
+            calls.append(request.url)
+            wait_for(lambda: flight.collapsed == 2)
+            body = {'value': [{'ProductID': 1, 'ProductName': 'Product 1'}]}
+            return requests.codes.ok, {}, json.dumps(body)
+
+        results = []
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            threads = [threading.Thread(target=lambda: results.append(context.query(Product).all()))
+                       for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([[p.name for p in r] for r in results], [['Product 1']] * 3)
+
+    def run_contexts(self, flight, contexts):
+        calls = []
+
+        def request_callback(request):
+            calls.append(request.headers.get('Authorization'))
+            wait_for(lambda: flight.requests == len(contexts))
+            return requests.codes.ok, {}, json.dumps({'value': [{'ProductID': 1}]})
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            threads = [threading.Thread(target=context.query(Product).all) for context in contexts]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return calls
+
+    def test_contexts_share_request(self):
+        flight = SingleFlight()
+        contexts = [Service.create_context(single_flight=flight) for _ in range(2)]
+        self.assertEqual(len(self.run_contexts(flight, contexts)), 1)
+
+    def test_credentials_are_not_shared(self):
+        flight = SingleFlight()
+        contexts = [Service.create_context(auth=('alice', 'a'), single_flight=flight),
+                    Service.create_context(auth=('bob', 'b'), single_flight=flight),
+                    Service.create_context(session=requests.Session(), single_flight=flight)]
+        calls = self.run_contexts(flight, contexts)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(flight.collapsed, 0)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.exceptions import ODataError, ODataQueryError
+from odata.stream import JSONStreamParser
+from odata.tests import Service, Product
+
+
+class TestJSONStreamParser(TestCase):
+
+    def parse(self, body, chunk_size, encoding='utf-8'):
+        parser = JSONStreamParser()
+        body = body.encode(encoding)
+        items = []
+        for i in range(0, len(body), chunk_size):
+            items.extend(parser.feed(body[i:i + chunk_size]))
+        items.extend(parser.close())
+        return parser, items
+
+    def test_items_and_annotations(self):
+        body = json.dumps({
+            '@odata.count': 12345,
+            'value': [{'Name': u'Äö €', 'Price': 1.5, 'Tags': [1, {'a': None}]}, {'Name': 'b'}],
+            '@odata.nextLink': 'http://example.com/next',
+        }, ensure_ascii=False)
+
+        for chunk_size in (1, 3, 7, len(body)):
+            parser, items = self.parse(body, chunk_size)
+            self.assertEqual(items, [{'Name': u'Äö €', 'Price': 1.5, 'Tags': [1, {'a': None}]},
+                                     {'Name': 'b'}])
+            self.assertEqual(parser.annotations, {'@odata.count': 12345,
+                                                  '@odata.nextLink': 'http://example.com/next'})
+            self.assertTrue(parser.has_array)
+
+    def test_items_are_returned_when_complete(self):
+        parser = JSONStreamParser()
+        self.assertEqual(parser.feed(b'{"value": [{"a": 1}, {"a"'), [{'a': 1}])
+        self.assertEqual(parser.feed(b': 2}]}'), [{'a': 2}])
+        self.assertEqual(parser.close(), [])
+
+    def test_object_without_array(self):
+        parser, items = self.parse('{"ProductID": 1, "value": 2}', 4)
+        self.assertEqual(items, [])
+        self.assertEqual(parser.annotations, {'ProductID': 1, 'value': 2})
+        self.assertFalse(parser.has_array)
+
+    def test_byte_order_mark(self):
+        for chunk_size in (1, 2, 5):
+            parser, items = self.parse(u'{"value": [{"Name": "Äö"}]}', chunk_size, encoding='utf-8-sig')
+            self.assertEqual(items, [{'Name': u'Äö'}])
+
+    def test_null_array(self):
+        parser, items = self.parse('{"@odata.count": 0, "value": null}', 4)
+        self.assertEqual(items, [])
+        self.assertEqual(parser.annotations, {'@odata.count': 0})
+        self.assertTrue(parser.has_array)
+
+    def test_invalid(self):
+        self.assertRaises(ODataError, self.parse, '{"value": [{"a": 1}', 5)
+        self.assertRaises(ODataError, self.parse, '[1, 2]', 5)
+        self.assertRaises(ODataError, self.parse, '{"value": []} x', 5)
+
+
+class TestStreamedQuery(TestCase):
+
+    def test_stream_pages(self):
+        url = Product.__odata_url__()
+
+        def request_callback(request):
+            page = int(request.params.get('page', 0))
+            body = '{"value": [{"ProductID": %d}, {"ProductID": %d}]' % (page * 2 + 1, page * 2 + 2)
+            if page == 0:
+                # nextLink after the value array
+                body += ', "@odata.nextLink": "{0}?page=1"'.format(url)
+            return requests.codes.ok, {}, body + ', "@odata.count": 4}'
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, url,
+                              callback=request_callback,
+                              content_type='application/json')
+            rows = iter(Service.query(Product).with_count().stream(chunk_size=5))
+            products = list(rows)
+
+        self.assertEqual([p.id for p in products], [1, 2, 3, 4])
+        self.assertEqual(rows.count, 4)
+
+    def test_stream_byte_order_mark(self):
+        body = u'{"value": [{"ProductID": 1, "ProductName": "Äö"}]}'.encode('utf-8-sig')
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__(), body=body,
+                     content_type='application/json')
+            products = Service.query(Product).stream(chunk_size=2).all()
+
+        self.assertEqual([(p.id, p.name) for p in products], [(1, u'Äö')])
+
+    def test_stream_error(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__(), status=500,
+                     json={'error': {'code': 'Oops', 'message': 'Failed'}})
+            query = Service.query(Product).stream()
+            self.assertRaises(ODataError, query.all)
+
+    def test_not_combined_with_prefetch(self):
+        query = Service.query(Product).stream().prefetch(2)
+        self.assertRaises(ODataQueryError, query.all)
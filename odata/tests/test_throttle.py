@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.exceptions import DeadlineExceeded
+from odata.throttle import Throttle
+from odata.timeout import Deadline
+from odata.tests import Service, Product
+
+URL = 'http://demo.local/odata/Products'
+
+
+class TestThrottle(TestCase):
+
+    def test_concurrency_limit(self):
+        throttle = Throttle(max_concurrency=2)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def worker():
+            slot = throttle.acquire(URL)
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+            slot.release(200)
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(throttle.stats, {'demo.local': dict(limit=2, in_flight=0, queued=0, rate=None)})
+
+    def test_rate_limit(self):
+        throttle = Throttle(rate=50, burst=2)
+        started = time.monotonic()
+        for _ in range(5):
+            throttle.acquire(URL).release(200)
+        # two requests from the burst, three at 50 per second
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+    def test_adaptive_limit(self):
+        throttle = Throttle(max_concurrency=8, adaptive=True, latency_threshold=1)
+        self.assertEqual(throttle.limit(URL), 4)
+        for _ in range(30):
+            throttle.acquire(URL).release(200)
+        self.assertEqual(throttle.limit(URL), 8)
+        throttle.acquire(URL).release(429)
+        self.assertEqual(throttle.limit(URL), 4)
+        slow = throttle.acquire(URL)
+        slow.started -= 2
+        slow.release(200)
+        self.assertEqual(throttle.limit('demo.local'), 2)
+        throttle.acquire(URL).release()
+        throttle.acquire(URL).release()
+        self.assertEqual(throttle.limit(URL), 1)
+
+    def test_async_waiter_is_woken_by_release(self):
+        throttle = Throttle(max_concurrency=1)
+        held = throttle.acquire(URL)
+        timer = threading.Timer(0.05, held.release, args=(200,))
+
+        async def fn():
+            timer.start()
+            slot = await throttle.acquire_async(URL, Deadline(5))
+            slot.release(200)
+
+        started = time.monotonic()
+        asyncio.run(fn())
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(throttle._hosts['demo.local'].waiters, [])
+        self.assertEqual(throttle.stats['demo.local']['queued'], 0)
+
+    def test_async_wait_stops_at_deadline(self):
+        throttle = Throttle(max_concurrency=1)
+        held = throttle.acquire(URL)
+
+        async def fn():
+            with self.assertRaises(DeadlineExceeded):
+                await throttle.acquire_async(URL, Deadline(0.05))
+
+        asyncio.run(fn())
+        self.assertEqual(throttle._hosts['demo.local'].waiters, [])
+        self.assertEqual(throttle.stats['demo.local']['queued'], 0)
+        held.release(200)
+
+    def test_slot_is_released_once(self):
+        throttle = Throttle()
+        slot = throttle.acquire(URL)
+        slot.release(200)
+        slot.release(200)
+        self.assertEqual(throttle.stats['demo.local']['in_flight'], 0)
+
+
+class TestThrottledContext(TestCase):
+
+    def test_requests_are_throttled(self):
+        throttle = Throttle(max_concurrency=1)
+        context = Service.create_context(throttle=throttle)
+        in_flight = []
+
+        def request_callback(request):
+            in_flight.append(throttle.stats[request.url.split('/')[2]]['in_flight'])
+            return requests.codes.ok, {}, '{"value": [{"ProductID": 1}]}'
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            threads = [threading.Thread(target=context.query(Product).all) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(in_flight, [1, 1, 1, 1])
+        self.assertIs(Service.create_context(throttle=throttle).connection.throttle, throttle)
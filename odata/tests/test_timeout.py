@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.exceptions import DeadlineExceeded, ODataError
+from odata.connection import ODataConnection
+from odata.timeout import Deadline, deadline, timeout, request_timeout
+from odata.tests import Service, Product, NoSleepPolicy
+
+
+class TestTimeouts(TestCase):
+
+    def test_request_timeout(self):
+        self.assertEqual(request_timeout(90), (90, 90))
+        self.assertEqual(request_timeout((3, 60)), (3, 60))
+        with timeout((1, 5)):
+            self.assertEqual(request_timeout(90), (1, 5))
+            with timeout(None):
+                self.assertEqual(request_timeout(90), (1, 5))
+
+    def test_deadline_shortens_timeouts(self):
+        with deadline(0.5) as outer:
+            connect, read = request_timeout((3, 60))
+            self.assertTrue(0 < connect <= 0.5 and 0 < read <= 0.5)
+            with deadline(10) as inner:
+                self.assertIs(inner, outer)
+
+    def test_expired_deadline(self):
+        expired = Deadline(0)
+        self.assertTrue(expired.expired)
+        with deadline(expired):
+            self.assertRaises(DeadlineExceeded, request_timeout, 90)
+
+
+class TestRequestTimeouts(TestCase):
+
+    def setUp(self):
+        self.context = Service.create_context(timeout=(2, 30))
+
+    def test_connection_timeout(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__(), json={'value': []})
+            self.context.query(Product).all()
+            self.context.query(Product).timeout(5).all()
+            with self.context.timeout((1, 10)):
+                self.context.query(Product).all()
+            timeouts = [call.request.req_kwargs['timeout'] for call in rsps.calls]
+        self.assertEqual(timeouts, [(2, 30), (5, 5), (1, 10)])
+
+    def test_query_deadline_spans_pages(self):
+        url = Product.__odata_url__()
+
+        def request_callback(request):
+            time.sleep(0.03)
+            body = {'value': [{'ProductID': 1}], '@odata.nextLink': url + '?page=next'}
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, url, callback=request_callback,
+                              content_type='application/json')
+            query = self.context.query(Product).deadline(0.1)
+            self.assertRaises(DeadlineExceeded, query.all)
+            self.assertTrue(2 <= len(rsps.calls) <= 4)
+
+            # the deadline starts again for every iteration
+            rsps.calls.reset()
+            self.assertRaises(DeadlineExceeded, query.all)
+            self.assertTrue(len(rsps.calls) >= 2)
+
+    def test_no_retry_after_deadline(self):
+        policy = NoSleepPolicy()
+        context = Service.create_context(retry=policy)
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__(), status=503, headers={'Retry-After': '5'})
+            with context.deadline(1):
+                self.assertRaises(ODataError, context.query(Product).all)
+        self.assertEqual(policy.delays, [])
+
+    def test_context_deadline(self):
+        with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__(), json={'value': []})
+            with self.context.deadline(0.01):
+                time.sleep(0.02)
+                self.assertRaises(DeadlineExceeded, self.context.query(Product).count)
+            self.assertEqual(len(rsps.calls), 0)
+
+
+class TestTricklingResponse(TestCase):
+    """
+    The server sends a 40 byte body one byte at a time, which takes two
+    seconds but never runs into the read timeout
+    """
+
+    def setUp(self):
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', '40')
+                self.end_headers()
+                try:
+                    for _ in range(40):
+                        self.wfile.write(b' ')
+                        self.wfile.flush()
+                        time.sleep(0.05)
+                except OSError:
+                    pass
+
+        self.httpd = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{0}/odata/Products'.format(self.httpd.server_address[1])
+        thread = threading.Thread(target=self.httpd.serve_forever, kwargs=dict(poll_interval=0.05))
+        thread.daemon = True
+        thread.start()
+        self.connection = ODataConnection(timeout=5)
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def test_deadline_spans_response_body(self):
+        started = time.monotonic()
+        with deadline(0.3):
+            self.assertRaises(DeadlineExceeded, self.connection.execute_get, self.url)
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_deadline_spans_stream(self):
+        started = time.monotonic()
+        with deadline(0.3):
+            with self.assertRaises(DeadlineExceeded):
+                list(self.connection.execute_get_stream(self.url))
+        self.assertLess(time.monotonic() - started, 1)
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+"""
+Throttling requests
+===================
+
+Parallel jobs against one endpoint can easily overload it. A
+:py:class:`Throttle` limits the number of requests in flight to each host
+and, optionally, the rate at which requests are sent. Requests over the
+limits wait for their turn:
+
+.. code-block:: python
+
+    >>> from odata.throttle import Throttle
+    >>> throttle = Throttle(max_concurrency=16, rate=50)
+    >>> Service = ODataService(url, throttle=throttle)
+    >>> throttle.stats
+    {'services.odata.org': {'limit': 16, 'in_flight': 16, 'queued': 48, 'rate': 50}}
+
+The rate limit is a token bucket: ``burst`` requests can be sent at once,
+after which requests are let through at ``rate`` per second.
+
+Adaptive concurrency
+--------------------
+
+With ``adaptive=True`` the concurrency limit follows the endpoint. Every
+fast successful response grows the limit a little, up to
+``max_concurrency``, and every ``429``, ``503``, connection error or
+response slower than ``latency_threshold`` halves it, down to
+``min_concurrency`` (additive increase, multiplicative decrease).
+
+A request holds its place from sending it until the response has been
+read, for streamed responses until the response headers have been
+received. Waiting for a retry does not hold a place.
+
+Blocking and asyncio connections can share one instance.
+
+----
+
+API
+---
+"""
+
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class _Host(object):
+
+    def __init__(self, limit, burst):
+        self.limit = limit
+        self.in_flight = 0
+        self.queued = 0
+        self.waiters = []
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+
+class Slot(object):
+    """
+    Place of one request in a :py:class:`Throttle`. Returned by
+    :py:func:`Throttle.acquire`
+    """
+
+    def __init__(self, throttle, host):
+        self.throttle = throttle
+        self.host = host
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self, status=None):
+        """
+        Give the place to the next request. Calling again has no effect
+
+        :param status: HTTP status code of the response, or None after a connection error
+        """
+        if not self.released:
+            self.released = True
+            self.throttle.release(self.host, status, time.monotonic() - self.started)
+
+
+class Throttle(object):
+    """
+    Limits requests per host. Used by the connection of a Service or a
+    Context, see the module documentation
+
+    :param max_concurrency: Maximum number of requests in flight per host
+    :param rate: Maximum number of requests per second per host. None for no rate limit
+    :param burst: Number of requests that can be sent at once within the rate limit. Defaults to ``rate``
+    :param adaptive: Adjust the concurrency limit to the responses of the endpoint
+    :param min_concurrency: Lowest concurrency limit in adaptive mode
+    :param latency_threshold: Seconds after which a response counts as a sign of overload in adaptive mode. None to ignore response times
+    :param statuses: HTTP status codes that lower the concurrency limit in adaptive mode
+    """
+
+    def __init__(self, max_concurrency=10, rate=None, burst=None, adaptive=False, min_concurrency=1,
+                 latency_threshold=None, statuses=(429, 503)):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst or max(1, rate or 1)
+        self.adaptive = adaptive
+        self.min_concurrency = min_concurrency
+        self.latency_threshold = latency_threshold
+        self.statuses = frozenset(statuses)
+        self._cond = threading.Condition()
+        self._hosts = {}
+
+    def __repr__(self):
+        return '<Throttle(max_concurrency={0}, rate={1})>'.format(self.max_concurrency, self.rate)
+
+    def _host(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            if self.adaptive:
+                limit = max(self.min_concurrency, self.max_concurrency // 2)
+            else:
+                limit = self.max_concurrency
+            state = self._hosts[host] = _Host(limit, self.burst)
+        return state
+
+    def _admit(self, state):
+        """
+        :return: 0 if the request was admitted, otherwise seconds to wait or None to wait for a release
+        """
+        if state.in_flight >= int(state.limit):
+            return
+        if self.rate is not None:
+            now = time.monotonic()
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * self.rate)
+            state.updated = now
+            if state.tokens < 1:
+                return (1 - state.tokens) / self.rate
+            state.tokens -= 1
+        state.in_flight += 1
+        return 0
+
+    def acquire(self, url, deadline=None):
+        """
+        Wait for a place for a request
+
+        :param url: Request url
+        :param deadline: :py:class:`~odata.timeout.Deadline` after which to stop waiting
+        :return: :py:class:`Slot` to release when the response has been read
+        :raises DeadlineExceeded: The deadline passed while waiting
+        """
+        host = urlsplit(url).netloc
+        with self._cond:
+            state = self._host(host)
+            state.queued += 1
+            try:
+                wait = self._admit(state)
+                while wait != 0:
+                    self._cond.wait(_wait_until(wait, deadline))
+                    wait = self._admit(state)
+            finally:
+                state.queued -= 1
+        return Slot(self, host)
+
+    async def acquire_async(self, url, deadline=None):
+        """
+        Asynchronous version of :py:func:`acquire`
+        """
+        host = urlsplit(url).netloc
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            state = self._host(host)
+            state.queued += 1
+        try:
+            while True:
+                waiter = None
+                with self._cond:
+                    wait = self._admit(state)
+                    if wait is None:
+                        waiter = loop.create_future()
+                        state.waiters.append((loop, waiter))
+                if wait == 0:
+                    return Slot(self, host)
+                try:
+                    if waiter is None:
+                        await asyncio.sleep(_wait_until(wait, deadline))
+                    else:
+                        await asyncio.wait([waiter], timeout=_wait_until(None, deadline))
+                finally:
+                    if waiter is not None:
+                        with self._cond:
+                            if (loop, waiter) in state.waiters:
+                                state.waiters.remove((loop, waiter))
+        finally:
+            with self._cond:
+                state.queued -= 1
+
+    def release(self, host, status=None, elapsed=None):
+        """
+        Release the place of a finished request. Usually called through
+        :py:func:`Slot.release`
+
+        :param host: Host name and port
+        :param status: HTTP status code, or None after a connection error
+        :param elapsed: Seconds the request took
+        """
+        with self._cond:
+            state = self._host(host)
+            state.in_flight -= 1
+            if self.adaptive:
+                self._adapt(state, status, elapsed)
+            self._cond.notify_all()
+            waiters, state.waiters = state.waiters, []
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # the event loop of the waiter has been closed
+                pass
+
+    def _adapt(self, state, status, elapsed):
+        slow = (self.latency_threshold is not None and elapsed is not None
+                and elapsed > self.latency_threshold)
+        if status is None or status in self.statuses or slow:
+            state.limit = max(self.min_concurrency, state.limit / 2.0)
+        elif status < 500:
+            state.limit = min(self.max_concurrency, state.limit + 1.0 / state.limit)
+
+    def limit(self, url):
+        """
+        :param url: Url or host name and port
+        :return: Current concurrency limit of the host
+        """
+        host = urlsplit(url).netloc or url
+        with self._cond:
+            return int(self._host(host).limit)
+
+    @property
+    def stats(self):
+        """
+        Dictionary of hosts, each with the concurrency limit, requests in
+        flight, requests waiting and the rate limit
+        """
+        with self._cond:
+            return dict((host, dict(limit=int(state.limit), in_flight=state.in_flight,
+                                    queued=state.queued, rate=self.rate))
+                        for host, state in self._hosts.items())
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def _wait_until(wait, deadline):
+    if deadline is None:
+        return wait
+    remaining = deadline.check()
+    return remaining if wait is None else min(wait, remaining)
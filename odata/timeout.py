@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+"""
+Timeouts and deadlines
+======================
+
+Every request is sent with the timeout of its connection,
+:py:attr:`ODataConnection.timeout <odata.connection.ODataConnection.timeout>`
+by default. A timeout is either a number of seconds, or a tuple of
+separate connect and read timeouts:
+
+.. code-block:: python
+
+    >>> Service = ODataService(url, timeout=(3.05, 60))
+
+The timeout of the requests of a single query is set with
+:py:func:`~odata.query.Query.timeout`, and the timeout of anything else
+with the :py:func:`timeout` context manager:
+
+.. code-block:: python
+
+    >>> products = Service.query(Product).timeout(5).all()
+    >>> with Service.default_context.timeout((1, 5)):
+    ...     Service.save(product)
+
+Deadlines
+---------
+
+A timeout limits a single request. A deadline limits the total time of
+everything done within it, including the requests of all result pages,
+retries and their delays, and navigation property loads:
+
+.. code-block:: python
+
+    >>> from odata.timeout import deadline
+    >>> with deadline(2.5):
+    ...     order = Service.query(Order).get(order_id)
+    ...     lines = order.Lines
+
+The timeouts of the requests are shortened to fit the time left, and no
+more requests or retries are made after the deadline has passed.
+:py:class:`~odata.exceptions.DeadlineExceeded` is raised instead.
+
+A read timeout limits each read from the socket, not the whole response,
+so blocking requests read the response body as it arrives and check the
+deadline after every read. A response that keeps trickling in fails after
+the first read that ends past the deadline. A request waiting for data
+fails when its read timeout, shortened to the time that was left when the
+request was sent, runs out. asyncio requests are cancelled at the
+deadline.
+:py:func:`~odata.query.Query.deadline` sets a deadline for iterating
+over the results of one query.
+
+Timeouts and deadlines apply to the current thread or asyncio task.
+Background threads and tasks started for :py:func:`~odata.query.Query.prefetch`
+and :py:func:`~odata.query.Query.parallel` inherit them.
+
+----
+
+API
+---
+"""
+
+import contextlib
+import contextvars
+import time
+
+from odata.exceptions import DeadlineExceeded
+
+
+_timeout = contextvars.ContextVar('odata_timeout', default=None)
+_deadline = contextvars.ContextVar('odata_deadline', default=None)
+
+
+class Deadline(object):
+    """
+    Point in time after which no more requests are made
+
+    :param seconds: Seconds from now
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def __repr__(self):
+        return '<Deadline in {0:.2f}s>'.format(self.remaining())
+
+    def remaining(self):
+        """
+        :return: Seconds left, zero after the deadline has passed
+        """
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        """
+        :return: Seconds left
+        :raises DeadlineExceeded: The deadline has passed
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(u'Deadline of {0}s exceeded'.format(self.seconds))
+        return remaining
+
+
+@contextlib.contextmanager
+def timeout(value):
+    """
+    Context manager that sets the timeout of the requests made within it
+
+    :param value: Seconds, or a tuple of connect and read timeouts. None keeps the current timeout
+    """
+    if value is None:
+        yield
+        return
+    token = _timeout.set(value)
+    try:
+        yield
+    finally:
+        _timeout.reset(token)
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """
+    Context manager that sets a deadline for the requests made within it.
+    Nested deadlines can not extend an outer deadline
+
+    :param seconds: Seconds from now, or a :py:class:`Deadline` instance. None for no deadline
+    :return: :py:class:`Deadline` in effect
+    """
+    current = _deadline.get()
+    if seconds is None:
+        new = current
+    else:
+        new = seconds if isinstance(seconds, Deadline) else Deadline(seconds)
+        if current is not None and current.expires < new.expires:
+            new = current
+    token = _deadline.set(new)
+    try:
+        yield new
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline():
+    """
+    :return: :py:class:`Deadline` in effect, or None
+    """
+    return _deadline.get()
+
+
+def split_timeout(value):
+    """
+    :param value: Seconds, tuple of connect and read timeouts, or None
+    :return: Tuple of connect and read timeouts
+    """
+    if isinstance(value, (tuple, list)):
+        connect, read = value
+        return connect, read
+    return value, value
+
+
+def request_timeout(default):
+    """
+    Timeouts for the next request, shortened to the time left before the
+    current deadline
+
+    :param default: Timeout of the connection
+    :return: Tuple of connect and read timeouts
+    :raises DeadlineExceeded: The deadline has passed
+    """
+    value = _timeout.get()
+    connect, read = split_timeout(default if value is None else value)
+    current = _deadline.get()
+    if current is not None:
+        remaining = current.check()
+        connect = remaining if connect is None else min(connect, remaining)
+        read = remaining if read is None else min(read, remaining)
+    return connect, read
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 
-import sys
 from setuptools import setup, find_packages
 
 requires = [
@@ -8,12 +7,17 @@ requires = [
     'python-dateutil',
 ]
 
-# support for enums from pypi when on older python
-if sys.version_info < (3, 4):
-    requires.append('enum34')
+extras_require = {
+    'async': ['aiohttp'],
+    'numpy': ['numpy'],
+    'pandas': ['pandas'],
+    'arrow': ['pyarrow'],
+    'orjson': ['orjson'],
+}
 
 tests_require = (
     'responses',
+    'aiohttp',
 )
 
 setup(
@@ -23,7 +27,9 @@ setup(
     license='MIT',
     author='Tuomas Mursu',
     author_email='tuomas.mursu@kapsi.fi',
+    python_requires='>=3.7',
     install_requires=requires,
+    extras_require=extras_require,
     tests_require=tests_require,
     packages=find_packages(),
 )